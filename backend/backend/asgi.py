@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+El stream de eventos (/api/auth/eventos/) necesita ASGI. Al cargar este módulo se activa
+el perfil ASGI (SERVIDOR=asgi): lecturas asíncronas y sin conexiones persistentes. Por ejemplo:
+    uvicorn backend.asgi:application --workers 4
+    gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+Con varios procesos, usar DB_PERFIL=postgres y una caché compartida. El frontend solo abre el
+stream si se compila con VITE_EVENTOS=1; por WSGI la vista responde 204.
 """
 
 import os
@@ -12,5 +19,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+os.environ.setdefault("SERVIDOR", "asgi")
 
 application = get_asgi_application()
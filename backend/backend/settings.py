@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # La primera para medir la petición completa (mainapp/metricas.py, GET /metrics)
+    "mainapp.metricas.MetricasMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -80,15 +83,96 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "backend.wsgi.application"
+ASGI_APPLICATION = "backend.asgi.application"
+
+# Perfil de servidor: "wsgi" (runserver, gunicorn) o "asgi" (backend/asgi.py lo activa). Con
+# ASGI los GET del feed, rutinas, catálogo, amistades y dashboard usan mainapp/vistas_async.py
+SERVIDOR = os.environ.get("SERVIDOR", "wsgi")
+VISTAS_ASYNC = SERVIDOR == "asgi"
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# Perfil elegido con DB_PERFIL: "sqlite" (por defecto) o "postgres".
+DB_PERFIL = os.environ.get("DB_PERFIL", "sqlite")
+# Bajo ASGI las conexiones persistentes no se reutilizan entre peticiones: se usa el pool
+# (PostgreSQL) o una conexión por petición (SQLite)
+CONN_MAX_AGE = 0 if SERVIDOR == "asgi" else int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+
+if DB_PERFIL == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "execcount"),
+            "USER": os.environ.get("POSTGRES_USER", "execcount"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            # Comprueba la conexión reutilizada antes de cada petición
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+    POSTGRES_POOL_MAX = int(os.environ.get("POSTGRES_POOL_MAX", "10"))
+    if POSTGRES_POOL_MAX:
+        # Pool de psycopg 3 (pip install "psycopg[pool]") en cada proceso; con pool
+        # CONN_MAX_AGE tiene que ser 0
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("POSTGRES_POOL_MIN", "2")),
+                "max_size": POSTGRES_POOL_MAX,
+                "timeout": 10,
+            },
+        }
+    else:
+        # POSTGRES_POOL_MAX=0 detrás de un pooler externo (PgBouncer): conexiones persistentes
+        DATABASES["default"]["CONN_MAX_AGE"] = CONN_MAX_AGE
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            # Las escrituras toman el lock al empezar la transacción y esperan en vez de
+            # fallar con "database is locked" al haber varias a la vez
+            "OPTIONS": {
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+            # Reutiliza la conexión (y sus PRAGMA) entre peticiones del mismo hilo
+            "CONN_MAX_AGE": CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            # Base de datos de tests en fichero para poder usarla desde varios hilos
+            "TEST": {
+                "NAME": BASE_DIR / "test_db.sqlite3",
+            },
+        }
+    }
+
+# PRAGMA que se aplican a cada conexión SQLite nueva (mainapp/basedatos.py). WAL deja leer
+# mientras otro escribe y, con synchronous=NORMAL, cada commit no espera a un fsync.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 128 * 1024 * 1024,
+    "cache_size": -20000,
+    "temp_store": "MEMORY",
+}
+# Ficheros a los que no se les cambia journal_mode: queda escrito en la cabecera del
+# fichero, y el db.sqlite3 de desarrollo está en el repositorio. Para usar WAL en local,
+# apuntar SQLITE_PATH a una copia fuera del repositorio
+SQLITE_SIN_WAL = [BASE_DIR / "db.sqlite3"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Guarda la versión y las respuestas del catálogo de ejercicios. Con varios procesos
+# hay que usar una caché compartida (Redis, Memcached) para que la invalidación llegue a todos.
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "execcount",
     }
 }
 
@@ -138,12 +222,44 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Autentica sin consultas: usuario y lista negra de tokens en caché (mainapp/autenticacion.py)
+        'mainapp.autenticacion.JWTAutenticacionRapida',
     )
 }
 
+# Tamaño de página por defecto del feed de publicaciones (paginación por cursor)
+FEED_PAGE_SIZE = 20
+
+# Segundos que se guarda en caché el dashboard de cada usuario (además de invalidarse con sus cambios)
+DASHBOARD_CACHE_SECONDS = 60
+# Ídem para el grafo de amistades (mainapp/amistades.py)
+AMISTADES_CACHE_SECONDS = 300
+
+# Cola de tareas en segundo plano (mainapp/tareas.py). Con True se ejecutan al encolarlas,
+# sin trabajador; útil en desarrollo. En producción: `python manage.py procesar_tareas`
+TAREAS_EN_LINEA = os.environ.get('TAREAS_EN_LINEA', '0') == '1'
+
+# Eventos en tiempo real (GET /api/auth/eventos/, ver mainapp/eventos.py). El backend en memoria
+# solo reparte dentro del proceso; con varios procesos hay que cambiarlo por uno compartido
+EVENTOS_BACKEND = 'mainapp.eventos.BackendMemoria'
+# Segundos entre comentarios de latido para que los proxies no cierren la conexión
+EVENTOS_LATIDO = 15
+
+# Métricas por ruta (mainapp/metricas.py). Con METRICAS_CABECERA cada respuesta lleva
+# X-Consultas-SQL y X-Tiempo-SQL. Se avisa en el log de las peticiones que tardan más de
+# METRICAS_UMBRAL_LENTA segundos o repiten una consulta METRICAS_UMBRAL_REPETIDAS veces (N+1).
+# Con METRICAS_TOKEN, /metrics pide "Authorization: Bearer <token>"; sin él solo responde con DEBUG.
+METRICAS_CABECERA = DEBUG
+METRICAS_UMBRAL_LENTA = float(os.environ.get("METRICAS_UMBRAL_LENTA", "1.0"))
+METRICAS_UMBRAL_REPETIDAS = int(os.environ.get("METRICAS_UMBRAL_REPETIDAS", "10"))
+METRICAS_TOKEN = os.environ.get("METRICAS_TOKEN", "")
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "mainapp.autenticacion.TokenObtainSesionSerializer",
 }
+
+# Segundos que se guarda en caché el usuario de cada token (se invalida al modificarlo)
+AUTH_USUARIO_CACHE_SECONDS = 300
@@ -18,7 +18,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from mainapp.metricas import vista_metricas
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/auth/', include('mainapp.urls')),
+    path("metrics", vista_metricas, name="metricas"),
 ]
@@ -0,0 +1,71 @@
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Amistad
+
+
+class GrafoAmistad(NamedTuple):
+    """Relaciones de un usuario: ids de amigos y de solicitudes pendientes en cada sentido"""
+    aceptados: frozenset
+    pendientes_entrantes: frozenset
+    pendientes_salientes: frozenset
+
+
+def clave_grafo(usuario_id):
+    return f'amistades:{usuario_id}'
+
+
+def cargar_grafo(usuario_id):
+    aceptados, entrantes, salientes = set(), set(), set()
+    filas = Amistad.objects.exclude(status='rechazada').values_list(
+        'usuario_id', 'amigo_id', 'status'
+    ).de_usuario(usuario_id)
+    for solicitante, destinatario, estado in filas:
+        otro = destinatario if solicitante == usuario_id else solicitante
+        if estado == 'aceptada':
+            aceptados.add(otro)
+        elif solicitante == usuario_id:
+            salientes.add(otro)
+        else:
+            entrantes.add(otro)
+    return GrafoAmistad(frozenset(aceptados), frozenset(entrantes), frozenset(salientes))
+
+
+def grafo_amistades(usuario_id):
+    grafo = cache.get(clave_grafo(usuario_id))
+    if grafo is None:
+        grafo = cargar_grafo(usuario_id)
+        # Con TTL: un proceso cuya caché no recibe las invalidaciones (LocMem con varios
+        # procesos) deja de ver el grafo anterior como mucho en AMISTADES_CACHE_SECONDS
+        cache.set(clave_grafo(usuario_id), grafo, timeout=getattr(settings, 'AMISTADES_CACHE_SECONDS', 300))
+    return grafo
+
+
+def amigos_aceptados(usuario_id):
+    return grafo_amistades(usuario_id).aceptados
+
+
+def son_amigos(usuario_id, otro_id):
+    return otro_id in grafo_amistades(usuario_id).aceptados
+
+
+def relacion(usuario_id, otro_id):
+    """'aceptada', 'enviada', 'recibida' o None, desde el punto de vista de usuario_id"""
+    grafo = grafo_amistades(usuario_id)
+    if otro_id in grafo.aceptados:
+        return 'aceptada'
+    if otro_id in grafo.pendientes_salientes:
+        return 'enviada'
+    if otro_id in grafo.pendientes_entrantes:
+        return 'recibida'
+    return None
+
+
+def invalidar_grafo(*usuario_ids):
+    claves = [clave_grafo(pk) for pk in usuario_ids]
+    cache.delete_many(claves)
+    # Otra petición podría volver a cachear el estado anterior antes del commit
+    transaction.on_commit(lambda: cache.delete_many(claves))
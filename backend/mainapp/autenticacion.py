@@ -0,0 +1,154 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import Usuario
+
+# Claim con el jti del refresh token del que sale cada access token: al cerrar sesión
+# se revoca ese jti y con él todos los access tokens de la sesión
+CLAIM_SESION = 'sesion'
+# Lo que se guarda del usuario para autenticar sin consultas (sin contraseña), en el orden
+# de los campos del modelo como espera Model.from_db
+CAMPOS_USUARIO = tuple(
+    f.attname for f in Usuario._meta.concrete_fields
+    if f.attname in {'id', 'email', 'username', 'nombre', 'apellidos', 'is_active', 'is_staff', 'is_superuser'}
+)
+CLAVE_VERSION_REVOCADOS = 'jwt_revocados:version'
+# Cada cuánto se relee la lista negra aunque no cambie, para soltar los jti ya caducados
+RECARGA_REVOCADOS = 3600
+
+# Copia en memoria del proceso: (versión, instante de carga, jti revocados)
+_revocados = (None, 0, frozenset())
+
+
+def clave_usuario(usuario_id):
+    return f'auth_usuario:{usuario_id}'
+
+
+def usuario_cacheado(usuario_id):
+    """
+    El Usuario del token desde la caché (TTL AUTH_USUARIO_CACHE_SECONDS). Los campos que no
+    se guardan, como la contraseña, quedan diferidos y se leen solo si algo los usa.
+    """
+    valores = cache.get(clave_usuario(usuario_id))
+    if valores is None:
+        valores = Usuario.objects.filter(pk=usuario_id).values_list(*CAMPOS_USUARIO).first()
+        if valores is None:
+            return None
+        cache.set(clave_usuario(usuario_id), valores, timeout=getattr(settings, 'AUTH_USUARIO_CACHE_SECONDS', 300))
+    return Usuario.from_db('default', CAMPOS_USUARIO, valores)
+
+
+def invalidar_usuario_autenticado(usuario_id):
+    cache.delete(clave_usuario(usuario_id))
+    transaction.on_commit(lambda: cache.delete(clave_usuario(usuario_id)))
+
+
+def version_revocados():
+    """Cambia cada vez que se añade o quita algo de la lista negra (ver signals.py)"""
+    version = cache.get(CLAVE_VERSION_REVOCADOS)
+    if version is None:
+        cache.add(CLAVE_VERSION_REVOCADOS, time.time_ns(), timeout=None)
+        version = cache.get(CLAVE_VERSION_REVOCADOS)
+    return version
+
+
+def subir_version_revocados():
+    try:
+        cache.incr(CLAVE_VERSION_REVOCADOS)
+    except ValueError:
+        cache.add(CLAVE_VERSION_REVOCADOS, time.time_ns(), timeout=None)
+
+
+def invalidar_revocados():
+    # También tras el commit: otro proceso podría recargar antes de que se vea la fila nueva
+    subir_version_revocados()
+    transaction.on_commit(subir_version_revocados)
+
+
+def jti_revocados():
+    """
+    Conjunto de jti de la lista negra que aún no han caducado, guardado en memoria del
+    proceso. Solo se vuelve a leer de token_blacklist cuando cambia la versión en caché
+    (un logout en cualquier proceso) o cada RECARGA_REVOCADOS segundos. Con varios procesos
+    la caché tiene que ser compartida (Redis, Memcached): con LocMem un logout en un proceso
+    no llega a los demás hasta la recarga. Solo se usa para los access tokens; los refresh
+    tokens se comprueban contra la base de datos (BlacklistMixin de simplejwt).
+    """
+    global _revocados
+    version = version_revocados()
+    cargada, instante, revocados = _revocados
+    if cargada != version or time.monotonic() - instante > RECARGA_REVOCADOS:
+        revocados = frozenset(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .values_list('token__jti', flat=True)
+        )
+        _revocados = (version, time.monotonic(), revocados)
+    return revocados
+
+
+def esta_revocado(*jtis):
+    revocados = jti_revocados()
+    return any(jti in revocados for jti in jtis if jti)
+
+
+def revocar_access_token(token):
+    """
+    Lleva un access token a la lista negra. Los que tienen el claim de sesión ya quedan
+    revocados con su refresh token; esto cubre los emitidos antes de añadir ese claim.
+    """
+    usuario = Usuario.objects.filter(pk=token.get(api_settings.USER_ID_CLAIM)).first()
+    pendiente, _ = OutstandingToken.objects.get_or_create(
+        jti=token[api_settings.JTI_CLAIM],
+        defaults={
+            'user': usuario,
+            'token': str(token),
+            'created_at': token.current_time,
+            'expires_at': datetime_from_epoch(token['exp']),
+        },
+    )
+    BlacklistedToken.objects.get_or_create(token=pendiente)
+
+
+class JWTAutenticacionRapida(JWTAuthentication):
+    """
+    Confía en el user_id firmado en el access token en vez de leer Usuario en cada
+    petición: el usuario sale de la caché y la revocación se comprueba contra el conjunto
+    de jti revocados en memoria. En el caso normal no hace ninguna consulta.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if esta_revocado(validated_token.get(api_settings.JTI_CLAIM), validated_token.get(CLAIM_SESION)):
+            raise AuthenticationFailed("Sesión cerrada", code="token_revoked")
+
+        usuario = usuario_cacheado(usuario_id)
+        if usuario is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not usuario.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return usuario
+
+
+class TokenObtainSesionSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Se copia a los access tokens que salgan de este refresh token
+        token[CLAIM_SESION] = token[api_settings.JTI_CLAIM]
+        return token
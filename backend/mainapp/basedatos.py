@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def aplicar_pragmas(cursor, pragmas):
+    for nombre, valor in pragmas.items():
+        cursor.execute(f"PRAGMA {nombre} = {valor}")
+
+
+def pragmas_para(nombre):
+    """
+    SQLITE_PRAGMAS para ese fichero. journal_mode=WAL no es de la conexión sino que se
+    guarda en el propio fichero, así que no se aplica a los de SQLITE_SIN_WAL
+    """
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    sin_wal = {os.path.abspath(ruta) for ruta in getattr(settings, 'SQLITE_SIN_WAL', ())}
+    if os.path.abspath(nombre) in sin_wal:
+        pragmas.pop('journal_mode', None)
+    return pragmas
+
+
+@receiver(connection_created)
+def configurar_conexion(sender, connection, **kwargs):
+    """Ajusta cada conexión SQLite nueva con SQLITE_PRAGMAS; con CONN_MAX_AGE se hace una vez por conexión"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            aplicar_pragmas(cursor, pragmas_para(connection.settings_dict['NAME']))
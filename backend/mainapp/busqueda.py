@@ -0,0 +1,90 @@
+import re
+
+from django.db import connection
+from django.db.models import Count, Q
+
+from .models import TipoEjercicio
+
+FTS_TABLA = 'mainapp_tipoejercicio_fts'
+# Peso de cada columna en el ranking bm25: nombre > grupo_muscular > descripcion
+FTS_PESOS = (10.0, 5.0, 1.0)
+
+
+def consulta_fts(texto):
+    """Convierte el texto del usuario en una consulta FTS5 de prefijos ("pre"* "ext"*)"""
+    terminos = re.findall(r'\w+', texto)
+    return ' '.join(f'"{t}"*' for t in terminos)
+
+
+def buscar_ejercicios(texto, grupo_muscular=None, limite=20, desplazamiento=0):
+    """
+    Devuelve (ejercicios de la página ordenados por relevancia, total, facetas de grupo_muscular).
+    Las facetas cuentan todos los resultados del texto, sin aplicar el filtro de grupo.
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return buscar_sin_texto(grupo_muscular, limite, desplazamiento)
+    if connection.vendor != 'sqlite':
+        return buscar_sin_fts(texto, grupo_muscular, limite, desplazamiento)
+
+    filtro_grupo = ''
+    params = [consulta]
+    if grupo_muscular:
+        filtro_grupo = 'AND t.grupo_muscular = %s'
+        params.append(grupo_muscular)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT t.id FROM {FTS_TABLA}
+            JOIN mainapp_tipoejercicio t ON t.id = {FTS_TABLA}.rowid
+            WHERE {FTS_TABLA} MATCH %s {filtro_grupo}
+            ORDER BY bm25({FTS_TABLA}, %s, %s, %s), t.id
+            LIMIT %s OFFSET %s
+            """,
+            params + list(FTS_PESOS) + [limite, desplazamiento],
+        )
+        ids = [fila[0] for fila in cursor.fetchall()]
+
+        cursor.execute(
+            f"""
+            SELECT t.grupo_muscular, COUNT(*) FROM {FTS_TABLA}
+            JOIN mainapp_tipoejercicio t ON t.id = {FTS_TABLA}.rowid
+            WHERE {FTS_TABLA} MATCH %s
+            GROUP BY t.grupo_muscular
+            ORDER BY COUNT(*) DESC, t.grupo_muscular
+            """,
+            [consulta],
+        )
+        facetas = [{'grupo_muscular': grupo, 'total': total} for grupo, total in cursor.fetchall()]
+
+    por_id = TipoEjercicio.objects.in_bulk(ids)
+    ejercicios = [por_id[pk] for pk in ids if pk in por_id]
+    total = sum(f['total'] for f in facetas if not grupo_muscular or f['grupo_muscular'] == grupo_muscular)
+    return ejercicios, total, facetas
+
+
+def facetas_de(queryset):
+    return [
+        {'grupo_muscular': f['grupo_muscular'], 'total': f['total']}
+        for f in queryset.order_by().values('grupo_muscular').annotate(total=Count('id')).order_by('-total', 'grupo_muscular')
+    ]
+
+
+def paginar(queryset, grupo_muscular, limite, desplazamiento):
+    facetas = facetas_de(queryset)
+    if grupo_muscular:
+        queryset = queryset.filter(grupo_muscular=grupo_muscular)
+    return list(queryset[desplazamiento:desplazamiento + limite]), queryset.count(), facetas
+
+
+def buscar_sin_texto(grupo_muscular, limite, desplazamiento):
+    return paginar(TipoEjercicio.objects.order_by('nombre', 'id'), grupo_muscular, limite, desplazamiento)
+
+
+def buscar_sin_fts(texto, grupo_muscular, limite, desplazamiento):
+    # Fallback sin índice para bases de datos distintas de SQLite
+    filtro = Q()
+    for termino in re.findall(r'\w+', texto):
+        filtro &= Q(nombre__icontains=termino) | Q(grupo_muscular__icontains=termino) | Q(descripcion__icontains=termino)
+    return paginar(TipoEjercicio.objects.filter(filtro).order_by('nombre', 'id'), grupo_muscular, limite, desplazamiento)
@@ -0,0 +1,159 @@
+from django.db.models import ManyToOneRel, Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+CAMPOS_QUERY_PARAM = 'fields'
+EXPANDIR_QUERY_PARAM = 'expand'
+
+
+def parametro_lista(request, nombre):
+    valor = request.query_params.get(nombre, '') if request else ''
+    return [c.strip() for c in valor.split(',') if c.strip()]
+
+
+def subcampos(rutas, prefijo):
+    """De ['id', 'ejercicios.sets'] y prefijo 'ejercicios' devuelve {'sets'}"""
+    if prefijo:
+        rutas = [r[len(prefijo) + 1:] for r in rutas if r.startswith(prefijo + '.')]
+    return {r.split('.')[0] for r in rutas}
+
+
+class CamposDinamicosMixin:
+    """
+    Salida configurable por query params en peticiones de lectura:
+
+    - ?fields=id,nombre,ejercicios.sets devuelve solo esos campos (con puntos para
+      los anidados; un anidado sin subcampos se devuelve completo).
+    - ?expand=tipo_ejercicio sustituye el id por el objeto, según `campos_expandibles`
+      (y lo incluye aunque no aparezca en ?fields=).
+
+    `requisitos` indica qué columnas lee cada SerializerMethodField, para que
+    optimizar_queryset() pueda limitar la consulta sin provocar lecturas extra.
+    """
+    campos_expandibles = {}
+    requisitos = {}
+
+    def ruta(self):
+        nombres = []
+        campo = self
+        while campo is not None:
+            if campo.field_name:
+                nombres.append(campo.field_name)
+            campo = campo.parent
+        return '.'.join(reversed(nombres))
+
+    def raiz(self):
+        campo = self
+        while campo.parent is not None:
+            campo = campo.parent
+        return campo
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.raiz().context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        ruta = self.ruta()
+
+        expandidos = subcampos(parametro_lista(request, EXPANDIR_QUERY_PARAM), ruta)
+        for nombre in expandidos:
+            if nombre not in self.campos_expandibles:
+                raise serializers.ValidationError({EXPANDIR_QUERY_PARAM: f"No se puede expandir: {nombre}"})
+            fields[nombre] = self.campos_expandibles[nombre]()
+
+        pedidos = subcampos(parametro_lista(request, CAMPOS_QUERY_PARAM), ruta)
+        if pedidos:
+            # Lo que se expande se devuelve aunque no esté en ?fields=
+            pedidos |= expandidos
+            desconocidos = pedidos - set(fields)
+            if desconocidos:
+                raise serializers.ValidationError({CAMPOS_QUERY_PARAM: f"Campos desconocidos: {', '.join(sorted(desconocidos))}"})
+            for nombre in set(fields) - pedidos:
+                fields.pop(nombre)
+        return fields
+
+
+def analizar(serializer, modelo, prefijo=''):
+    """
+    Recorre los campos del serializer y devuelve (only, select_related, prefetch).
+    only es None si algún campo necesita el objeto completo.
+    """
+    only, select, prefetch = set(), set(), []
+    limitar = True
+    requisitos = getattr(serializer, 'requisitos', {})
+
+    for nombre, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            relacion = modelo._meta.get_field(field.source)
+            # El prefetch necesita cargar la clave ajena hacia el padre
+            extra = [relacion.field.name] if isinstance(relacion, ManyToOneRel) else []
+            queryset = optimizar_queryset(relacion.related_model.objects.all(), field.child, extra)
+            prefetch.append(Prefetch(prefijo + field.source, queryset=queryset))
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            ruta = prefijo + field.source.replace('.', '__')
+            select.add(ruta)
+            sub_only, sub_select, sub_prefetch = analizar(field, modelo._meta.get_field(field.source).related_model, ruta + '__')
+            if sub_only is None:
+                limitar = False
+            else:
+                only |= sub_only or {ruta + '__pk'}
+            select |= sub_select
+            prefetch += sub_prefetch
+            continue
+
+        if isinstance(field, serializers.SerializerMethodField):
+            if nombre not in requisitos:
+                limitar = False
+                continue
+            rutas = requisitos[nombre]
+        elif field.source == '*':
+            limitar = False
+            continue
+        else:
+            rutas = [field.source.replace('.', '__')]
+
+        for ruta in rutas:
+            partes = ruta.split('__')
+            for i in range(1, len(partes)):
+                select.add(prefijo + '__'.join(partes[:i]))
+            only.add(prefijo + ruta)
+
+    return (only if limitar else None), select, prefetch
+
+
+def optimizar_queryset(queryset, serializer, extra=()):
+    """Ajusta only/select_related/prefetch_related a los campos que va a devolver el serializer"""
+    only, select, prefetch = analizar(serializer, queryset.model)
+    if only is not None:
+        only |= set(extra)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only is not None:
+        queryset = queryset.only(*only) if only else queryset.only('pk')
+    return queryset
+
+
+def usa_campos_dinamicos(request):
+    return request.method in SAFE_METHODS and bool(
+        parametro_lista(request, CAMPOS_QUERY_PARAM) or parametro_lista(request, EXPANDIR_QUERY_PARAM)
+    )
+
+
+def optimizar_para_peticion(queryset, request, serializer):
+    """optimizar_queryset() solo si la petición usa ?fields= o ?expand=; si no, se deja como está"""
+    if usa_campos_dinamicos(request):
+        return optimizar_queryset(queryset, serializer)
+    return queryset
+
+
+class CamposDinamicosViewMixin:
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimizar_para_peticion(queryset, self.request, self.get_serializer())
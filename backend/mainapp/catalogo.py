@@ -0,0 +1,56 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+CLAVE_VERSION = 'catalogo:version'
+CLAVE_MODIFICADO = 'catalogo:modificado'
+
+
+def version_catalogo():
+    """Versión actual del catálogo de ejercicios; cambia con cada alta, edición o borrado"""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Si se perdió la caché partimos de un valor nuevo para no repetir ETags antiguos
+        cache.add(CLAVE_VERSION, time.time_ns(), timeout=None)
+        cache.add(CLAVE_MODIFICADO, time.time(), timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar_catalogo():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns(), timeout=None)
+    cache.set(CLAVE_MODIFICADO, time.time(), timeout=None)
+
+
+def variante_campos(request):
+    """Las respuestas con ?fields= o ?expand= se cachean aparte"""
+    return f"{request.query_params.get('fields', '')}|{request.query_params.get('expand', '')}"
+
+
+def clave_lista(variante=''):
+    return f'catalogo:{version_catalogo()}:lista:{variante}'
+
+
+def clave_detalle(pk, variante=''):
+    return f'catalogo:{version_catalogo()}:detalle:{pk}:{variante}'
+
+
+# Funciones para django.views.decorators.http.condition: no tocan la base de datos,
+# así que un cliente con la versión actual recibe un 304 directamente
+def etag_catalogo(request, *args, **kwargs):
+    pk = kwargs.get('pk')
+    if pk is not None:
+        return f'catalogo-{version_catalogo()}-{pk}'
+    return f'catalogo-{version_catalogo()}'
+
+
+def ultima_modificacion_catalogo(request, *args, **kwargs):
+    version_catalogo()
+    modificado = cache.get(CLAVE_MODIFICADO)
+    if modificado is None:
+        return None
+    return datetime.fromtimestamp(modificado, tz=timezone.utc)
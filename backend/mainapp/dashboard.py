@@ -0,0 +1,109 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
+
+from .amistades import grafo_amistades
+from .models import EntradaTimeline, Publicacion, Rutina
+from .pagination import FeedCursorPagination
+from .serializers import PublicacionSerializer, RutinaSerializer, UsuarioSerializer
+
+DIAS = [dia for dia, _ in RutinaSerializer.DIA_CHOICES]
+
+
+def clave_dashboard(usuario_id):
+    return f'dashboard:{usuario_id}'
+
+
+def invalidar_dashboard(*usuario_ids):
+    claves = [clave_dashboard(pk) for pk in usuario_ids]
+    cache.delete_many(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def invalidar_dashboard_de_publicaciones(*publicacion_ids):
+    """
+    likes_count va en el feed cacheado: cambia el dashboard de todos los que tienen la
+    publicación en su timeline (el autor y sus amigos), no solo el de quien da el like
+    """
+    invalidar_dashboard(*EntradaTimeline.objects.filter(publicacion_id__in=publicacion_ids)
+                        .values_list('usuario_id', flat=True).distinct())
+
+
+def rutinas_de(usuario):
+    return Rutina.objects.filter(usuario=usuario).order_by('id').con_ejercicios()
+
+
+def feed_inicial(usuario):
+    # Un elemento de más para saber si hay página siguiente
+    return Publicacion.objects.feed_de(usuario)[:getattr(settings, 'FEED_PAGE_SIZE', 20) + 1]
+
+
+def montar_dashboard(request, rutinas, grafo, publicaciones):
+    """Serializa lo ya leído; construir_dashboard y su versión asíncrona solo cambian cómo se lee"""
+    semana = dict.fromkeys(DIAS)
+    for rutina in rutinas:
+        if semana.get(rutina.dia) is None:
+            semana[rutina.dia] = rutina
+    semana = {
+        dia: RutinaSerializer(rutina).data if rutina else None
+        for dia, rutina in semana.items()
+    }
+
+    tamano = getattr(settings, 'FEED_PAGE_SIZE', 20)
+    siguiente = None
+    if len(publicaciones) > tamano:
+        publicaciones = publicaciones[:tamano]
+        paginacion = FeedCursorPagination()
+        siguiente = replace_query_param(
+            request.build_absolute_uri(reverse('lista_crear_publicaciones')),
+            paginacion.cursor_query_param,
+            paginacion.encode_cursor(publicaciones[-1]),
+        )
+
+    return {
+        'usuario': UsuarioSerializer(request.user).data,
+        'semana': semana,
+        'amistades': {
+            'amigos': len(grafo.aceptados),
+            'solicitudes_recibidas': len(grafo.pendientes_entrantes),
+            'solicitudes_enviadas': len(grafo.pendientes_salientes),
+        },
+        'feed': {
+            'next': siguiente,
+            'results': PublicacionSerializer(publicaciones, many=True).data,
+        },
+    }
+
+
+def construir_dashboard(request):
+    """
+    Todo lo que necesita la app al arrancar, con un número fijo de consultas:
+    perfil, rutina de cada día con sus ejercicios, solicitudes de amistad y
+    primera página del feed.
+    """
+    usuario = request.user
+    return montar_dashboard(
+        request, list(rutinas_de(usuario)), grafo_amistades(usuario.id), list(feed_inicial(usuario))
+    )
+
+
+def empaquetar_dashboard(datos):
+    """(etag, datos), que es lo que se guarda en caché"""
+    contenido = json.dumps(datos, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return hashlib.md5(contenido).hexdigest(), datos
+
+
+def dashboard_cacheado(request):
+    """Devuelve (etag, datos); se recalcula si algo del usuario cambió o caducó el TTL"""
+    clave = clave_dashboard(request.user.id)
+    cacheado = cache.get(clave)
+    if cacheado is None:
+        cacheado = empaquetar_dashboard(construir_dashboard(request))
+        cache.set(clave, cacheado, timeout=getattr(settings, 'DASHBOARD_CACHE_SECONDS', 60))
+    return cacheado
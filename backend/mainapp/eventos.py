@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class BackendEventos:
+    """
+    Pub/sub de eventos por usuario. `publicar` se llama desde código síncrono (vistas,
+    señales, tareas) y `suscribir` desde el stream asíncrono de EventosView.
+    """
+
+    def publicar(self, usuario_id, evento):
+        raise NotImplementedError
+
+    def suscribir(self, usuario_id):
+        """Devuelve un objeto con `await recibir(timeout)` y `cerrar()`"""
+        raise NotImplementedError
+
+
+class SuscripcionMemoria:
+    def __init__(self, backend, usuario_id, destino):
+        self.backend = backend
+        self.usuario_id = usuario_id
+        self.destino = destino
+        self.cola = destino[1]
+
+    async def recibir(self, timeout):
+        """El siguiente evento, o None si no llega ninguno en `timeout` segundos"""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cerrar(self):
+        self.backend.quitar(self.usuario_id, self.destino)
+
+
+class BackendMemoria(BackendEventos):
+    """
+    Pub/sub dentro del proceso: solo llega a las conexiones abiertas en el mismo proceso.
+    Con varios procesos (o con el trabajador de tareas aparte) hace falta un backend
+    compartido que implemente la misma interfaz.
+    """
+    # Eventos que se guardan para un cliente lento antes de empezar a descartar
+    max_pendientes = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.suscriptores = defaultdict(set)
+
+    def publicar(self, usuario_id, evento):
+        with self.lock:
+            destinos = list(self.suscriptores.get(usuario_id, ()))
+        for loop, cola in destinos:
+            # El bucle de una conexión que se está cerrando puede haber terminado ya
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self.entregar, cola, evento)
+
+    @staticmethod
+    def entregar(cola, evento):
+        try:
+            cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            pass
+
+    def suscribir(self, usuario_id):
+        destino = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_pendientes))
+        with self.lock:
+            self.suscriptores[usuario_id].add(destino)
+        return SuscripcionMemoria(self, usuario_id, destino)
+
+    def quitar(self, usuario_id, destino):
+        with self.lock:
+            self.suscriptores[usuario_id].discard(destino)
+            if not self.suscriptores[usuario_id]:
+                del self.suscriptores[usuario_id]
+
+
+@lru_cache(maxsize=None)
+def backend_eventos():
+    return import_string(getattr(settings, 'EVENTOS_BACKEND', 'mainapp.eventos.BackendMemoria'))()
+
+
+@receiver(setting_changed)
+def backend_cambiado(setting, **kwargs):
+    if setting == 'EVENTOS_BACKEND':
+        backend_eventos.cache_clear()
+
+
+def emitir(usuario_ids, tipo, **datos):
+    """Envía el evento a esos usuarios cuando se confirme la transacción actual"""
+    evento = {'tipo': tipo, **datos}
+    usuario_ids = set(usuario_ids)
+
+    def publicar():
+        backend = backend_eventos()
+        for usuario_id in usuario_ids:
+            backend.publicar(usuario_id, evento)
+
+    transaction.on_commit(publicar)
+
+
+def formatear_evento(evento):
+    """Un evento en formato text/event-stream: `event:` con el tipo y `data:` en JSON"""
+    datos = {k: v for k, v in evento.items() if k != 'tipo'}
+    return f"event: {evento['tipo']}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def flujo_eventos(usuario_id, latido=None):
+    """Stream infinito para un usuario; envía un comentario cada `latido` segundos sin eventos"""
+    latido = latido or getattr(settings, 'EVENTOS_LATIDO', 15)
+    suscripcion = backend_eventos().suscribir(usuario_id)
+    try:
+        # Ya suscritos: a partir de aquí no se pierde ningún evento
+        yield "retry: 5000\n\n"
+        while True:
+            evento = await suscripcion.recibir(latido)
+            yield formatear_evento(evento) if evento is not None else ": latido\n\n"
+    finally:
+        # Sin await: también se ejecuta si el generador se cierra al recogerlo la memoria
+        suscripcion.cerrar()
@@ -0,0 +1,251 @@
+import itertools
+import json
+import math
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from mainapp import urls as rutas_api
+from mainapp.autenticacion import TokenObtainSesionSerializer
+from mainapp.models import Amistad, EjercicioRutina, Like, Publicacion, Rutina, Serie, TipoEjercicio, Usuario
+
+# Las que no terminan (stream de eventos) no se pueden medir como una petición
+OMITIDAS = {'eventos': "stream SSE sin fin"}
+_contador = itertools.count()
+
+
+def nombre_patron(patron):
+    return patron.name or str(patron.pattern)
+
+
+def percentil(valores, p):
+    """Percentil por el método del rango más cercano sobre valores ordenados"""
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def escenarios(usuario, password):
+    """
+    Petición de prueba de cada ruta de mainapp/urls.py con ids reales del usuario: nombre ->
+    (método, función que devuelve (url, datos)), o el motivo por el que no se puede medir.
+    Las escrituras se ejecutan en una transacción que se deshace.
+    """
+    rutina = Rutina.objects.filter(usuario=usuario, ejercicios__isnull=False).first()
+    ejercicios = list(EjercicioRutina.objects.filter(rutina=rutina).values_list('id', flat=True)) if rutina else []
+    tipo = TipoEjercicio.objects.order_by('id').first()
+    propia = Publicacion.objects.filter(usuario=usuario).first()
+    del_feed = Publicacion.objects.feed_de(usuario).exclude(likes__usuario=usuario).first()
+    con_like = Like.objects.filter(usuario=usuario).values_list('publicacion_id', flat=True).first()
+    serie = Serie.objects.filter(usuario=usuario).first()
+    amistad = Amistad.objects.de_usuario(usuario).first()
+    recibida = Amistad.objects.filter(amigo=usuario, status='pendiente').first()
+    otro = Usuario.objects.exclude(pk=usuario.pk).order_by('id').first()
+    desconocido = Usuario.objects.exclude(pk=usuario.pk).exclude(
+        pk__in=Amistad.objects.filter(usuario=usuario).values('amigo')
+    ).exclude(pk__in=Amistad.objects.filter(amigo=usuario).values('usuario')).order_by('id').first()
+
+    def requiere(objeto, motivo, escenario):
+        return escenario() if objeto is not None else motivo
+
+    def leer(url):
+        return 'get', lambda: (url, None)
+
+    def registro():
+        n = f"{next(_contador)}{uuid.uuid4().hex[:8]}"
+        return reverse('registro'), {
+            'email': f'bench{n}@example.com', 'username': f'bench{n}', 'nombre': 'Bench', 'apellidos': 'Mark',
+            'password': 'Contraseña-bench-123', 'password2': 'Contraseña-bench-123',
+        }
+
+    def con_refresh(nombre):
+        # Crea su OutstandingToken, así que se construye dentro de la transacción que se deshace
+        return lambda: (reverse(nombre), {'refresh': str(TokenObtainSesionSerializer.get_token(usuario))})
+
+    return {
+        'registro': ('post', registro),
+        'logout': ('post', con_refresh('logout')),
+        'token_obtain_pair': ('post', lambda: (reverse('token_obtain_pair'), {'email': usuario.email, 'password': password})),
+        'token_refresh': ('post', con_refresh('token_refresh')),
+        'users/': leer('/api/auth/users/'),
+        'users/me/': leer('/api/auth/users/me/'),
+        'dashboard': leer(reverse('dashboard')),
+        'usuario-autocompletar': leer(reverse('usuario-autocompletar') + '?q=usu'),
+        'users/<int:pk>/': requiere(otro, "sin otros usuarios", lambda: leer(f'/api/auth/users/{otro.pk}/')),
+        'rutina-list-create': leer(reverse('rutina-list-create')),
+        'rutina-detail': requiere(rutina, "el usuario no tiene rutinas", lambda: leer(reverse('rutina-detail', args=[rutina.pk]))),
+        'reorder-ejercicios': requiere(rutina, "el usuario no tiene rutinas", lambda: ('put', lambda: (
+            reverse('reorder-ejercicios', args=[rutina.pk]),
+            {'ejercicios': [{'id': pk, 'orden': orden} for orden, pk in enumerate(reversed(ejercicios))]},
+        ))),
+        'ejercicios-lote': requiere(rutina, "el usuario no tiene rutinas", lambda: ('post', lambda: (
+            reverse('ejercicios-lote', args=[rutina.pk]),
+            {'crear': [{'tipo_ejercicio': tipo.pk, 'sets': 3, 'repeticiones': 10}]},
+        ))),
+        'tipo_ejercicio_list_create': leer(reverse('tipo_ejercicio_list_create')),
+        'tipo_ejercicio_detail': requiere(tipo, "catálogo vacío", lambda: leer(reverse('tipo_ejercicio_detail', args=[tipo.pk]))),
+        'tipo_ejercicio_buscar': leer(reverse('tipo_ejercicio_buscar') + '?q=press'),
+        'ejercicio-rutina-list-create': leer(reverse('ejercicio-rutina-list-create')),
+        'ejercicio-rutina-detail': requiere(rutina, "el usuario no tiene rutinas", lambda: leer(
+            reverse('ejercicio-rutina-detail', args=[ejercicios[0]])
+        )),
+        'serie-list-create': leer(reverse('serie-list-create')),
+        'serie-analiticas': leer(reverse('serie-analiticas')),
+        'serie-detail': requiere(serie, "el usuario no tiene series", lambda: leer(reverse('serie-detail', args=[serie.pk]))),
+        'ranking-records': requiere(tipo, "catálogo vacío", lambda: leer(reverse('ranking-records') + f'?tipo_ejercicio={tipo.pk}')),
+        'ranking-rachas': leer(reverse('ranking-rachas')),
+        'amistad-list': leer(reverse('amistad-list')),
+        'amistad-create': requiere(desconocido, "no quedan usuarios sin relación", lambda: ('post', lambda: (
+            reverse('amistad-create'), {'amigo_input': desconocido.username},
+        ))),
+        'amistad-update': requiere(recibida, "sin solicitudes recibidas", lambda: ('patch', lambda: (
+            reverse('amistad-update', args=[recibida.pk]), {'status': 'aceptada'},
+        ))),
+        'amistad-delete': requiere(amistad, "el usuario no tiene amistades", lambda: ('delete', lambda: (
+            reverse('amistad-delete', args=[amistad.pk]), None,
+        ))),
+        'lista_crear_publicaciones': leer(reverse('lista_crear_publicaciones')),
+        'detalle_publicacion': requiere(propia, "el usuario no tiene publicaciones", lambda: leer(
+            reverse('detalle_publicacion', args=[propia.pk])
+        )),
+        'dar_like': requiere(del_feed, "nada en el feed sin like", lambda: ('post', lambda: (
+            reverse('dar_like', args=[del_feed.pk]), None,
+        ))),
+        'quitar_like': requiere(con_like, "el usuario no ha dado likes", lambda: ('delete', lambda: (
+            reverse('quitar_like', args=[con_like]), None,
+        ))),
+        'likes_lote': requiere(del_feed, "nada en el feed sin like", lambda: ('post', lambda: (
+            reverse('likes_lote'), {'operaciones': [{'publicacion': del_feed.pk, 'accion': 'like'}]},
+        ))),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cada ruta de mainapp/urls.py con el cliente de tests de Django, con varias peticiones "
+        "a la vez, y devuelve en JSON latencias p50/p95/p99 y consultas por petición"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help="Email del usuario con el que se hacen las peticiones")
+        parser.add_argument('--password', default='benchmark', help="Su contraseña, para medir el login")
+        parser.add_argument('--peticiones', type=int, default=50, help="Peticiones medidas por ruta")
+        parser.add_argument('--concurrencia', type=int, default=4, help="Hilos haciendo peticiones a la vez")
+        parser.add_argument('--rutas', help="Solo estas rutas, separadas por comas")
+        parser.add_argument('--salida', help="Fichero donde guardar el JSON (por defecto, la salida estándar)")
+
+    def handle(self, *args, **options):
+        if options['usuario']:
+            usuario = Usuario.objects.filter(email=options['usuario']).first()
+        else:
+            usuario = Usuario.objects.order_by('id').first()
+        if usuario is None:
+            raise CommandError("No hay usuario con el que medir; genera datos con generar_datos")
+        self.token = str(TokenObtainSesionSerializer.get_token(usuario).access_token)
+
+        patrones = [nombre_patron(p) for p in rutas_api.urlpatterns]
+        if options['rutas']:
+            pedidas = {r.strip() for r in options['rutas'].split(',')}
+            patrones = [p for p in patrones if p in pedidas]
+        disponibles = escenarios(usuario, options['password'])
+
+        resultado = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'configuracion': {
+                'usuario': usuario.email,
+                'peticiones': options['peticiones'],
+                'concurrencia': options['concurrencia'],
+                'base_de_datos': settings.DATABASES['default']['ENGINE'],
+                'servidor': getattr(settings, 'SERVIDOR', 'wsgi'),
+            },
+            'datos': {
+                modelo.__name__: modelo.objects.count()
+                for modelo in (Usuario, Amistad, Publicacion, Like, Rutina, TipoEjercicio)
+            },
+            'rutas': {},
+            'omitidas': {},
+        }
+        # Sin DEBUG (que guarda cada consulta en memoria) y con la cabecera de consultas de metricas.py
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost'], METRICAS_CABECERA=True):
+            for nombre in patrones:
+                escenario = OMITIDAS.get(nombre) or disponibles.get(nombre, "sin escenario definido")
+                if isinstance(escenario, str):
+                    resultado['omitidas'][nombre] = escenario
+                    continue
+                self.stderr.write(f"Midiendo {nombre}...")
+                metodo, construir = escenario
+                resultado['rutas'][nombre] = {
+                    'metodo': metodo.upper(),
+                    **self.medir(metodo, construir, max(1, options['peticiones']), options['concurrencia']),
+                }
+
+        salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as fichero:
+                fichero.write(salida + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Resultados en {options['salida']}"))
+        else:
+            self.stdout.write(salida)
+
+    def peticion(self, cliente, metodo, construir):
+        if metodo == 'get':
+            url, datos = construir()
+            return self.enviar(cliente, metodo, url, datos)
+        # Las escrituras no se guardan: cada repetición mide lo mismo
+        with transaction.atomic():
+            url, datos = construir()
+            medida = self.enviar(cliente, metodo, url, datos)
+            transaction.set_rollback(True)
+        return medida
+
+    def enviar(self, cliente, metodo, url, datos):
+        inicio = time.perf_counter()
+        response = getattr(cliente, metodo)(url, datos, format='json')
+        duracion = time.perf_counter() - inicio
+        return duracion, response.status_code, int(response.get('X-Consultas-SQL', 0))
+
+    def medir(self, metodo, construir, peticiones, concurrencia):
+        def trabajador(cuantas):
+            cliente = APIClient(SERVER_NAME='localhost')
+            cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            try:
+                return [self.peticion(cliente, metodo, construir) for _ in range(cuantas)]
+            finally:
+                if concurrencia > 1:
+                    connection.close()
+
+        # Una petición de calentamiento (cachés, conexiones) que no se cuenta
+        trabajador(1)
+        reparto = [peticiones // concurrencia + (i < peticiones % concurrencia) for i in range(concurrencia)]
+        inicio = time.perf_counter()
+        if concurrencia > 1:
+            with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+                medidas = [m for parte in executor.map(trabajador, reparto) for m in parte]
+        else:
+            medidas = trabajador(peticiones)
+        total = time.perf_counter() - inicio
+
+        latencias = sorted(d * 1000 for d, _, _ in medidas)
+        estados = {}
+        for _, estado, _ in medidas:
+            estados[str(estado)] = estados.get(str(estado), 0) + 1
+        return {
+            'peticiones': len(medidas),
+            'estados': estados,
+            'errores': sum(1 for _, estado, _ in medidas if estado >= 400),
+            'por_segundo': round(len(medidas) / total, 1) if total else None,
+            'p50_ms': round(percentil(latencias, 50), 2),
+            'p95_ms': round(percentil(latencias, 95), 2),
+            'p99_ms': round(percentil(latencias, 99), 2),
+            'media_ms': round(statistics.fmean(latencias), 2),
+            'consultas_por_peticion': round(statistics.fmean(c for _, _, c in medidas), 2),
+        }
@@ -0,0 +1,135 @@
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mainapp.basedatos import aplicar_pragmas
+
+# Configuración anterior: diario por defecto, una conexión nueva por petición, transacciones
+# diferidas (BEGIN) y la espera por defecto de sqlite3 (5 s), sin OPTIONS en DATABASES
+ANTES = {
+    'pragmas': {"journal_mode": "DELETE", "synchronous": "FULL"},
+    'persistente': False,
+    'begin': "BEGIN",
+    'timeout': 5.0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el rendimiento de escrituras concurrentes en SQLite (likes: get_or_create + UPDATE del "
+        "contador en una transacción) con la configuración anterior y con SQLITE_PRAGMAS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help="Escritores concurrentes")
+        parser.add_argument('--escrituras', type=int, default=200, help="Escrituras por hilo")
+        parser.add_argument('--lectores', type=int, default=2, help="Hilos leyendo el feed mientras tanto")
+
+    def handle(self, *args, **options):
+        opciones = settings.DATABASES['default'].get('OPTIONS', {})
+        despues = {
+            'pragmas': getattr(settings, 'SQLITE_PRAGMAS', {}),
+            'persistente': True,
+            'begin': f"BEGIN {opciones.get('transaction_mode', '')}".strip(),
+            'timeout': opciones.get('timeout', 5.0),
+        }
+        resultados = {
+            'antes': self.medir(**ANTES, **options),
+            'despues': self.medir(**despues, **options),
+        }
+        for perfil, r in resultados.items():
+            self.stdout.write(
+                f"{perfil:8} {r['por_segundo']:9.1f} escrituras/s  p50 {r['p50']:7.2f} ms  "
+                f"p95 {r['p95']:7.2f} ms  errores {r['errores']}  lecturas {r['lecturas']}"
+            )
+        if resultados['antes']['por_segundo']:
+            mejora = resultados['despues']['por_segundo'] / resultados['antes']['por_segundo']
+            self.stdout.write(self.style.SUCCESS(f"x{mejora:.2f} escrituras por segundo"))
+
+    def medir(self, pragmas, persistente, begin, timeout, hilos, escrituras, lectores, **kwargs):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio) / 'benchmark.sqlite3'
+
+            def conectar():
+                conexion = sqlite3.connect(ruta, timeout=timeout, isolation_level=None, check_same_thread=False)
+                aplicar_pragmas(conexion, pragmas)
+                return conexion
+
+            conexion = conectar()
+            conexion.executescript(
+                "CREATE TABLE publicacion (id INTEGER PRIMARY KEY, likes_count INTEGER NOT NULL DEFAULT 0);"
+                "CREATE TABLE likes (id INTEGER PRIMARY KEY, usuario INTEGER, publicacion INTEGER,"
+                " UNIQUE (usuario, publicacion));"
+                "INSERT INTO publicacion (id) VALUES (1), (2), (3), (4);"
+            )
+            conexion.close()
+
+            latencias, errores, lecturas = [], [], []
+            terminado = threading.Event()
+
+            def escritor(numero):
+                conexion = conectar() if persistente else None
+                for i in range(escrituras):
+                    inicio = time.perf_counter()
+                    actual = conexion or conectar()
+                    try:
+                        actual.execute(begin)
+                        # Como get_or_create: lee antes de escribir. Con BEGIN diferido la
+                        # transacción empieza como lectora y, si otra ya escribe, el paso a
+                        # escritora falla con "database is locked" sin esperar al timeout
+                        usuario = numero * escrituras + i
+                        actual.execute(
+                            "SELECT id FROM likes WHERE usuario = ? AND publicacion = ?", (usuario, i % 4 + 1)
+                        ).fetchall()
+                        actual.execute("INSERT INTO likes (usuario, publicacion) VALUES (?, ?)", (usuario, i % 4 + 1))
+                        actual.execute("UPDATE publicacion SET likes_count = likes_count + 1 WHERE id = ?", (i % 4 + 1,))
+                        actual.execute("COMMIT")
+                        latencias.append(time.perf_counter() - inicio)
+                    except sqlite3.OperationalError:
+                        errores.append(1)
+                        if actual.in_transaction:
+                            actual.execute("ROLLBACK")
+                    finally:
+                        if conexion is None:
+                            actual.close()
+                if conexion is not None:
+                    conexion.close()
+
+            def lector():
+                conexion = conectar()
+                while not terminado.is_set():
+                    try:
+                        conexion.execute("SELECT id, likes_count FROM publicacion ORDER BY likes_count DESC").fetchall()
+                        lecturas.append(1)
+                    except sqlite3.OperationalError:
+                        pass
+                conexion.close()
+
+            hilos_lectores = [threading.Thread(target=lector) for _ in range(lectores)]
+            hilos_escritores = [threading.Thread(target=escritor, args=(n,)) for n in range(hilos)]
+            for hilo in hilos_lectores:
+                hilo.start()
+            inicio = time.perf_counter()
+            for hilo in hilos_escritores:
+                hilo.start()
+            for hilo in hilos_escritores:
+                hilo.join()
+            duracion = time.perf_counter() - inicio
+            terminado.set()
+            for hilo in hilos_lectores:
+                hilo.join()
+
+        milisegundos = sorted(latencia * 1000 for latencia in latencias) or [0.0]
+        return {
+            'por_segundo': len(latencias) / duracion,
+            'p50': statistics.median(milisegundos),
+            'p95': milisegundos[min(len(milisegundos) - 1, int(len(milisegundos) * 0.95))],
+            'errores': len(errores),
+            'lecturas': len(lecturas),
+        }
@@ -0,0 +1,228 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mainapp.catalogo import invalidar_catalogo
+from mainapp.models import (
+    Amistad, EjercicioRutina, EntradaTimeline, Like, Publicacion, RachaUsuario, RecordEjercicio, Rutina, Serie,
+    TipoEjercicio, Usuario,
+)
+
+DOMINIO = 'sintetico.execcount.test'
+DIAS = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+CATALOGO = {
+    'Pecho': ['Press banca', 'Press inclinado', 'Press declinado', 'Aperturas con mancuernas', 'Fondos', 'Cruce de poleas', 'Flexiones'],
+    'Espalda': ['Dominadas', 'Remo con barra', 'Remo con mancuerna', 'Jalón al pecho', 'Peso muerto', 'Remo en polea baja', 'Pullover'],
+    'Pierna': ['Sentadilla', 'Prensa', 'Zancadas', 'Extensión de cuádriceps', 'Curl femoral', 'Peso muerto rumano', 'Hip thrust', 'Elevación de gemelos'],
+    'Hombro': ['Press militar', 'Elevaciones laterales', 'Pájaros', 'Face pull', 'Press Arnold', 'Encogimientos'],
+    'Bíceps': ['Curl con barra', 'Curl martillo', 'Curl concentrado', 'Curl en banco Scott'],
+    'Tríceps': ['Press francés', 'Extensión en polea', 'Patada de tríceps', 'Press cerrado'],
+    'Core': ['Plancha', 'Crunch', 'Rueda abdominal', 'Elevación de piernas', 'Russian twist'],
+}
+
+
+def borrar_en_bloque(queryset):
+    """
+    Un solo DELETE ... WHERE pk IN (subconsulta). QuerySet.delete() cargaría cada fila en
+    Python para recorrer la cascada y lanzar pre/post_delete, y con millones de likes y
+    entradas de timeline eso no cabe en memoria
+    """
+    modelo = queryset.model
+    conexion = connections[queryset.db]
+    sql, params = queryset.values('pk').query.sql_with_params()
+    tabla, columna = conexion.ops.quote_name(modelo._meta.db_table), conexion.ops.quote_name(modelo._meta.pk.column)
+    with conexion.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {tabla} WHERE {columna} IN ({sql})", params)
+        return cursor.rowcount
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto de datos sintético y reproducible (misma semilla, mismos datos) para "
+        "medir la API a escala: usuarios, catálogo, amistades, rutinas, publicaciones con su "
+        "timeline y likes. Los usuarios son usuarioN@" + DOMINIO
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--escala', type=float, default=1.0, help="Multiplica todos los tamaños (0.01 para una prueba rápida)")
+        parser.add_argument('--usuarios', type=int, default=100_000)
+        parser.add_argument('--amistades', type=int, default=1_000_000)
+        parser.add_argument('--publicaciones', type=int, default=500_000)
+        parser.add_argument('--likes', type=int, default=5_000_000)
+        parser.add_argument('--rutinas-por-usuario', type=int, default=3)
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por bulk_create")
+        parser.add_argument('--password', default='benchmark', help="Contraseña de todos los usuarios")
+        parser.add_argument('--borrar', action='store_true', help="Borra antes los datos sintéticos anteriores")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['semilla'])
+        self.lote = options['lote']
+        escala = options['escala']
+        n_usuarios = max(2, int(options['usuarios'] * escala))
+        n_amistades = min(int(options['amistades'] * escala), n_usuarios * (n_usuarios - 1) // 2)
+        n_publicaciones = int(options['publicaciones'] * escala)
+        n_likes = int(options['likes'] * escala)
+        # Fechas relativas al día de hoy: la misma semilla da los mismos datos en el mismo día
+        self.ahora = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        sinteticos = Usuario.objects.filter(email__endswith='@' + DOMINIO)
+        if sinteticos.exists():
+            if not options['borrar']:
+                raise CommandError("Ya hay datos sintéticos; usa --borrar para regenerarlos")
+            self.stdout.write("Borrando datos sintéticos anteriores...")
+            self.borrar(sinteticos)
+
+        usuarios = self.crear_usuarios(n_usuarios, options['password'])
+        tipos = self.crear_catalogo()
+        amigos = self.crear_amistades(usuarios, n_amistades)
+        self.crear_rutinas(usuarios, tipos, options['rutinas_por_usuario'])
+        self.crear_publicaciones(usuarios, amigos, n_publicaciones, n_likes)
+        self.stdout.write(self.style.SUCCESS("Datos sintéticos generados"))
+
+    def borrar(self, sinteticos):
+        """
+        Las tablas hijas en bloque y en orden de dependencias; al final los usuarios, cuyo
+        delete() ya solo arrastra lo poco que queda (tokens, admin). Con delete() directo la
+        cascada cargaría millones de likes y entradas de timeline, con sus señales.
+        """
+        ids = sinteticos.values('pk')
+        with transaction.atomic():
+            for queryset in [
+                Like.objects.filter(Q(usuario__in=ids) | Q(publicacion__usuario__in=ids)),
+                EntradaTimeline.objects.filter(Q(usuario__in=ids) | Q(publicacion__usuario__in=ids)),
+                Publicacion.objects.filter(usuario__in=ids),
+                EjercicioRutina.objects.filter(rutina__usuario__in=ids),
+                Rutina.objects.filter(usuario__in=ids),
+                Serie.objects.filter(usuario__in=ids),
+                RecordEjercicio.objects.filter(usuario__in=ids),
+                RachaUsuario.objects.filter(usuario__in=ids),
+                Amistad.objects.filter(Q(usuario__in=ids) | Q(amigo__in=ids)),
+            ]:
+                borrar_en_bloque(queryset)
+            sinteticos.delete()
+
+    def guardar(self, modelo, filas, **kwargs):
+        with transaction.atomic():
+            return modelo.objects.bulk_create(filas, batch_size=self.lote, **kwargs)
+
+    def progreso(self, texto, hechos, total):
+        self.stdout.write(f"{texto}: {hechos}/{total}")
+
+    def crear_usuarios(self, total, password):
+        # Un solo hash para todos: calcular 100k hashes PBKDF2 llevaría horas
+        hash_password = make_password(password)
+        ids = []
+        for inicio in range(0, total, self.lote):
+            creados = self.guardar(Usuario, [
+                Usuario(
+                    email=f'usuario{i}@{DOMINIO}', username=f'usuario{i}', password=hash_password,
+                    nombre=self.rng.choice(['Ana', 'Luis', 'Marta', 'Pablo', 'Lucía', 'Javier', 'Sara', 'Diego']),
+                    apellidos=self.rng.choice(['García', 'López', 'Martín', 'Sánchez', 'Pérez', 'Gómez', 'Ruiz']),
+                )
+                for i in range(inicio, min(inicio + self.lote, total))
+            ])
+            ids += [u.pk for u in creados]
+            self.progreso("Usuarios", len(ids), total)
+        return ids
+
+    def crear_catalogo(self):
+        existentes = set(TipoEjercicio.objects.values_list('nombre', flat=True))
+        self.guardar(TipoEjercicio, [
+            TipoEjercicio(nombre=nombre, grupo_muscular=grupo, descripcion=f"{nombre} ({grupo.lower()})")
+            for grupo, nombres in CATALOGO.items() for nombre in nombres if nombre not in existentes
+        ])
+        # bulk_create no lanza la señal que invalida el catálogo cacheado y su ETag
+        invalidar_catalogo()
+        return list(TipoEjercicio.objects.order_by('id').values_list('id', flat=True))
+
+    def crear_amistades(self, usuarios, total):
+        """Devuelve los amigos aceptados de cada usuario, para repartir las publicaciones"""
+        amigos = {u: [] for u in usuarios}
+        # Pares ya usados, en cualquier sentido, codificados como un entero
+        vistos = set()
+        n = len(usuarios)
+        filas = []
+        creadas = 0
+        while creadas + len(filas) < total:
+            a, b = self.rng.randrange(n), self.rng.randrange(n)
+            par = min(a, b) * n + max(a, b)
+            if a == b or par in vistos:
+                continue
+            vistos.add(par)
+            status = self.rng.choices(['aceptada', 'pendiente', 'rechazada'], weights=[80, 15, 5])[0]
+            usuario, amigo = usuarios[a], usuarios[b]
+            filas.append(Amistad(usuario_id=usuario, amigo_id=amigo, status=status))
+            if status == 'aceptada':
+                amigos[usuario].append(amigo)
+                amigos[amigo].append(usuario)
+            if len(filas) == self.lote:
+                self.guardar(Amistad, filas)
+                creadas += len(filas)
+                filas = []
+                self.progreso("Amistades", creadas, total)
+        self.guardar(Amistad, filas)
+        self.progreso("Amistades", creadas + len(filas), total)
+        return amigos
+
+    def crear_rutinas(self, usuarios, tipos, por_usuario):
+        for inicio in range(0, len(usuarios), self.lote):
+            rutinas = self.guardar(Rutina, [
+                Rutina(usuario_id=usuario, nombre=f"Rutina {dia}", dia=dia)
+                for usuario in usuarios[inicio:inicio + self.lote]
+                for dia in self.rng.sample(DIAS, min(por_usuario, len(DIAS)))
+            ])
+            self.guardar(EjercicioRutina, [
+                EjercicioRutina(
+                    rutina_id=rutina.pk, tipo_ejercicio_id=tipo, orden=orden,
+                    sets=self.rng.randint(3, 5), repeticiones=self.rng.choice([5, 8, 10, 12, 15]),
+                )
+                for rutina in rutinas
+                for orden, tipo in enumerate(self.rng.sample(tipos, min(4, len(tipos))))
+            ])
+            self.progreso("Rutinas de usuarios", min(inicio + self.lote, len(usuarios)), len(usuarios))
+
+    def crear_publicaciones(self, usuarios, amigos, total, total_likes):
+        """
+        Publicaciones con su timeline ya repartido (bulk_create no lanza las señales que lo
+        hacen) y sus likes, con likes_count coherente
+        """
+        media_likes = total_likes / total if total else 0
+        creadas = likes = 0
+        while creadas < total:
+            tamano = min(self.lote, total - creadas)
+            cuantos = [min(len(usuarios) - 1, int(self.rng.expovariate(1 / media_likes))) if media_likes else 0 for _ in range(tamano)]
+            fechas = [self.ahora - timedelta(seconds=self.rng.randrange(365 * 86400)) for _ in range(tamano)]
+            with transaction.atomic():
+                publicaciones = Publicacion.objects.bulk_create([
+                    Publicacion(
+                        usuario_id=self.rng.choice(usuarios),
+                        contenido=f"Entrenamiento {creadas + i}: {self.rng.choice(['pierna', 'empuje', 'tirón', 'cardio', 'full body'])}",
+                        tipo=self.rng.choice(['general', 'general', 'general', 'record', 'racha']),
+                        likes_count=cuantos[i],
+                    )
+                    for i in range(tamano)
+                ])
+                # auto_now_add pone la hora actual al insertar; las fechas repartidas en el
+                # tiempo se fijan después con un UPDATE
+                for p, fecha in zip(publicaciones, fechas):
+                    p.fecha_creacion = fecha
+                Publicacion.objects.bulk_update(publicaciones, ['fecha_creacion'], batch_size=500)
+            self.guardar(EntradaTimeline, [
+                EntradaTimeline(usuario_id=destino, publicacion_id=p.pk, fecha_creacion=p.fecha_creacion)
+                for p in publicaciones
+                for destino in [p.usuario_id, *amigos[p.usuario_id]]
+            ])
+            self.guardar(Like, [
+                Like(usuario_id=usuario, publicacion_id=p.pk)
+                for p, n in zip(publicaciones, cuantos)
+                for usuario in self.rng.sample(usuarios, n)
+            ])
+            creadas += tamano
+            likes += sum(cuantos)
+            self.progreso(f"Publicaciones ({likes} likes)", creadas, total)
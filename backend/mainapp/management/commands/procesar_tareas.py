@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainapp.tareas import encolar, procesar_tareas, purgar_tareas
+
+
+class Command(BaseCommand):
+    help = "Trabajador de la cola de tareas: publicaciones de récords, reparto del timeline y reconciliación de likes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help="Procesa lo pendiente y termina")
+        parser.add_argument('--lote', type=int, default=20, help="Tareas reservadas en cada vuelta")
+        parser.add_argument('--espera', type=float, default=1.0, help="Segundos de espera si no hay tareas")
+        parser.add_argument(
+            '--reconciliar-cada', type=int, default=3600,
+            help="Encola la reconciliación de likes cada N segundos (0 para desactivarla)",
+        )
+
+    def handle(self, *args, **options):
+        if options['una_vez']:
+            total = 0
+            while procesadas := procesar_tareas(options['lote']):
+                total += procesadas
+            self.stdout.write(self.style.SUCCESS(f"{total} tareas procesadas"))
+            return
+
+        periodo = options['reconciliar_cada']
+        ultimo_periodo = None
+        self.stdout.write("Procesando tareas (Ctrl+C para salir)")
+        try:
+            while True:
+                if periodo and int(time.time() // periodo) != ultimo_periodo:
+                    ultimo_periodo = int(time.time() // periodo)
+                    # La clave evita que varios trabajadores la encolen en el mismo periodo
+                    encolar('reconciliar_likes', clave=f'reconciliar_likes:{periodo}:{ultimo_periodo}')
+                    purgar_tareas()
+                if not procesar_tareas(options['lote']):
+                    time.sleep(options['espera'])
+        except KeyboardInterrupt:
+            self.stdout.write("Trabajador detenido")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Borra por lotes los tokens caducados de la lista negra (sus BlacklistedToken caen en cascada)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Tokens borrados en cada DELETE")
+        parser.add_argument('--dry-run', action='store_true', help="Solo cuenta los tokens que se borrarían")
+
+    def handle(self, *args, **options):
+        caducados = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        if options['dry_run']:
+            self.stdout.write(f"{caducados.count()} tokens caducados")
+            return
+
+        # Lotes pequeños para no bloquear la base de datos con un único DELETE enorme
+        total = 0
+        while ids := list(caducados.order_by('id').values_list('id', flat=True)[:options['lote']]):
+            total += OutstandingToken.objects.filter(id__in=ids).delete()[1].get(OutstandingToken._meta.label, 0)
+        self.stdout.write(self.style.SUCCESS(f"{total} tokens caducados borrados"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.models import Publicacion
+
+
+class Command(BaseCommand):
+    help = "Recalcula likes_count de las publicaciones cuyo contador no coincide con sus likes"
+
+    def handle(self, *args, **options):
+        corregidas = Publicacion.objects.reconciliar_likes()
+        self.stdout.write(self.style.SUCCESS(f"{corregidas} publicaciones corregidas"))
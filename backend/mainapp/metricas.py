@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICAS = {
+    # nombre: (descripción, límites de los buckets)
+    'execcount_http_duracion_segundos': ("Duración de la petición", LIMITES_SEGUNDOS),
+    'execcount_http_consultas_sql': ("Consultas SQL por petición", (0, 1, 2, 3, 5, 10, 20, 50, 100)),
+    'execcount_http_sql_segundos': ("Tiempo en SQL por petición", LIMITES_SEGUNDOS),
+    'execcount_http_respuesta_bytes': ("Tamaño de la respuesta", (256, 1024, 4096, 16384, 65536, 262144, 1048576)),
+}
+
+# Recolector de la petición en curso. Es una ContextVar para que también lo vean las
+# consultas que las vistas asíncronas lanzan en otro hilo con sync_to_async
+recolector_actual = ContextVar('recolector_actual', default=None)
+
+
+class Histograma:
+    __slots__ = ('limites', 'cuentas', 'suma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        # Un bucket por límite más el de +Inf; sin acumular, se acumulan al exportar
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+# Histogramas de todo el proceso, compartidos por todos los hilos. El lock solo cubre unas
+# sumas por petición; con histogramas por hilo, runserver (un hilo por conexión) dejaría
+# uno nuevo por cada conexión sin liberarlo nunca
+_lock = threading.Lock()
+_histogramas = {}
+_respuestas = Counter()
+
+
+def observar(ruta, metodo, estado, valores):
+    with _lock:
+        for nombre, valor in valores.items():
+            clave = (nombre, ruta, metodo)
+            histograma = _histogramas.get(clave)
+            if histograma is None:
+                histograma = _histogramas[clave] = Histograma(METRICAS[nombre][1])
+            histograma.observar(valor)
+        _respuestas[(ruta, metodo, estado)] += 1
+
+
+def reiniciar_metricas():
+    with _lock:
+        _histogramas.clear()
+        _respuestas.clear()
+
+
+class Recolector:
+    """Cuenta y cronometra las consultas de una petición; se engancha con execute_wrapper"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.sql = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_sql += time.perf_counter() - inicio
+            self.consultas += 1
+            self.sql[sql] += 1
+
+
+def registrar_consulta(execute, sql, params, many, context):
+    recolector = recolector_actual.get()
+    if recolector is None:
+        return execute(sql, params, many, context)
+    return recolector(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def instrumentar_conexion(sender, connection, **kwargs):
+    # Como connection.execute_wrapper(), pero para toda la vida de la conexión: así también
+    # cuentan las conexiones que abren los hilos de sync_to_async a mitad de petición
+    if registrar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar_consulta)
+
+
+def nombre_ruta(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<sin_ruta>'
+    return match.url_name or match.route
+
+
+class MetricasMiddleware:
+    """
+    Por cada ruta (nombre de la URL) guarda duración, número y tiempo de consultas SQL y
+    tamaño de la respuesta en histogramas que se exportan en /metrics. Con
+    METRICAS_CABECERA añade X-Consultas-SQL a cada respuesta, y avisa en el log de las
+    peticiones lentas o con la misma consulta repetida (posible N+1).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recolector = Recolector()
+        token = recolector_actual.set(recolector)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            recolector_actual.reset(token)
+        self.registrar(request, response, recolector, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        recolector = Recolector()
+        token = recolector_actual.set(recolector)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            recolector_actual.reset(token)
+        self.registrar(request, response, recolector, time.perf_counter() - inicio)
+        return response
+
+    def registrar(self, request, response, recolector, duracion):
+        ruta = nombre_ruta(request)
+        valores = {
+            'execcount_http_duracion_segundos': duracion,
+            'execcount_http_consultas_sql': recolector.consultas,
+            'execcount_http_sql_segundos': recolector.tiempo_sql,
+        }
+        # El tamaño de un stream (eventos) no se conoce al devolver la respuesta
+        if not response.streaming:
+            valores['execcount_http_respuesta_bytes'] = len(response.content)
+        observar(ruta, request.method, response.status_code, valores)
+
+        if getattr(settings, 'METRICAS_CABECERA', False):
+            response['X-Consultas-SQL'] = str(recolector.consultas)
+            response['X-Tiempo-SQL'] = f"{recolector.tiempo_sql * 1000:.1f}ms"
+        self.avisar(request, ruta, recolector, duracion)
+
+    def avisar(self, request, ruta, recolector, duracion):
+        lenta = duracion >= getattr(settings, 'METRICAS_UMBRAL_LENTA', 1.0)
+        repetidas = [
+            (sql, veces) for sql, veces in recolector.sql.most_common(3)
+            if veces >= getattr(settings, 'METRICAS_UMBRAL_REPETIDAS', 10)
+        ]
+        if not lenta and not repetidas:
+            return
+        logger.warning(
+            "%s %s (%s): %.0f ms, %s consultas en %.0f ms%s%s",
+            request.method, request.path, ruta, duracion * 1000, recolector.consultas, recolector.tiempo_sql * 1000,
+            "; posible N+1" if repetidas else "",
+            "".join(f"\n  {veces}x {sql[:300]}" for sql, veces in repetidas or recolector.sql.most_common(3)),
+        )
+
+
+def escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def exportar_metricas():
+    """Histogramas del proceso en el formato de texto de Prometheus"""
+    # Copia bajo el lock; el texto se genera fuera para no frenar las peticiones
+    with _lock:
+        histogramas = {}
+        for clave, histograma in _histogramas.items():
+            copia = histogramas[clave] = Histograma(histograma.limites)
+            copia.cuentas = list(histograma.cuentas)
+            copia.suma = histograma.suma
+            copia.total = histograma.total
+        respuestas = _respuestas.copy()
+
+    lineas = []
+    por_nombre = defaultdict(list)
+    for (nombre, ruta, metodo), histograma in sorted(histogramas.items()):
+        por_nombre[nombre].append((ruta, metodo, histograma))
+    for nombre, (descripcion, limites) in METRICAS.items():
+        lineas += [f"# HELP {nombre} {descripcion}", f"# TYPE {nombre} histogram"]
+        for ruta, metodo, histograma in por_nombre[nombre]:
+            etiquetas = f'ruta="{escapar(ruta)}",metodo="{metodo}"'
+            acumulado = 0
+            for limite, cuenta in zip(list(limites) + ['+Inf'], histograma.cuentas):
+                acumulado += cuenta
+                lineas.append(f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f"{nombre}_sum{{{etiquetas}}} {histograma.suma}")
+            lineas.append(f"{nombre}_count{{{etiquetas}}} {histograma.total}")
+
+    lineas += ["# HELP execcount_http_respuestas_total Respuestas por ruta y código", "# TYPE execcount_http_respuestas_total counter"]
+    for (ruta, metodo, estado), total in sorted(respuestas.items()):
+        lineas.append(f'execcount_http_respuestas_total{{ruta="{escapar(ruta)}",metodo="{metodo}",estado="{estado}"}} {total}')
+    return "\n".join(lineas) + "\n"
+
+
+def vista_metricas(request):
+    # Sin token solo es pública en desarrollo (DEBUG)
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(exportar_metricas(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TipoEjercicio',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('grupo_muscular', models.CharField(max_length=100)),
+                ('descripcion', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Publicacion',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('contenido', models.TextField()),
+                ('tipo', models.CharField(max_length=50)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='publicaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Rutina',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('dia', models.CharField(choices=[('lunes', 'Lunes'), ('martes', 'Martes'), ('miércoles', 'Miércoles'), ('jueves', 'Jueves'), ('viernes', 'Viernes'), ('sábado', 'Sábado'), ('domingo', 'Domingo')], max_length=10)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rutinas', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EjercicioRutina',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('sets', models.PositiveIntegerField()),
+                ('repeticiones', models.PositiveIntegerField()),
+                ('record_peso', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('orden', models.PositiveIntegerField(default=0)),
+                ('rutina', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ejercicios', to='mainapp.rutina')),
+                ('tipo_ejercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.tipoejercicio')),
+            ],
+            options={
+                'ordering': ['orden'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Amistad',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pendiente', 'Pendiente'), ('aceptada', 'Aceptada'), ('rechazada', 'Rechazada')], default='pendiente', max_length=20)),
+                ('amigo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='amistades_recibidas', to=settings.AUTH_USER_MODEL)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='amistades_solicitadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('usuario', 'amigo')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Like',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to=settings.AUTH_USER_MODEL)),
+                ('publicacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='mainapp.publicacion')),
+            ],
+            options={
+                'unique_together': {('usuario', 'publicacion')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0002_tipoejercicio_publicacion_rutina_ejerciciorutina_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='publicacion',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='publicacion_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def rellenar_timelines(apps, schema_editor):
+    Amistad = apps.get_model('mainapp', 'Amistad')
+    Publicacion = apps.get_model('mainapp', 'Publicacion')
+    EntradaTimeline = apps.get_model('mainapp', 'EntradaTimeline')
+
+    amigos = {}
+    for usuario_id, amigo_id in Amistad.objects.filter(status='aceptada').values_list('usuario_id', 'amigo_id'):
+        amigos.setdefault(usuario_id, set()).add(amigo_id)
+        amigos.setdefault(amigo_id, set()).add(usuario_id)
+
+    entradas = []
+    for pk, autor_id, fecha in Publicacion.objects.values_list('id', 'usuario_id', 'fecha_creacion').iterator():
+        for destino in amigos.get(autor_id, set()) | {autor_id}:
+            entradas.append(EntradaTimeline(usuario_id=destino, publicacion_id=pk, fecha_creacion=fecha))
+    EntradaTimeline.objects.bulk_create(entradas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0003_publicacion_feed_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntradaTimeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField()),
+                ('publicacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas_timeline', to='mainapp.publicacion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario', '-fecha_creacion', '-publicacion'], name='timeline_usuario_idx')],
+                'unique_together': {('usuario', 'publicacion')},
+            },
+        ),
+        migrations.RunPython(rellenar_timelines, migrations.RunPython.noop),
+    ]
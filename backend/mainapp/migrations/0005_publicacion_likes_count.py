@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def calcular_likes_count(apps, schema_editor):
+    Publicacion = apps.get_model('mainapp', 'Publicacion')
+    Like = apps.get_model('mainapp', 'Like')
+    Publicacion.objects.update(likes_count=Coalesce(Subquery(
+        Like.objects.filter(publicacion=OuterRef('pk'))
+        .order_by().values('publicacion').annotate(total=Count('*')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0004_entradatimeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicacion',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(calcular_likes_count, migrations.RunPython.noop),
+    ]
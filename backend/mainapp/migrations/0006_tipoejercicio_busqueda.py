@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+# Índice de texto completo (FTS5) sobre el catálogo de ejercicios. remove_diacritics
+# permite buscar "triceps" y encontrar "tríceps". Los triggers lo mantienen al día.
+CREAR_FTS = [
+    """
+    CREATE VIRTUAL TABLE mainapp_tipoejercicio_fts USING fts5(
+        nombre, grupo_muscular, descripcion,
+        content='mainapp_tipoejercicio', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER mainapp_tipoejercicio_fts_ai AFTER INSERT ON mainapp_tipoejercicio BEGIN
+        INSERT INTO mainapp_tipoejercicio_fts(rowid, nombre, grupo_muscular, descripcion)
+        VALUES (new.id, new.nombre, new.grupo_muscular, new.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER mainapp_tipoejercicio_fts_ad AFTER DELETE ON mainapp_tipoejercicio BEGIN
+        INSERT INTO mainapp_tipoejercicio_fts(mainapp_tipoejercicio_fts, rowid, nombre, grupo_muscular, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.grupo_muscular, old.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER mainapp_tipoejercicio_fts_au AFTER UPDATE ON mainapp_tipoejercicio BEGIN
+        INSERT INTO mainapp_tipoejercicio_fts(mainapp_tipoejercicio_fts, rowid, nombre, grupo_muscular, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.grupo_muscular, old.descripcion);
+        INSERT INTO mainapp_tipoejercicio_fts(rowid, nombre, grupo_muscular, descripcion)
+        VALUES (new.id, new.nombre, new.grupo_muscular, new.descripcion);
+    END
+    """,
+    "INSERT INTO mainapp_tipoejercicio_fts(mainapp_tipoejercicio_fts) VALUES ('rebuild')",
+]
+
+BORRAR_FTS = [
+    "DROP TRIGGER IF EXISTS mainapp_tipoejercicio_fts_ai",
+    "DROP TRIGGER IF EXISTS mainapp_tipoejercicio_fts_ad",
+    "DROP TRIGGER IF EXISTS mainapp_tipoejercicio_fts_au",
+    "DROP TABLE IF EXISTS mainapp_tipoejercicio_fts",
+]
+
+
+def ejecutar(sentencias):
+    def operacion(apps, schema_editor):
+        # En otras bases de datos la búsqueda usa el fallback con icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in sentencias:
+            schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0005_publicacion_likes_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tipoejercicio',
+            index=models.Index(fields=['grupo_muscular'], name='tipoejercicio_grupo_idx'),
+        ),
+        migrations.RunPython(ejecutar(CREAR_FTS), ejecutar(BORRAR_FTS)),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def quitar_duplicados(apps, schema_editor):
+    """Si existen A->B y B->A se conserva una sola: la aceptada o, si no, la más antigua"""
+    Amistad = apps.get_model('mainapp', 'Amistad')
+    prioridad = {'aceptada': 0, 'pendiente': 1, 'rechazada': 2}
+    conservadas = {}
+    sobrantes = []
+    for pk, usuario_id, amigo_id, status in Amistad.objects.order_by('id').values_list('id', 'usuario_id', 'amigo_id', 'status'):
+        par = (min(usuario_id, amigo_id), max(usuario_id, amigo_id))
+        actual = conservadas.get(par)
+        if actual is None:
+            conservadas[par] = (prioridad[status], pk)
+        elif prioridad[status] < actual[0]:
+            sobrantes.append(actual[1])
+            conservadas[par] = (prioridad[status], pk)
+        else:
+            sobrantes.append(pk)
+    Amistad.objects.filter(id__in=sobrantes).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0006_tipoejercicio_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_duplicados, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='amistad',
+            name='usuario_max',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Greatest('usuario', 'amigo'), output_field=models.BigIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='amistad',
+            name='usuario_min',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Least('usuario', 'amigo'), output_field=models.BigIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='amistad',
+            index=models.Index(fields=['usuario', 'status'], name='amistad_usuario_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='amistad',
+            index=models.Index(fields=['amigo', 'status'], name='amistad_amigo_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='amistad',
+            constraint=models.UniqueConstraint(fields=('usuario_min', 'usuario_max'), name='amistad_par_unico'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0008_usuario_indices_lower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Serie',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('peso', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('repeticiones', models.PositiveSmallIntegerField()),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tipo_ejercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='mainapp.tipoejercicio')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario', 'tipo_ejercicio', 'fecha'], name='serie_usuario_ejercicio_idx'), models.Index(fields=['usuario', '-fecha', '-id'], name='serie_usuario_fecha_idx')],
+            },
+        ),
+    ]
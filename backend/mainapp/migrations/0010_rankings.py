@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def calcular_records(apps, schema_editor):
+    EjercicioRutina = apps.get_model('mainapp', 'EjercicioRutina')
+    Serie = apps.get_model('mainapp', 'Serie')
+    RecordEjercicio = apps.get_model('mainapp', 'RecordEjercicio')
+    mejores = {}
+    filas = list(
+        EjercicioRutina.objects.filter(record_peso__isnull=False).order_by()
+        .values_list('rutina__usuario_id', 'tipo_ejercicio_id').annotate(maximo=Max('record_peso'))
+    ) + list(
+        Serie.objects.order_by().values_list('usuario_id', 'tipo_ejercicio_id').annotate(maximo=Max('peso'))
+    )
+    for usuario_id, tipo_ejercicio_id, maximo in filas:
+        clave = (usuario_id, tipo_ejercicio_id)
+        mejores[clave] = max(mejores.get(clave, maximo), maximo)
+    RecordEjercicio.objects.bulk_create([
+        RecordEjercicio(usuario_id=usuario_id, tipo_ejercicio_id=tipo_ejercicio_id, peso=peso)
+        for (usuario_id, tipo_ejercicio_id), peso in mejores.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0009_serie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RachaUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='racha', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('actual', models.PositiveIntegerField(default=0)),
+                ('mejor', models.PositiveIntegerField(default=0)),
+                ('ultimo_dia', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecordEjercicio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('peso', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tipo_ejercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='mainapp.tipoejercicio')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tipo_ejercicio', '-peso'], name='record_ranking_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'tipo_ejercicio'), name='record_usuario_ejercicio_unico')],
+            },
+        ),
+        migrations.RunPython(calcular_records, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
+from django.utils import timezone
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least, Lower
 
 class UsuarioManager(BaseUserManager):
     def create_user(self, email, username, nombre, apellidos, password=None):
@@ -31,22 +34,66 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['nombre', 'apellidos', 'username']
 
+    class Meta:
+        indexes = [
+            # Búsquedas sin distinguir mayúsculas (mainapp.usuarios)
+            models.Index(Lower('username'), name='usuario_username_lower_idx'),
+            models.Index(Lower('email'), name='usuario_email_lower_idx'),
+        ]
+
     def __str__(self):
         return self.email
     
+class AmistadQuerySet(models.QuerySet):
+    def de_usuario(self, usuario):
+        """
+        Amistades en las que participa el usuario, en cualquier sentido. Se hace como
+        UNION de dos búsquedas por índice en vez de un OR sobre dos claves ajenas.
+        """
+        return self.filter(usuario=usuario).union(self.filter(amigo=usuario), all=True)
+
+    def entre(self, usuario_id, otro_id):
+        """La relación entre dos usuarios, sea cual sea quién la pidió"""
+        return self.filter(usuario_min=min(usuario_id, otro_id), usuario_max=max(usuario_id, otro_id))
+
+
 class Amistad(models.Model):
     id = models.AutoField(primary_key=True)
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='amistades_solicitadas')
     amigo = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='amistades_recibidas')
     status = models.CharField(max_length=20, choices=[('pendiente', 'Pendiente'), ('aceptada', 'Aceptada'), ('rechazada', 'Rechazada')], default='pendiente')
+    # Par ordenado (menor id, mayor id): la misma pareja en cualquier sentido da el mismo par
+    usuario_min = models.GeneratedField(
+        expression=Least('usuario', 'amigo'), output_field=models.BigIntegerField(), db_persist=True
+    )
+    usuario_max = models.GeneratedField(
+        expression=Greatest('usuario', 'amigo'), output_field=models.BigIntegerField(), db_persist=True
+    )
+
+    objects = AmistadQuerySet.as_manager()
 
     class Meta:
         unique_together = ('usuario', 'amigo')
+        constraints = [
+            models.UniqueConstraint(fields=['usuario_min', 'usuario_max'], name='amistad_par_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', 'status'], name='amistad_usuario_status_idx'),
+            models.Index(fields=['amigo', 'status'], name='amistad_amigo_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usuario} -> {self.amigo} ({self.status})"
 
 
+class RutinaQuerySet(models.QuerySet):
+    def con_ejercicios(self):
+        """Carga los ejercicios y su tipo en una sola consulta extra, para cualquier número de rutinas"""
+        return self.prefetch_related(
+            Prefetch('ejercicios', queryset=EjercicioRutina.objects.select_related('tipo_ejercicio'))
+        )
+
+
 class Rutina(models.Model):
     id = models.AutoField(primary_key=True)
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='rutinas')
@@ -64,6 +111,8 @@ class Rutina(models.Model):
         ]
     )
 
+    objects = RutinaQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.nombre} ({self.dia}) - {self.usuario.username}"
 
@@ -74,6 +123,11 @@ class TipoEjercicio(models.Model):
     grupo_muscular = models.CharField(max_length=100)
     descripcion = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['grupo_muscular'], name='tipoejercicio_grupo_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombre} - {self.grupo_muscular}"
 
@@ -94,17 +148,123 @@ class EjercicioRutina(models.Model):
         return f"{self.tipo_ejercicio.nombre} en {self.rutina.nombre}"
 
 
+class Serie(models.Model):
+    # Registro de cada serie hecha: una fila por serie, sin texto, para que quepan muchas por usuario
+    id = models.BigAutoField(primary_key=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='series')
+    tipo_ejercicio = models.ForeignKey(TipoEjercicio, on_delete=models.CASCADE, related_name='series')
+    peso = models.DecimalField(max_digits=6, decimal_places=2)
+    repeticiones = models.PositiveSmallIntegerField()
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Historial por ejercicio (récords, 1RM) y listado/volumen por fecha
+            models.Index(fields=['usuario', 'tipo_ejercicio', 'fecha'], name='serie_usuario_ejercicio_idx'),
+            models.Index(fields=['usuario', '-fecha', '-id'], name='serie_usuario_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo_ejercicio_id}: {self.peso} x {self.repeticiones} ({self.usuario_id})"
+
+
+class RecordEjercicio(models.Model):
+    # Ranking materializado: mejor peso de cada usuario por ejercicio (rutinas y series).
+    # Lo mantienen las señales de EjercicioRutina y Serie (ver rankings.py)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='records')
+    tipo_ejercicio = models.ForeignKey(TipoEjercicio, on_delete=models.CASCADE, related_name='records')
+    peso = models.DecimalField(max_digits=6, decimal_places=2)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'tipo_ejercicio'], name='record_usuario_ejercicio_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['tipo_ejercicio', '-peso'], name='record_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.peso} en {self.tipo_ejercicio_id}"
+
+
+class RachaUsuario(models.Model):
+    # Días seguidos con al menos una serie; se actualiza al registrar series
+    usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True, related_name='racha')
+    actual = models.PositiveIntegerField(default=0)
+    mejor = models.PositiveIntegerField(default=0)
+    ultimo_dia = models.DateField()
+
+    def __str__(self):
+        return f"Racha de {self.usuario_id}: {self.actual} (mejor {self.mejor})"
+
+
+class PublicacionQuerySet(models.QuerySet):
+    def para_feed(self, usuario):
+        """Anota si el usuario dio like, sin consultas por publicación"""
+        return self.select_related('usuario').annotate(
+            liked=Exists(Like.objects.filter(publicacion=OuterRef('pk'), usuario_id=usuario.pk)),
+        )
+
+    def feed_de(self, usuario):
+        """
+        Publicaciones del usuario y sus amigos, leídas del timeline precalculado. Las
+        columnas de la entrada se exponen como alias para ordenar y paginar por ellas: un
+        filter() posterior sobre entradas_timeline__* añadiría otro JOIN, sin filtrar por
+        usuario, con las entradas de todos los timelines.
+        """
+        return self.para_feed(usuario).filter(entradas_timeline__usuario=usuario).alias(
+            fecha_timeline=F('entradas_timeline__fecha_creacion'),
+            publicacion_timeline=F('entradas_timeline__publicacion'),
+        ).order_by('-fecha_timeline', '-publicacion_timeline')
+
+    def reconciliar_likes(self):
+        """Corrige en bloque los likes_count que no coinciden con las filas de Like"""
+        reales = Coalesce(Subquery(
+            Like.objects.filter(publicacion=OuterRef('pk'))
+            .order_by().values('publicacion').annotate(total=Count('*')).values('total')
+        ), 0)
+        desfasadas = self.annotate(reales=reales).exclude(likes_count=F('reales'))
+        return self.model.objects.filter(pk__in=desfasadas.values('pk')).update(likes_count=reales)
+
+
 class Publicacion(models.Model):
     id = models.AutoField(primary_key=True)
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='publicaciones')
     contenido = models.TextField()
     tipo = models.CharField(max_length=50)  # Ej: "record", "racha", etc.
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Contador desnormalizado; lo mantienen LikeCreateView/LikeDeleteView
+    likes_count = models.PositiveIntegerField(default=0)
+
+    objects = PublicacionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Soporta la paginación por cursor del feed
+            models.Index(fields=['-fecha_creacion', '-id'], name='publicacion_feed_idx'),
+        ]
 
     def __str__(self):
         return f"Publicación de {self.usuario} - {self.tipo}"
 
 
+class EntradaTimeline(models.Model):
+    # Copia desnormalizada del feed de cada usuario: sus publicaciones y las de sus amigos
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='timeline')
+    publicacion = models.ForeignKey(Publicacion, on_delete=models.CASCADE, related_name='entradas_timeline')
+    fecha_creacion = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('usuario', 'publicacion')
+        indexes = [
+            models.Index(fields=['usuario', '-fecha_creacion', '-publicacion'], name='timeline_usuario_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.publicacion_id} en el timeline de {self.usuario_id}"
+
+
 class Like(models.Model):
     id = models.AutoField(primary_key=True)
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='likes')
@@ -114,4 +274,36 @@ class Like(models.Model):
         unique_together = ('usuario', 'publicacion')
 
     def __str__(self):
-        return f"{self.usuario} le dio like a {self.publicacion.id}"
\ No newline at end of file
+        return f"{self.usuario} le dio like a {self.publicacion.id}"
+
+
+class Tarea(models.Model):
+    # Cola de trabajos en la base de datos; la procesa `manage.py procesar_tareas` (ver tareas.py)
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('hecha', 'Hecha'),
+        ('fallida', 'Fallida'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    nombre = models.CharField(max_length=50)
+    datos = models.JSONField(default=dict)
+    # Clave de idempotencia: una tarea con la misma clave no se vuelve a encolar
+    clave = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    # Si el trabajador muere a mitad, otro la recoge cuando pase esta fecha
+    bloqueada_hasta = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'ejecutar_desde'], name='tarea_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} #{self.id} ({self.estado})"
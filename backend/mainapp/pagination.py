@@ -0,0 +1,123 @@
+import base64
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class FeedCursorPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre (fecha_creacion, id), en orden descendente.
+    Cada página filtra a partir de la última publicación vista, así que la página N
+    cuesta lo mismo que la primera. Con ?completo=1 se devuelve la lista entera.
+
+    La vista puede definir `cursor_fields` para paginar sobre otras columnas con los
+    mismos valores (por ejemplo, las copias de la tabla de timeline). Si son de una relación
+    multivaluada, tienen que ser alias del queryset (ver Publicacion.objects.feed_de): con
+    el camino `relacion__campo`, el filtro del cursor añadiría su propio JOIN.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    completo_query_param = 'completo'
+    max_page_size = 100
+    cursor_fields = ('fecha_creacion', 'id')
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'FEED_PAGE_SIZE', 20)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except ValueError:
+            pass
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, publicacion):
+        raw = f"{publicacion.fecha_creacion.isoformat()}|{publicacion.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            fecha, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            fecha = parse_datetime(fecha)
+            pk = int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound('Cursor inválido')
+        if fecha is None:
+            raise NotFound('Cursor inválido')
+        return fecha, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        consulta = self.consulta_pagina(queryset, request, view)
+        if consulta is None:
+            return None
+        return self.fijar_pagina(list(consulta))
+
+    def consulta_pagina(self, queryset, request, view=None):
+        """
+        La consulta de la página pedida, sin ejecutar (o None con ?completo=1), para que
+        las vistas asíncronas puedan leerla con el ORM asíncrono y pasarla a fijar_pagina()
+        """
+        if request.query_params.get(self.completo_query_param):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        campo_fecha, campo_id = getattr(view, 'cursor_fields', self.cursor_fields)
+        queryset = queryset.order_by(f'-{campo_fecha}', f'-{campo_id}')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            fecha, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{campo_fecha}__lt': fecha}) | Q(**{campo_fecha: fecha, f'{campo_id}__lt': pk})
+            )
+
+        # Pedimos un elemento de más para saber si hay página siguiente
+        return queryset[:self.page_size + 1]
+
+    def fijar_pagina(self, resultados):
+        self.has_next = len(resultados) > self.page_size
+        self.page = resultados[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class UsuarioCursorPagination(CursorPagination):
+    """Paginación por cursor sobre la clave primaria del directorio de usuarios"""
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class SerieCursorPagination(CursorPagination):
+    """Historial de series del usuario, de la más reciente a la más antigua"""
+    ordering = ('-fecha', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F, FloatField, Max, Sum, Value, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import Coalesce, Round, TruncWeek
+from django.utils import timezone
+
+from .models import Serie
+
+# 1RM estimado con la fórmula de Epley: peso * (1 + repeticiones / 30)
+UNO_RM = ExpressionWrapper(
+    F('peso') * (Value(1.0) + F('repeticiones') / Value(30.0)), output_field=FloatField()
+)
+VOLUMEN = ExpressionWrapper(F('peso') * F('repeticiones'), output_field=FloatField())
+
+
+def series_de(usuario, tipo_ejercicio=None):
+    series = Serie.objects.filter(usuario=usuario)
+    if tipo_ejercicio is not None:
+        series = series.filter(tipo_ejercicio_id=tipo_ejercicio)
+    return series.order_by()
+
+
+def resumen_por_ejercicio(series):
+    return list(
+        series.values('tipo_ejercicio', nombre=F('tipo_ejercicio__nombre'))
+        .annotate(
+            series=Count('id'),
+            mejor_peso=Max('peso'),
+            mejor_1rm=Round(Max(UNO_RM), 2),
+            volumen=Round(Sum(VOLUMEN), 2),
+            ultima=Max('fecha'),
+        )
+        .order_by('nombre', 'tipo_ejercicio')
+    )
+
+
+def historial_records(series):
+    """
+    Series que superaron el mayor peso anterior del mismo ejercicio. El máximo previo
+    se calcula con una ventana por ejercicio en la propia consulta.
+    """
+    anterior = Window(
+        Max('peso'),
+        partition_by=[F('tipo_ejercicio_id')],
+        order_by=[F('fecha').asc(), F('id').asc()],
+        frame=RowRange(start=None, end=-1),
+    )
+    return list(
+        series.annotate(anterior=anterior)
+        .filter(peso__gt=Coalesce(F('anterior'), Value(-1), output_field=DecimalField()))
+        .values('id', 'tipo_ejercicio', 'peso', 'repeticiones', 'fecha', 'anterior')
+        .order_by('tipo_ejercicio', 'fecha', 'id')
+    )
+
+
+def volumen_semanal(series, semanas):
+    desde = timezone.now() - timedelta(weeks=semanas)
+    return list(
+        series.filter(fecha__gte=desde)
+        .annotate(semana=TruncWeek('fecha', output_field=DateField()))
+        .values('semana', 'tipo_ejercicio')
+        .annotate(
+            series=Count('id'),
+            volumen=Round(Sum(VOLUMEN), 2),
+            mejor_1rm=Round(Max(UNO_RM), 2),
+        )
+        .order_by('semana', 'tipo_ejercicio')
+    )
+
+
+def analiticas(usuario, tipo_ejercicio=None, semanas=12):
+    """Resumen, récords y volumen semanal: tres consultas agregadas, sin recorrer series en Python"""
+    series = series_de(usuario, tipo_ejercicio)
+    return {
+        'ejercicios': resumen_por_ejercicio(series),
+        'records': historial_records(series),
+        'volumen_semanal': volumen_semanal(series, semanas),
+    }
@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Max, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .amistades import amigos_aceptados
+from .models import EjercicioRutina, RachaUsuario, RecordEjercicio, Serie
+
+
+def supera_record(nuevo, anterior):
+    return nuevo is not None and (anterior is None or nuevo > anterior)
+
+
+def subir_record(usuario_id, tipo_ejercicio_id, peso):
+    """Camino rápido al guardar un peso nuevo: solo escribe si supera el récord actual"""
+    if peso is None:
+        return
+    mejorado = RecordEjercicio.objects.filter(
+        usuario_id=usuario_id, tipo_ejercicio_id=tipo_ejercicio_id, peso__lt=peso
+    ).update(peso=peso, fecha=timezone.now())
+    if mejorado:
+        return
+    try:
+        with transaction.atomic():
+            RecordEjercicio.objects.get_or_create(
+                usuario_id=usuario_id, tipo_ejercicio_id=tipo_ejercicio_id, defaults={'peso': peso}
+            )
+    except IntegrityError:
+        # Otra petición creó la fila a la vez: basta con repetir la subida condicional
+        subir_record(usuario_id, tipo_ejercicio_id, peso)
+
+
+def actualizar_records(usuario_id, tipo_ejercicio_ids):
+    """
+    Recalcula desde cero los récords del usuario en esos ejercicios (mayor record_peso de sus
+    rutinas o mayor peso de sus series). Se usa cuando un récord puede bajar: ediciones y borrados.
+    """
+    tipo_ejercicio_ids = set(tipo_ejercicio_ids)
+    if not tipo_ejercicio_ids:
+        return
+    mejores = dict.fromkeys(tipo_ejercicio_ids)
+    # Máximo de rutinas y de series en una sola consulta (UNION ALL)
+    rutinas = (
+        EjercicioRutina.objects.filter(
+            rutina__usuario_id=usuario_id, tipo_ejercicio__in=tipo_ejercicio_ids, record_peso__isnull=False
+        ).order_by().values_list('tipo_ejercicio').annotate(maximo=Max('record_peso'))
+    )
+    series = (
+        Serie.objects.filter(usuario_id=usuario_id, tipo_ejercicio__in=tipo_ejercicio_ids)
+        .order_by().values_list('tipo_ejercicio').annotate(maximo=Max('peso'))
+    )
+    for tipo_ejercicio_id, maximo in rutinas.union(series, all=True):
+        actual = mejores[tipo_ejercicio_id]
+        mejores[tipo_ejercicio_id] = maximo if actual is None else max(actual, maximo)
+
+    actuales = dict(
+        RecordEjercicio.objects.filter(usuario_id=usuario_id, tipo_ejercicio_id__in=tipo_ejercicio_ids)
+        .values_list('tipo_ejercicio_id', 'peso')
+    )
+    sin_record = [t for t, peso in mejores.items() if peso is None and t in actuales]
+    if sin_record:
+        RecordEjercicio.objects.filter(usuario_id=usuario_id, tipo_ejercicio_id__in=sin_record).delete()
+    cambiados = [
+        RecordEjercicio(usuario_id=usuario_id, tipo_ejercicio_id=t, peso=peso)
+        for t, peso in mejores.items() if peso is not None and actuales.get(t) != peso
+    ]
+    if cambiados:
+        RecordEjercicio.objects.bulk_create(
+            cambiados, update_conflicts=True,
+            unique_fields=['usuario', 'tipo_ejercicio'], update_fields=['peso', 'fecha'],
+        )
+
+
+def sumar_dia_racha(usuario_id, fecha):
+    """Camino rápido al registrar una serie: extiende o reinicia la racha sin leer el historial"""
+    dia = timezone.localdate(fecha)
+    racha, creada = RachaUsuario.objects.get_or_create(
+        usuario_id=usuario_id, defaults={'actual': 1, 'mejor': 1, 'ultimo_dia': dia}
+    )
+    if creada or dia == racha.ultimo_dia:
+        return
+    if dia < racha.ultimo_dia:
+        # Serie anotada con fecha pasada: puede unir dos rachas, hay que recalcular
+        recalcular_racha(usuario_id)
+        return
+    racha.actual = racha.actual + 1 if dia == racha.ultimo_dia + timedelta(days=1) else 1
+    racha.mejor = max(racha.mejor, racha.actual)
+    racha.ultimo_dia = dia
+    racha.save(update_fields=['actual', 'mejor', 'ultimo_dia'])
+
+
+def recalcular_racha(usuario_id):
+    dias = list(
+        Serie.objects.filter(usuario_id=usuario_id).annotate(dia=TruncDate('fecha'))
+        .values_list('dia', flat=True).distinct().order_by('dia')
+    )
+    if not dias:
+        RachaUsuario.objects.filter(usuario_id=usuario_id).delete()
+        return
+    actual = mejor = 1
+    for anterior, dia in zip(dias, dias[1:]):
+        actual = actual + 1 if dia == anterior + timedelta(days=1) else 1
+        mejor = max(mejor, actual)
+    RachaUsuario.objects.update_or_create(
+        usuario_id=usuario_id, defaults={'actual': actual, 'mejor': mejor, 'ultimo_dia': dias[-1]}
+    )
+
+
+def participantes(usuario):
+    return amigos_aceptados(usuario.id) | {usuario.id}
+
+
+def ranking_records(usuario, tipo_ejercicio_id, limite=10):
+    """Top del usuario y sus amigos en un ejercicio, leído solo de la tabla de récords"""
+    return list(
+        RecordEjercicio.objects.filter(tipo_ejercicio_id=tipo_ejercicio_id, usuario_id__in=participantes(usuario))
+        .select_related('usuario').only('usuario__username', 'peso', 'fecha')
+        .order_by('-peso', 'fecha', 'usuario_id')[:limite]
+    )
+
+
+def ranking_rachas(usuario, limite=10):
+    """Top de rachas; una racha cuyo último día es anterior a ayer ya está rota y cuenta como 0"""
+    ayer = timezone.localdate() - timedelta(days=1)
+    return list(
+        RachaUsuario.objects.filter(usuario_id__in=participantes(usuario))
+        .annotate(vigente=Case(When(ultimo_dia__gte=ayer, then=F('actual')), default=Value(0)))
+        .select_related('usuario').only('usuario__username', 'actual', 'mejor', 'ultimo_dia')
+        .order_by('-vigente', '-mejor', 'usuario_id')[:limite]
+    )
@@ -1,6 +1,10 @@
 from rest_framework import serializers
-from .models import Amistad, Like, Publicacion, Usuario, Rutina, TipoEjercicio, EjercicioRutina
+from .models import Amistad, Like, Publicacion, Serie, Usuario, Rutina, TipoEjercicio, EjercicioRutina
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
+from .amistades import relacion
+from .campos import CamposDinamicosMixin
+from .usuarios import buscar_usuario
 
 class RegistroSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -25,19 +29,35 @@ class RegistroSerializer(serializers.ModelSerializer):
             password=validated_data['password']
         )
     
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Usuario
         fields = ['id', 'email', 'username', 'nombre', 'apellidos']
         read_only_fields = ['id', 'email', 'username']  
 
-class TipoEjercicioSerializer(serializers.ModelSerializer):
+class UsuarioSugerenciaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    relacion = serializers.SerializerMethodField()
+    requisitos = {'relacion': []}
+
+    class Meta:
+        model = Usuario
+        fields = ['id', 'username', 'nombre', 'apellidos', 'relacion']
+
+    def get_relacion(self, obj):
+        """Amistad con el usuario logueado: 'aceptada', 'enviada', 'recibida' o None"""
+        return relacion(self.context['request'].user.id, obj.id)
+
+class TipoEjercicioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = TipoEjercicio
         fields = '__all__'
 
-class EjercicioRutinaSerializer(serializers.ModelSerializer):
+class EjercicioRutinaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     nombre_ejercicio = serializers.SerializerMethodField()
+    campos_expandibles = {
+        'tipo_ejercicio': lambda: TipoEjercicioSerializer(read_only=True),
+    }
+    requisitos = {'nombre_ejercicio': ['tipo_ejercicio__nombre']}
 
     class Meta:
         model = EjercicioRutina
@@ -47,7 +67,57 @@ class EjercicioRutinaSerializer(serializers.ModelSerializer):
     def get_nombre_ejercicio(self, obj):
         return obj.tipo_ejercicio.nombre
 
-class RutinaSerializer(serializers.ModelSerializer):
+class SerieSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    nombre_ejercicio = serializers.CharField(source='tipo_ejercicio.nombre', read_only=True)
+    campos_expandibles = {
+        'tipo_ejercicio': lambda: TipoEjercicioSerializer(read_only=True),
+    }
+
+    class Meta:
+        model = Serie
+        fields = ['id', 'tipo_ejercicio', 'nombre_ejercicio', 'peso', 'repeticiones', 'fecha']
+
+    def validate_peso(self, value):
+        if value < 0:
+            raise serializers.ValidationError("El peso no puede ser negativo")
+        return value
+
+    def validate_repeticiones(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Una serie tiene al menos una repetición")
+        return value
+
+# Para el endpoint de lote se usan ids en vez de PrimaryKeyRelatedField, que haría
+# una consulta por elemento; la existencia de los tipos se comprueba de una vez en la vista
+class EjercicioRutinaLoteCrearSerializer(serializers.Serializer):
+    tipo_ejercicio = serializers.IntegerField()
+    sets = serializers.IntegerField(min_value=0)
+    repeticiones = serializers.IntegerField(min_value=0)
+    record_peso = serializers.DecimalField(max_digits=6, decimal_places=2, allow_null=True, required=False)
+    orden = serializers.IntegerField(min_value=0, default=0)
+
+class EjercicioRutinaLoteActualizarSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    tipo_ejercicio = serializers.IntegerField(required=False)
+    sets = serializers.IntegerField(min_value=0, required=False)
+    repeticiones = serializers.IntegerField(min_value=0, required=False)
+    record_peso = serializers.DecimalField(max_digits=6, decimal_places=2, allow_null=True, required=False)
+    orden = serializers.IntegerField(min_value=0, required=False)
+
+class EjercicioRutinaLoteSerializer(serializers.Serializer):
+    crear = EjercicioRutinaLoteCrearSerializer(many=True, required=False, default=list)
+    actualizar = EjercicioRutinaLoteActualizarSerializer(many=True, required=False, default=list)
+    eliminar = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, data):
+        ids_actualizar = [e['id'] for e in data['actualizar']]
+        if len(ids_actualizar) != len(set(ids_actualizar)):
+            raise serializers.ValidationError({"actualizar": "Hay ejercicios repetidos."})
+        if set(ids_actualizar) & set(data['eliminar']):
+            raise serializers.ValidationError("No se puede actualizar y eliminar el mismo ejercicio.")
+        return data
+
+class RutinaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     DIA_CHOICES = [
         ('lunes', 'Lunes'),
         ('martes', 'Martes'),
@@ -60,18 +130,26 @@ class RutinaSerializer(serializers.ModelSerializer):
 
     dia = serializers.ChoiceField(choices=DIA_CHOICES)
     ejercicios = EjercicioRutinaSerializer(many=True, read_only=True)
+    campos_expandibles = {
+        'usuario': lambda: UsuarioSerializer(read_only=True),
+    }
 
     class Meta:
         model = Rutina
         fields = ['id', 'usuario', 'nombre', 'dia', 'ejercicios']
         read_only_fields = ['id']
 
-class AmistadSerializer(serializers.ModelSerializer):
+class AmistadSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     amigo_username = serializers.CharField(source="amigo.username", read_only=True)
     amigo_email = serializers.EmailField(source="amigo.email", read_only=True)
     usuario_username = serializers.CharField(source="usuario.username", read_only=True)
     usuario_email = serializers.EmailField(source="usuario.email", read_only=True)
     tipo = serializers.SerializerMethodField()
+    campos_expandibles = {
+        'usuario': lambda: UsuarioSerializer(read_only=True),
+        'amigo': lambda: UsuarioSerializer(read_only=True),
+    }
+    requisitos = {'tipo': ['usuario']}
     
     # Este campo solo se usa para input, no pertenece al modelo
     amigo_input = serializers.CharField(write_only=True)
@@ -95,7 +173,7 @@ class AmistadSerializer(serializers.ModelSerializer):
     def get_tipo(self, obj):
         """Indica si la amistad fue enviada o recibida respecto al usuario logueado"""
         request = self.context.get("request")
-        if request and obj.usuario == request.user:
+        if request and obj.usuario_id == request.user.id:
             return "enviada"
         return "recibida"
 
@@ -104,49 +182,61 @@ class AmistadSerializer(serializers.ModelSerializer):
         amigo_input = validated_data.pop("amigo_input")
         usuario = self.context['request'].user
 
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-
         # Buscar por username o email
-        try:
-            amigo_user = User.objects.get(username=amigo_input)
-        except User.DoesNotExist:
-            try:
-                amigo_user = User.objects.get(email=amigo_input)
-            except User.DoesNotExist:
-                raise serializers.ValidationError({"amigo_input": "Usuario no encontrado."})
+        amigo_user = buscar_usuario(amigo_input)
+        if amigo_user is None:
+            raise serializers.ValidationError({"amigo_input": "Usuario no encontrado."})
 
         if usuario == amigo_user:
             raise serializers.ValidationError("No puedes agregarte a ti mismo como amigo.")
 
+        existente = relacion(usuario.id, amigo_user.id)
+        if existente == 'aceptada':
+            raise serializers.ValidationError("Ya sois amigos.")
+        if existente is not None:
+            raise serializers.ValidationError("Ya existe una solicitud de amistad pendiente.")
+
         validated_data['amigo'] = amigo_user
         validated_data['usuario'] = usuario
         validated_data['status'] = 'pendiente'
 
-        return super().create(validated_data)
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            # Solicitud rechazada anteriormente, en cualquiera de los dos sentidos
+            raise serializers.ValidationError("Ya existe una solicitud entre estos usuarios.")
 
-class PublicacionSerializer(serializers.ModelSerializer):
-    likes_count = serializers.SerializerMethodField()
+class PublicacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = serializers.ReadOnlyField(source='usuario.username')
     liked_by_user = serializers.SerializerMethodField()
+    requisitos = {'liked_by_user': []}
 
     class Meta:
         model = Publicacion
         fields = ['id', 'usuario', 'contenido', 'tipo', 'fecha_creacion', 'likes_count', 'liked_by_user']
+        read_only_fields = ['likes_count']
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-    
     def get_liked_by_user(self, obj):
+        # Si viene anotado desde para_feed() no hace falta consultar
+        if hasattr(obj, 'liked'):
+            return obj.liked
         user = self.context['request'].user
         if user.is_authenticated:
             return obj.likes.filter(usuario=user).exists()
         return False
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = serializers.ReadOnlyField(source='usuario.username')
     publicacion = serializers.ReadOnlyField(source='publicacion.id')
 
     class Meta:
         model = Like
-        fields = ['id', 'usuario', 'publicacion']
\ No newline at end of file
+        fields = ['id', 'usuario', 'publicacion']
+
+class LikeOperacionSerializer(serializers.Serializer):
+    publicacion = serializers.IntegerField()
+    accion = serializers.ChoiceField(choices=['like', 'unlike'])
+
+class LikeLoteSerializer(serializers.Serializer):
+    operaciones = LikeOperacionSerializer(many=True, allow_empty=False, max_length=100)
\ No newline at end of file
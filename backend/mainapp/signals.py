@@ -0,0 +1,179 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .amistades import invalidar_grafo
+from .autenticacion import invalidar_revocados, invalidar_usuario_autenticado
+from .catalogo import invalidar_catalogo
+from .dashboard import invalidar_dashboard, invalidar_dashboard_de_publicaciones
+from .eventos import emitir
+from .models import Amistad, EjercicioRutina, EntradaTimeline, Like, Publicacion, Rutina, Serie, TipoEjercicio, Usuario
+from .rankings import actualizar_records, recalcular_racha, subir_record, sumar_dia_racha, supera_record
+from .usuarios import invalidar_usuario
+from .tareas import encolar, encolar_record
+from .timeline import anunciar_publicacion, escribir_en_timeline_del_autor, vaciar_timelines
+
+
+@receiver(post_save, sender=Publicacion)
+def publicacion_guardada(sender, instance, created, **kwargs):
+    if created:
+        escribir_en_timeline_del_autor(instance)
+        encolar('repartir_publicacion', clave=f'repartir:{instance.pk}', publicacion=instance.pk)
+        anunciar_publicacion(instance)
+
+
+@receiver(pre_delete, sender=Publicacion)
+def publicacion_eliminada(sender, instance, **kwargs):
+    # Antes de que se borren en cascada sus entradas de timeline
+    invalidar_dashboard(*EntradaTimeline.objects.filter(publicacion=instance).values_list('usuario_id', flat=True))
+
+
+@receiver(post_save, sender=Amistad)
+def amistad_guardada(sender, instance, created, **kwargs):
+    invalidar_grafo(instance.usuario_id, instance.amigo_id)
+    invalidar_dashboard(instance.usuario_id, instance.amigo_id)
+    emitir(
+        [instance.usuario_id, instance.amigo_id], 'amistad',
+        id=instance.id, usuario=instance.usuario_id, amigo=instance.amigo_id, status=instance.status,
+    )
+    if instance.status == 'aceptada':
+        encolar('rellenar_timelines', usuario=instance.usuario_id, amigo=instance.amigo_id)
+    elif not created:
+        # Dejar de ver las publicaciones del otro no se retrasa: es un solo DELETE
+        vaciar_timelines(instance.usuario_id, instance.amigo_id)
+
+
+@receiver(post_delete, sender=Amistad)
+def amistad_eliminada(sender, instance, **kwargs):
+    invalidar_grafo(instance.usuario_id, instance.amigo_id)
+    emitir([instance.usuario_id, instance.amigo_id], 'amistad_eliminada', id=instance.id)
+    vaciar_timelines(instance.usuario_id, instance.amigo_id)
+
+
+@receiver(post_save, sender=TipoEjercicio)
+@receiver(post_delete, sender=TipoEjercicio)
+def catalogo_modificado(sender, **kwargs):
+    invalidar_catalogo()
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def usuario_modificado(sender, instance, **kwargs):
+    invalidar_usuario(instance.id)
+    invalidar_usuario_autenticado(instance.id)
+    invalidar_dashboard(instance.id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+@receiver(post_delete, sender=BlacklistedToken)
+def lista_negra_modificada(sender, **kwargs):
+    invalidar_revocados()
+
+
+def borrado_por_cascada_de(origin, *modelos):
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return modelo in modelos
+
+
+# Dashboard: cambios del propio usuario que salen en su carga inicial
+@receiver(post_save, sender=Rutina)
+@receiver(post_delete, sender=Rutina)
+def rutina_modificada(sender, instance, **kwargs):
+    invalidar_dashboard(instance.usuario_id)
+
+
+@receiver(post_save, sender=EjercicioRutina)
+@receiver(post_delete, sender=EjercicioRutina)
+def ejercicio_rutina_modificado(sender, instance, origin=None, **kwargs):
+    # Al borrar en cascada, la rutina o el usuario ya invalidan en sus propias señales, y los
+    # borrados en bloque (EjercicioRutinaLoteView) invalidan una vez: así no se carga la
+    # rutina de cada fila
+    if not (isinstance(origin, QuerySet) or borrado_por_cascada_de(origin, Rutina, Usuario)):
+        invalidar_dashboard(instance.rutina.usuario_id)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def like_modificado(sender, instance, origin=None, **kwargs):
+    invalidar_dashboard(instance.usuario_id)
+    # Al borrar una publicación, ella misma invalida los timelines donde estaba; al borrar un
+    # usuario, likes_count no cambia
+    if not borrado_por_cascada_de(origin, Publicacion, Usuario):
+        invalidar_dashboard_de_publicaciones(instance.publicacion_id)
+
+
+# Rankings: récords y rachas materializados (ver rankings.py)
+@receiver(pre_save, sender=EjercicioRutina)
+def ejercicio_rutina_previo(sender, instance, **kwargs):
+    instance._record_previo = None
+    if not instance._state.adding:
+        instance._record_previo = EjercicioRutina.objects.filter(pk=instance.pk).values_list(
+            'rutina__usuario_id', 'tipo_ejercicio_id', 'record_peso'
+        ).first()
+
+
+@receiver(post_save, sender=EjercicioRutina)
+def ejercicio_rutina_record(sender, instance, created, **kwargs):
+    usuario_id = instance.rutina.usuario_id
+    if created:
+        subir_record(usuario_id, instance.tipo_ejercicio_id, instance.record_peso)
+        return
+    # El récord pudo bajar o cambiar de ejercicio: se recalcula lo afectado
+    previo = getattr(instance, '_record_previo', None)
+    if previo and previo[:2] != (usuario_id, instance.tipo_ejercicio_id):
+        actualizar_records(previo[0], [previo[1]])
+    actualizar_records(usuario_id, [instance.tipo_ejercicio_id])
+    if previo and supera_record(instance.record_peso, previo[2]):
+        encolar_record(instance.pk, instance.record_peso)
+
+
+@receiver(post_delete, sender=EjercicioRutina)
+def ejercicio_rutina_record_borrado(sender, instance, origin=None, **kwargs):
+    # Si se borra el usuario o el ejercicio, sus récords caen también en cascada; al borrar
+    # la rutina (rutina_borrada) o en bloque (EjercicioRutinaLoteView) se recalcula una sola
+    # vez al final
+    if not borrado_por_cascada_de(origin, Usuario, TipoEjercicio, Rutina) and not isinstance(origin, QuerySet):
+        actualizar_records(instance.rutina.usuario_id, [instance.tipo_ejercicio_id])
+
+
+@receiver(pre_delete, sender=Rutina)
+def rutina_previa_al_borrado(sender, instance, origin=None, **kwargs):
+    # Antes de que se borren en cascada sus ejercicios
+    instance._tipos_record = set()
+    if not borrado_por_cascada_de(origin, Usuario):
+        instance._tipos_record = set(
+            instance.ejercicios.filter(record_peso__isnull=False).values_list('tipo_ejercicio_id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Rutina)
+def rutina_borrada(sender, instance, **kwargs):
+    actualizar_records(instance.usuario_id, getattr(instance, '_tipos_record', ()))
+
+
+@receiver(pre_save, sender=Serie)
+def serie_previa(sender, instance, **kwargs):
+    instance._tipo_previo = None
+    if not instance._state.adding:
+        instance._tipo_previo = Serie.objects.filter(pk=instance.pk).values_list('tipo_ejercicio_id', flat=True).first()
+
+
+@receiver(post_save, sender=Serie)
+def serie_guardada(sender, instance, created, **kwargs):
+    if created:
+        subir_record(instance.usuario_id, instance.tipo_ejercicio_id, instance.peso)
+        sumar_dia_racha(instance.usuario_id, instance.fecha)
+        return
+    tipos = {instance.tipo_ejercicio_id, getattr(instance, '_tipo_previo', None)} - {None}
+    actualizar_records(instance.usuario_id, tipos)
+    recalcular_racha(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Serie)
+def serie_eliminada(sender, instance, origin=None, **kwargs):
+    if borrado_por_cascada_de(origin, Usuario):
+        return
+    if not borrado_por_cascada_de(origin, TipoEjercicio):
+        actualizar_records(instance.usuario_id, [instance.tipo_ejercicio_id])
+    recalcular_racha(instance.usuario_id)
@@ -0,0 +1,138 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Amistad, EjercicioRutina, Publicacion, Tarea
+from .timeline import rellenar_timelines, repartir_publicacion
+
+logger = logging.getLogger(__name__)
+
+TAREAS = {}
+# Tiempo que un trabajador tiene reservada una tarea antes de que otro pueda reintentarla
+BLOQUEO = timedelta(minutes=5)
+
+
+def tarea(nombre):
+    """Registra la función que ejecuta las tareas con ese nombre"""
+    def registrar(funcion):
+        TAREAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(nombre, clave=None, retraso=None, **datos):
+    """
+    Guarda la tarea en la misma transacción que la petición: si la petición falla no se
+    encola, y si se confirma el trabajador la verá. Con `clave`, encolar dos veces la misma
+    tarea no la duplica. Con TAREAS_EN_LINEA se ejecuta en el momento (desarrollo y tests).
+    """
+    if nombre not in TAREAS:
+        raise ValueError(f"Tarea desconocida: {nombre}")
+    if getattr(settings, 'TAREAS_EN_LINEA', False):
+        TAREAS[nombre](**datos)
+        return
+    nueva = Tarea(nombre=nombre, clave=clave, datos=datos)
+    if retraso:
+        nueva.ejecutar_desde = timezone.now() + retraso
+    Tarea.objects.bulk_create([nueva], ignore_conflicts=clave is not None)
+
+
+def reintento(intentos):
+    """Espera exponencial entre reintentos: 2s, 4s, 8s... hasta una hora"""
+    return timedelta(seconds=min(2 ** intentos, 3600))
+
+
+def reclamar_tareas(limite):
+    """Reserva hasta `limite` tareas listas para ejecutar, en orden de llegada"""
+    ahora = timezone.now()
+    listas = Q(estado='pendiente', ejecutar_desde__lte=ahora) | Q(estado='en_curso', bloqueada_hasta__lt=ahora)
+    with transaction.atomic():
+        # En PostgreSQL varios trabajadores se reparten las filas sin esperarse; en SQLite
+        # la transacción IMMEDIATE ya serializa las reservas
+        ids = list(
+            Tarea.objects.select_for_update(skip_locked=True).filter(listas)
+            .order_by('id').values_list('id', flat=True)[:limite]
+        )
+        Tarea.objects.filter(id__in=ids).update(
+            estado='en_curso', bloqueada_hasta=ahora + BLOQUEO, intentos=F('intentos') + 1,
+        )
+    return list(Tarea.objects.filter(id__in=ids).order_by('id'))
+
+
+def ejecutar_tarea(pendiente):
+    funcion = TAREAS.get(pendiente.nombre)
+    try:
+        if funcion is None:
+            raise LookupError(f"Tarea desconocida: {pendiente.nombre}")
+        with transaction.atomic():
+            funcion(**pendiente.datos)
+    except Exception:
+        pendiente.error = traceback.format_exc()
+        if pendiente.intentos >= pendiente.max_intentos:
+            pendiente.estado = 'fallida'
+            logger.error("Tarea %s fallida tras %s intentos", pendiente, pendiente.intentos)
+        else:
+            pendiente.estado = 'pendiente'
+            pendiente.ejecutar_desde = timezone.now() + reintento(pendiente.intentos)
+            logger.warning("Tarea %s falló, se reintentará", pendiente)
+    else:
+        pendiente.estado = 'hecha'
+        pendiente.error = ''
+    pendiente.bloqueada_hasta = None
+    pendiente.save(update_fields=['estado', 'error', 'ejecutar_desde', 'bloqueada_hasta'])
+    return pendiente.estado == 'hecha'
+
+
+def procesar_tareas(limite=20):
+    """Ejecuta un lote de tareas; devuelve cuántas se procesaron"""
+    reclamadas = reclamar_tareas(limite)
+    for pendiente in reclamadas:
+        ejecutar_tarea(pendiente)
+    return len(reclamadas)
+
+
+def purgar_tareas(dias=7):
+    """Borra las tareas terminadas hace más de `dias`; sus claves se pueden volver a usar"""
+    limite = timezone.now() - timedelta(days=dias)
+    return Tarea.objects.filter(estado='hecha', fecha_creacion__lt=limite).delete()[0]
+
+
+@tarea('repartir_publicacion')
+def tarea_repartir_publicacion(publicacion):
+    publicacion = Publicacion.objects.filter(pk=publicacion).first()
+    if publicacion is not None:
+        repartir_publicacion(publicacion)
+
+
+@tarea('rellenar_timelines')
+def tarea_rellenar_timelines(usuario, amigo):
+    # La amistad pudo romperse mientras la tarea esperaba en la cola
+    if Amistad.objects.entre(usuario, amigo).filter(status='aceptada').exists():
+        rellenar_timelines(usuario, amigo)
+
+
+@tarea('reconciliar_likes')
+def tarea_reconciliar_likes():
+    Publicacion.objects.reconciliar_likes()
+
+
+@tarea('publicar_record')
+def tarea_publicar_record(ejercicio, peso):
+    ejercicio = EjercicioRutina.objects.select_related('rutina', 'tipo_ejercicio').filter(pk=ejercicio).first()
+    if ejercicio is None:
+        return
+    Publicacion.objects.create(
+        usuario_id=ejercicio.rutina.usuario_id,
+        tipo='record',
+        contenido=f"¡Nuevo récord en {ejercicio.tipo_ejercicio.nombre}: {peso} kg!",
+    )
+
+
+def encolar_record(ejercicio_id, peso):
+    # Una sola publicación por ejercicio y peso aunque se guarde varias veces
+    encolar('publicar_record', clave=f'record:{ejercicio_id}:{peso}', ejercicio=ejercicio_id, peso=str(peso))
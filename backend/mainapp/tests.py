@@ -1,3 +1,1480 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import vistas_async
+from .basedatos import pragmas_para
+from .amistades import clave_grafo, grafo_amistades, relacion
+from .autenticacion import jti_revocados, usuario_cacheado
+from .metricas import observar, reiniciar_metricas
+from .eventos import BackendEventos, backend_eventos
+from .tareas import procesar_tareas
+from .usuarios import autocompletar_usuarios, buscar_usuario, usuarios_por_texto
+from .views import RutinaListCreateView
+from .models import Amistad, EjercicioRutina, EntradaTimeline, Like, Publicacion, Rutina, Serie, Tarea, TipoEjercicio, Usuario
+
+
+def crear_usuario(username):
+    return Usuario.objects.create_user(
+        email=f"{username}@example.com",
+        username=username,
+        nombre=username,
+        apellidos="Test",
+        password="contraseña-segura-123",
+    )
+
+
+class PublicacionFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario("ana")
+        self.otro = crear_usuario("luis")
+        Amistad.objects.create(usuario=self.usuario, amigo=self.otro, status="aceptada")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def crear_publicaciones(self, n):
+        publicaciones = [
+            Publicacion.objects.create(usuario=self.otro, contenido=f"post {i}", tipo="general") for i in range(n)
+        ]
+        Like.objects.bulk_create(
+            [Like(usuario=self.usuario, publicacion=p) for p in publicaciones[::2]]
+        )
+        Publicacion.objects.reconciliar_likes()
+        procesar_tareas(limite=100)
+        return publicaciones
+
+    def contar_consultas_feed(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/auth/publicaciones/", {"completo": 1})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data
+
+    def test_feed_incluye_likes_y_autor(self):
+        publicaciones = self.crear_publicaciones(2)
+        Like.objects.create(usuario=self.otro, publicacion=publicaciones[0])
+        Publicacion.objects.reconciliar_likes()
+
+        _, data = self.contar_consultas_feed()
+        por_id = {p["id"]: p for p in data}
+
+        self.assertEqual(por_id[publicaciones[0].id]["likes_count"], 2)
+        self.assertTrue(por_id[publicaciones[0].id]["liked_by_user"])
+        self.assertEqual(por_id[publicaciones[1].id]["likes_count"], 0)
+        self.assertFalse(por_id[publicaciones[1].id]["liked_by_user"])
+        self.assertEqual(por_id[publicaciones[1].id]["usuario"], "luis")
+
+    def test_consultas_del_feed_no_crecen_con_las_publicaciones(self):
+        self.crear_publicaciones(3)
+        consultas_pocas, _ = self.contar_consultas_feed()
+
+        self.crear_publicaciones(50)
+        consultas_muchas, data = self.contar_consultas_feed()
+
+        self.assertEqual(len(data), 53)
+        self.assertEqual(consultas_pocas, consultas_muchas)
+
+
+class PublicacionPaginacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario("ana")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.publicaciones = [
+            Publicacion.objects.create(usuario=self.usuario, contenido=f"post {i}", tipo="general") for i in range(7)
+        ]
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos = []
+        response = self.client.get("/api/auth/publicaciones/", {"page_size": 3})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            vistos.extend(p["id"] for p in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        esperados = list(
+            Publicacion.objects.order_by("-fecha_creacion", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+
+    def test_paginas_con_publicaciones_repartidas_a_varios_timelines(self):
+        # Cada publicación está en el timeline de tres usuarios: el cursor solo debe mirar el de ana
+        for nombre in ("luis", "eva"):
+            Amistad.objects.create(usuario=self.usuario, amigo=crear_usuario(nombre), status="aceptada")
+        Publicacion.objects.all().delete()
+        creadas = [
+            Publicacion.objects.create(usuario=self.usuario, contenido=f"post {i}", tipo="general") for i in range(5)
+        ]
+        procesar_tareas()
+        self.assertEqual(EntradaTimeline.objects.count(), 15)
+        esperados = [p.id for p in reversed(creadas)]
+
+        def recorrer(pedir, url):
+            vistos = []
+            datos = pedir(url)
+            while True:
+                vistos.extend(p["id"] for p in datos["results"])
+                if not datos["next"]:
+                    return vistos
+                datos = pedir(datos["next"])
+
+        self.assertEqual(recorrer(lambda url: self.client.get(url).json(), "/api/auth/publicaciones/?page_size=2"), esperados)
+
+        auth = {"Authorization": f"Bearer {AccessToken.for_user(self.usuario)}"}
+        self.assertEqual(recorrer(
+            lambda url: json.loads(async_to_sync(vistas_async.feed_async)(AsyncRequestFactory().get(url, headers=auth)).content),
+            "/api/auth/publicaciones/?page_size=2",
+        ), esperados)
+
+        # El enlace "next" del dashboard sigue en la segunda página
+        with self.settings(FEED_PAGE_SIZE=2):
+            siguiente = self.client.get("/api/auth/dashboard/").json()["feed"]["next"]
+        self.assertEqual([p["id"] for p in self.client.get(siguiente).json()["results"]], esperados[2:])
+
+    def test_cursor_invalido(self):
+        response = self.client.get("/api/auth/publicaciones/", {"cursor": "no-es-un-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_lista_completa_opcional(self):
+        response = self.client.get("/api/auth/publicaciones/", {"completo": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 7)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.eva = crear_usuario("eva")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+
+    def ids_feed(self):
+        # El reparto a los amigos va por la cola de tareas
+        procesar_tareas()
+        response = self.client.get("/api/auth/publicaciones/")
+        self.assertEqual(response.status_code, 200)
+        return [p["id"] for p in response.data["results"]]
+
+    def test_feed_solo_muestra_propias_y_de_amigos(self):
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        propia = Publicacion.objects.create(usuario=self.ana, contenido="mía", tipo="general")
+        de_amigo = Publicacion.objects.create(usuario=self.luis, contenido="de luis", tipo="general")
+        Publicacion.objects.create(usuario=self.eva, contenido="de eva", tipo="general")
+
+        self.assertEqual(self.ids_feed(), [de_amigo.id, propia.id])
+
+    def test_aceptar_amistad_rellena_el_timeline(self):
+        anterior = Publicacion.objects.create(usuario=self.luis, contenido="antigua", tipo="general")
+        amistad = Amistad.objects.create(usuario=self.luis, amigo=self.ana)
+        self.assertEqual(self.ids_feed(), [])
+
+        response = self.client.patch(f"/api/auth/amistades/{amistad.id}/actualizar/", {"status": "aceptada"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids_feed(), [anterior.id])
+
+    def test_eliminar_amistad_vacia_el_timeline(self):
+        amistad = Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        Publicacion.objects.create(usuario=self.luis, contenido="de luis", tipo="general")
+        propia = Publicacion.objects.create(usuario=self.ana, contenido="mía", tipo="general")
+
+        response = self.client.delete(f"/api/auth/amistades/{amistad.id}/eliminar/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.ids_feed(), [propia.id])
+        self.assertFalse(EntradaTimeline.objects.filter(usuario=self.luis, publicacion=propia).exists())
+
+    def test_reparto_no_usa_el_grafo_cacheado(self):
+        # Como la caché del trabajador de tareas, que no ve la amistad rota en el servidor web
+        cache.set(clave_grafo(self.luis.id), grafo_amistades(self.luis.id)._replace(aceptados=frozenset({self.ana.id})))
+        publicacion = Publicacion.objects.create(usuario=self.luis, contenido="de luis", tipo="general")
+        procesar_tareas()
+        self.assertFalse(EntradaTimeline.objects.filter(usuario=self.ana, publicacion=publicacion).exists())
+
+    def test_detalle_de_publicacion_de_amigo_solo_lectura(self):
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        de_amigo = Publicacion.objects.create(usuario=self.luis, contenido="de luis", tipo="general")
+        ajena = Publicacion.objects.create(usuario=self.eva, contenido="de eva", tipo="general")
+        procesar_tareas()
+
+        url = f"/api/auth/publicaciones/{de_amigo.id}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["contenido"], "de luis")
+        self.assertEqual(self.client.get(f"/api/auth/publicaciones/{ajena.id}/").status_code, 404)
+        self.assertEqual(self.client.patch(url, {"contenido": "editada"}).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+
+
+class LikesCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.publicacion = Publicacion.objects.create(usuario=self.ana, contenido="hola", tipo="general")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+
+    def test_like_y_unlike_actualizan_el_contador(self):
+        url = f"/api/auth/publicaciones/{self.publicacion.id}"
+        self.assertEqual(self.client.post(f"{url}/like/").status_code, 201)
+        self.assertEqual(self.client.post(f"{url}/like/").status_code, 200)
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.likes_count, 1)
+
+        self.assertEqual(self.client.delete(f"{url}/unlike/").status_code, 204)
+        self.assertEqual(self.client.delete(f"{url}/unlike/").status_code, 404)
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.likes_count, 0)
+
+    def test_comando_reconcilia_contadores_desfasados(self):
+        otra = Publicacion.objects.create(usuario=self.ana, contenido="adiós", tipo="general")
+        Like.objects.create(usuario=self.ana, publicacion=self.publicacion)
+        Publicacion.objects.filter(id=otra.id).update(likes_count=5)
+
+        salida = StringIO()
+        call_command("reconciliar_likes", stdout=salida)
+
+        self.assertIn("2 publicaciones corregidas", salida.getvalue())
+        self.assertEqual(
+            dict(Publicacion.objects.values_list("id", "likes_count")),
+            {self.publicacion.id: 1, otra.id: 0},
+        )
+
+
+class LikeLoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.p1, self.p2, self.p3 = [
+            Publicacion.objects.create(usuario=self.ana, contenido=f"post {i}", tipo="general") for i in range(3)
+        ]
+        self.client.post(f"/api/auth/publicaciones/{self.p2.id}/like/")
+
+    def test_aplica_likes_y_unlikes_en_lote(self):
+        response = self.client.post("/api/auth/publicaciones/likes/", {"operaciones": [
+            {"publicacion": self.p1.id, "accion": "unlike"},
+            {"publicacion": self.p1.id, "accion": "like"},
+            {"publicacion": self.p2.id, "accion": "unlike"},
+            {"publicacion": self.p3.id, "accion": "unlike"},
+            {"publicacion": 9999, "accion": "like"},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        resultados = {r["publicacion"]: r for r in response.data["resultados"]}
+        self.assertEqual(resultados[self.p1.id], {
+            "publicacion": self.p1.id, "estado": "actualizada", "liked_by_user": True, "likes_count": 1,
+        })
+        self.assertEqual(resultados[self.p2.id]["likes_count"], 0)
+        self.assertEqual(resultados[self.p3.id]["estado"], "sin_cambios")
+        self.assertEqual(resultados[9999]["estado"], "no_encontrada")
+        self.assertEqual(
+            set(Like.objects.filter(usuario=self.ana).values_list("publicacion_id", flat=True)), {self.p1.id}
+        )
+
+    def test_rechaza_operaciones_invalidas(self):
+        response = self.client.post("/api/auth/publicaciones/likes/", {"operaciones": [
+            {"publicacion": self.p1.id, "accion": "favorito"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class LikesConcurrenciaTests(TransactionTestCase):
+    def test_likes_en_paralelo_mantienen_el_contador(self):
+        cache.clear()
+        usuarios = [crear_usuario(f"user{i}") for i in range(8)]
+        publicacion = Publicacion.objects.create(usuario=usuarios[0], contenido="hola", tipo="general")
+        url = f"/api/auth/publicaciones/{publicacion.id}"
+
+        def alternar(usuario):
+            client = APIClient()
+            client.force_authenticate(usuario)
+            try:
+                for _ in range(5):
+                    client.post(f"{url}/like/")
+                    client.post(f"{url}/like/")
+                    client.delete(f"{url}/unlike/")
+                client.post(f"{url}/like/")
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(usuarios)) as pool:
+            list(pool.map(alternar, usuarios))
+
+        publicacion.refresh_from_db()
+        self.assertEqual(publicacion.likes_count, Like.objects.filter(publicacion=publicacion).count())
+        self.assertEqual(publicacion.likes_count, len(usuarios))
+
+
+class CatalogoCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario("ana")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.press = TipoEjercicio.objects.create(nombre="Press banca", grupo_muscular="Pecho")
+
+    def test_etag_sin_cambios_devuelve_304_sin_consultas(self):
+        response = self.client.get("/api/auth/tipo-ejercicios/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/auth/tipo-ejercicios/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_cambios_en_el_catalogo_invalidan_la_cache(self):
+        etag = self.client.get("/api/auth/tipo-ejercicios/")["ETag"]
+        detalle = self.client.get(f"/api/auth/tipo-ejercicios/{self.press.id}/")
+        self.assertEqual(detalle.data["nombre"], "Press banca")
+
+        response = self.client.patch(f"/api/auth/tipo-ejercicios/{self.press.id}/", {"nombre": "Press inclinado"})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/auth/tipo-ejercicios/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data[0]["nombre"], "Press inclinado")
+        detalle = self.client.get(f"/api/auth/tipo-ejercicios/{self.press.id}/")
+        self.assertEqual(detalle.data["nombre"], "Press inclinado")
+
+
+class TipoEjercicioBusquedaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        TipoEjercicio.objects.create(nombre="Extensión de tríceps", grupo_muscular="Brazos", descripcion="Polea alta")
+        TipoEjercicio.objects.create(nombre="Press francés", grupo_muscular="Brazos", descripcion="Trabaja el tríceps")
+        TipoEjercicio.objects.create(nombre="Fondos", grupo_muscular="Pecho", descripcion="Tríceps y pecho")
+        TipoEjercicio.objects.create(nombre="Sentadilla", grupo_muscular="Piernas")
+
+    def buscar(self, **params):
+        response = self.client.get("/api/auth/tipo-ejercicios/buscar/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_prefijo_sin_acentos_y_ranking(self):
+        data = self.buscar(q="tricep")
+        self.assertEqual(data["count"], 3)
+        # La coincidencia en el nombre pesa más que en la descripción
+        self.assertEqual(data["results"][0]["nombre"], "Extensión de tríceps")
+        self.assertEqual(data["grupos_musculares"], [
+            {"grupo_muscular": "Brazos", "total": 2},
+            {"grupo_muscular": "Pecho", "total": 1},
+        ])
+
+    def test_filtro_por_grupo_y_paginacion(self):
+        data = self.buscar(q="triceps", grupo_muscular="Brazos", page_size=1, page=2)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual([e["nombre"] for e in data["results"]], ["Press francés"])
+        self.assertEqual(len(data["grupos_musculares"]), 2)
+
+    def test_indice_se_actualiza_al_editar(self):
+        TipoEjercicio.objects.filter(nombre="Sentadilla").first().delete()
+        TipoEjercicio.objects.create(nombre="Sentadilla búlgara", grupo_muscular="Piernas")
+        self.assertEqual([e["nombre"] for e in self.buscar(q="bulgara")["results"]], ["Sentadilla búlgara"])
+        self.assertEqual(self.buscar(q="sentad")["count"], 1)
+
+        TipoEjercicio.objects.filter(nombre="Fondos").update(nombre="Fondos lastrados")
+        self.assertEqual([e["nombre"] for e in self.buscar(q="lastr")["results"]], ["Fondos lastrados"])
+
+
+class RutinaConsultasTests(TestCase):
+    DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+    def setUp(self):
+        self.usuario = crear_usuario("ana")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        tipos = TipoEjercicio.objects.bulk_create(
+            [TipoEjercicio(nombre=f"Ejercicio {i}", grupo_muscular="Pecho") for i in range(15)]
+        )
+        self.rutinas = [Rutina.objects.create(usuario=self.usuario, nombre=dia, dia=dia) for dia in self.DIAS]
+        EjercicioRutina.objects.bulk_create([
+            EjercicioRutina(rutina=rutina, tipo_ejercicio=tipo, sets=4, repeticiones=10, orden=orden)
+            for rutina in self.rutinas
+            for orden, tipo in enumerate(tipos)
+        ])
+
+    def test_listado_de_rutinas_en_consultas_fijas(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/auth/rutinas/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(len(response.data[0]["ejercicios"]), 15)
+        self.assertEqual(response.data[0]["ejercicios"][0]["nombre_ejercicio"], "Ejercicio 0")
+
+    def test_detalle_de_rutina_en_consultas_fijas(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/auth/rutinas/{self.rutinas[0].id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["ejercicios"]), 15)
+
+
+class ReorderEjerciciosTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("ana")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        tipo = TipoEjercicio.objects.create(nombre="Remo", grupo_muscular="Espalda")
+        self.rutina = Rutina.objects.create(usuario=self.usuario, nombre="Espalda", dia="lunes")
+        self.ejercicios = [
+            EjercicioRutina.objects.create(rutina=self.rutina, tipo_ejercicio=tipo, sets=3, repeticiones=12, orden=i)
+            for i in range(4)
+        ]
+        otra = Rutina.objects.create(usuario=crear_usuario("luis"), nombre="Pierna", dia="martes")
+        self.ajeno = EjercicioRutina.objects.create(rutina=otra, tipo_ejercicio=tipo, sets=3, repeticiones=12)
+        self.url = f"/api/auth/rutinas/{self.rutina.id}/reorder-ejercicios/"
+
+    def test_reordena_en_consultas_fijas_y_devuelve_el_orden(self):
+        invertido = [{"id": e.id, "orden": 3 - i} for i, e in enumerate(self.ejercicios)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put(self.url, {"ejercicios": invertido}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        esperado = [e.id for e in reversed(self.ejercicios)]
+        self.assertEqual([e["id"] for e in response.data["ejercicios"]], esperado)
+        self.assertEqual(list(self.rutina.ejercicios.values_list("id", flat=True)), esperado)
+
+    def test_rechaza_ejercicios_de_otra_rutina_sin_aplicar_nada(self):
+        response = self.client.put(self.url, {"ejercicios": [
+            {"id": self.ejercicios[0].id, "orden": 9},
+            {"id": self.ajeno.id, "orden": 0},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["ids"], [self.ajeno.id])
+        self.ejercicios[0].refresh_from_db()
+        self.assertEqual(self.ejercicios[0].orden, 0)
+
+
+class EjercicioRutinaLoteTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("ana")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.remo = TipoEjercicio.objects.create(nombre="Remo", grupo_muscular="Espalda")
+        self.dominadas = TipoEjercicio.objects.create(nombre="Dominadas", grupo_muscular="Espalda")
+        self.rutina = Rutina.objects.create(usuario=self.usuario, nombre="Espalda", dia="lunes")
+        self.existentes = [
+            EjercicioRutina.objects.create(rutina=self.rutina, tipo_ejercicio=self.remo, sets=3, repeticiones=12, orden=i)
+            for i in range(2)
+        ]
+        self.url = f"/api/auth/rutinas/{self.rutina.id}/ejercicios-lote/"
+
+    def test_crea_actualiza_y_elimina_en_una_peticion(self):
+        crear = [
+            {"tipo_ejercicio": self.dominadas.id, "sets": 4, "repeticiones": 8, "orden": 2 + i}
+            for i in range(10)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {
+                "crear": crear,
+                "actualizar": [{"id": self.existentes[0].id, "sets": 5, "record_peso": "80.50"}],
+                "eliminar": [self.existentes[1].id],
+            }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["ejercicios"]), 11)
+        # Número fijo de consultas, incluidos el recálculo de récords y la tarea de publicar el récord
+        self.assertLess(len(ctx.captured_queries), 16)
+        self.existentes[0].refresh_from_db()
+        self.assertEqual(self.existentes[0].sets, 5)
+        self.assertEqual(str(self.existentes[0].record_peso), "80.50")
+        self.assertFalse(EjercicioRutina.objects.filter(id=self.existentes[1].id).exists())
+
+    def test_eliminar_en_bloque_no_consulta_por_fila(self):
+        self.existentes += [
+            EjercicioRutina.objects.create(rutina=self.rutina, tipo_ejercicio=self.remo, sets=3, repeticiones=12, orden=i)
+            for i in range(2, 20)
+        ]
+        consultas = []
+        for ids in ([e.id for e in self.existentes[:2]], [e.id for e in self.existentes[2:]]):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, {"eliminar": ids}, format="json")
+            self.assertEqual(response.status_code, 200)
+            consultas.append(len(ctx.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_rutina_ajena_devuelve_404(self):
+        otra = Rutina.objects.create(usuario=crear_usuario("luis"), nombre="Pierna", dia="martes")
+        response = self.client.post(f"/api/auth/rutinas/{otra.id}/ejercicios-lote/", {"eliminar": []}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_errores_no_aplican_ningun_cambio(self):
+        otra = Rutina.objects.create(usuario=self.usuario, nombre="Pierna", dia="martes")
+        ajeno = EjercicioRutina.objects.create(rutina=otra, tipo_ejercicio=self.remo, sets=3, repeticiones=12)
+        response = self.client.post(self.url, {
+            "crear": [{"tipo_ejercicio": self.remo.id, "sets": 3, "repeticiones": 10}],
+            "eliminar": [self.existentes[0].id, ajeno.id],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["ids"], [ajeno.id])
+        self.assertEqual(self.rutina.ejercicios.count(), 2)
+
+        response = self.client.post(self.url, {
+            "crear": [{"tipo_ejercicio": 9999, "sets": 3, "repeticiones": 10}],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["ids"], [9999])
+
+
+class GrafoAmistadesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.eva = crear_usuario("eva")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+
+    def test_grafo_cacheado_caduca(self):
+        grafo_amistades(self.ana.id)
+        self.assertIsNotNone(cache.get(clave_grafo(self.ana.id)))
+        cache.clear()
+        with self.settings(AMISTADES_CACHE_SECONDS=0):
+            grafo_amistades(self.ana.id)
+        self.assertIsNone(cache.get(clave_grafo(self.ana.id)))
+
+    def test_grafo_se_cachea_y_se_invalida(self):
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        solicitud = Amistad.objects.create(usuario=self.eva, amigo=self.ana)
+
+        grafo = grafo_amistades(self.ana.id)
+        self.assertEqual(grafo.aceptados, {self.luis.id})
+        self.assertEqual(grafo.pendientes_entrantes, {self.eva.id})
+        self.assertEqual(relacion(self.eva.id, self.ana.id), "enviada")
+        with self.assertNumQueries(0):
+            self.assertEqual(relacion(self.ana.id, self.luis.id), "aceptada")
+
+        solicitud.status = "aceptada"
+        solicitud.save()
+        self.assertEqual(grafo_amistades(self.ana.id).aceptados, {self.luis.id, self.eva.id})
+
+        solicitud.delete()
+        self.assertIsNone(relacion(self.eva.id, self.ana.id))
+
+    def test_crear_solicitud_duplicada_o_inversa_falla(self):
+        response = self.client.post("/api/auth/amistades/crear/", {"amigo_input": "luis"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["tipo"], "enviada")
+
+        response = self.client.post("/api/auth/amistades/crear/", {"amigo_input": "luis@example.com"})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.luis)
+        response = self.client.post("/api/auth/amistades/crear/", {"amigo_input": "ana"})
+        self.assertEqual(response.status_code, 400)
+
+
+class AmistadParOrdenadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.eva = crear_usuario("eva")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+
+    def test_no_se_puede_guardar_la_pareja_invertida(self):
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Amistad.objects.create(usuario=self.luis, amigo=self.ana)
+        self.assertEqual(Amistad.objects.entre(self.luis.id, self.ana.id).count(), 1)
+
+    def test_listado_sin_or_y_con_ambos_sentidos(self):
+        enviada = Amistad.objects.create(usuario=self.ana, amigo=self.luis)
+        recibida = Amistad.objects.create(usuario=self.eva, amigo=self.ana, status="aceptada")
+        Amistad.objects.create(usuario=self.luis, amigo=self.eva)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/auth/amistades/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn(" OR ", ctx.captured_queries[0]["sql"])
+        por_id = {a["id"]: a for a in response.data}
+        self.assertEqual(set(por_id), {enviada.id, recibida.id})
+        self.assertEqual(por_id[enviada.id]["tipo"], "enviada")
+        self.assertEqual(por_id[recibida.id]["usuario_username"], "eva")
+
+    def test_solo_los_participantes_pueden_eliminarla(self):
+        ajena = Amistad.objects.create(usuario=self.luis, amigo=self.eva)
+        propia = Amistad.objects.create(usuario=self.luis, amigo=self.ana)
+
+        self.assertEqual(self.client.delete(f"/api/auth/amistades/{ajena.id}/eliminar/").status_code, 404)
+        self.assertEqual(self.client.delete(f"/api/auth/amistades/{propia.id}/eliminar/").status_code, 204)
+
+
+class BusquedaUsuariosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        usuarios_por_texto.clear()
+        self.ana = crear_usuario("ana")
+        self.andres = crear_usuario("Andres")
+        self.luis = crear_usuario("luis")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+
+    def test_busca_por_username_o_email_en_una_consulta_y_cachea(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(buscar_usuario("ANDRES"), self.andres)
+        with self.assertNumQueries(1):
+            self.assertEqual(buscar_usuario("Luis@Example.com"), self.luis)
+        with self.assertNumQueries(0):
+            self.assertEqual(buscar_usuario("andres"), self.andres)
+        self.assertIsNone(buscar_usuario("nadie"))
+
+    def test_guardar_el_usuario_invalida_la_cache(self):
+        buscar_usuario("luis")
+        self.luis.username = "luisito"
+        self.luis.save()
+        self.assertIsNone(buscar_usuario("luis"))
+        self.assertEqual(buscar_usuario("LUISITO"), self.luis)
+
+    def test_lru_descarta_lo_mas_antiguo(self):
+        usuarios_por_texto.tamano = 2
+        try:
+            buscar_usuario("ana")
+            buscar_usuario("andres")
+            buscar_usuario("luis")
+            with self.assertNumQueries(1):
+                buscar_usuario("ana")
+        finally:
+            usuarios_por_texto.tamano = 1024
+
+    def test_autocompletar_por_prefijo(self):
+        Amistad.objects.create(usuario=self.ana, amigo=self.andres)
+        response = self.client.get("/api/auth/users/autocompletar/", {"q": "AN"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [
+            {"id": self.andres.id, "username": "Andres", "nombre": "Andres", "apellidos": "Test", "relacion": "enviada"},
+        ])
+        self.assertEqual(self.client.get("/api/auth/users/autocompletar/", {"q": ""}).data, [])
+
+    def test_autocompletar_usa_el_indice(self):
+        plan = autocompletar_usuarios("an").explain()
+        self.assertIn("usuario_username_lower_idx", plan)
+
+
+class DirectorioUsuariosTests(TestCase):
+    def setUp(self):
+        self.usuarios = [crear_usuario(f"user{i}") for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuarios[0])
+
+    def test_paginacion_por_cursor(self):
+        vistos = []
+        response = self.client.get("/api/auth/users/", {"page_size": 2})
+        while True:
+            vistos.extend(u["id"] for u in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(vistos, [u.id for u in self.usuarios])
+
+    def test_busqueda_y_campos_limitados(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/auth/users/", {"search": "user3", "fields": "id,username"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [{"id": self.usuarios[3].id, "username": "user3"}])
+        sql = ctx.captured_queries[-1]["sql"]
+        self.assertNotIn('"email"', sql.split(" FROM ")[0])
+
+    def test_campos_desconocidos(self):
+        response = self.client.get("/api/auth/users/", {"fields": "id,password"})
+        self.assertEqual(response.status_code, 400)
+
+
+class CamposDinamicosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.press = TipoEjercicio.objects.create(nombre="Press banca", grupo_muscular="Pecho")
+        for dia in ["lunes", "martes", "miércoles"]:
+            rutina = Rutina.objects.create(usuario=self.ana, nombre=f"Rutina {dia}", dia=dia)
+            for orden in range(3):
+                EjercicioRutina.objects.create(
+                    rutina=rutina, tipo_ejercicio=self.press, sets=4, repeticiones=8, orden=orden
+                )
+
+    def test_resumen_de_rutinas_sin_ejercicios(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/auth/rutinas/", {"fields": "id,nombre,dia"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data[0]), {"id", "nombre", "dia"})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("usuario_id", ctx.captured_queries[0]["sql"].split(" FROM ")[0])
+
+    def test_campos_anidados(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/auth/rutinas/", {"fields": "dia,ejercicios.nombre_ejercicio,ejercicios.orden"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["ejercicios"][0], {"nombre_ejercicio": "Press banca", "orden": 0})
+
+    def test_expandir_relaciones(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/auth/ejercicio-rutinas/", {"expand": "tipo_ejercicio"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 9)
+        self.assertEqual(response.data[0]["tipo_ejercicio"]["grupo_muscular"], "Pecho")
+
+        response = self.client.get("/api/auth/ejercicio-rutinas/", {"expand": "rutina"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_amistades_sin_joins(self):
+        Amistad.objects.create(usuario=self.luis, amigo=self.ana)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/auth/amistades/", {"fields": "id,status,tipo"})
+
+        self.assertEqual(response.data[0], {"id": response.data[0]["id"], "status": "pendiente", "tipo": "recibida"})
+        self.assertNotIn("JOIN", ctx.captured_queries[0]["sql"])
+
+        response = self.client.get("/api/auth/amistades/", {"fields": "id", "expand": "usuario"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["usuario"]["username"], "luis")
+
+    def test_feed_y_escritura_no_se_ven_afectados(self):
+        Publicacion.objects.create(usuario=self.ana, contenido="hola", tipo="general")
+        response = self.client.get("/api/auth/publicaciones/", {"fields": "id,usuario,liked_by_user"})
+        self.assertEqual(response.data["results"][0]["usuario"], "ana")
+        self.assertEqual(set(response.data["results"][0]), {"id", "usuario", "liked_by_user"})
+
+        response = self.client.post("/api/auth/publicaciones/?fields=id", {"contenido": "otra", "tipo": "general"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["contenido"], "otra")
+
+    def test_catalogo_cacheado_por_variante(self):
+        completo = self.client.get("/api/auth/tipo-ejercicios/")
+        reducido = self.client.get("/api/auth/tipo-ejercicios/", {"fields": "id,nombre"})
+        self.assertIn("descripcion", completo.data[0])
+        self.assertEqual(set(reducido.data[0]), {"id", "nombre"})
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        press = TipoEjercicio.objects.create(nombre="Press banca", grupo_muscular="Pecho")
+        for dia in ["lunes", "miércoles"]:
+            rutina = Rutina.objects.create(usuario=self.ana, nombre=f"Rutina {dia}", dia=dia)
+            EjercicioRutina.objects.create(rutina=rutina, tipo_ejercicio=press, sets=4, repeticiones=8, orden=0)
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        for i in range(3):
+            Publicacion.objects.create(usuario=self.luis, contenido=f"post {i}", tipo="general")
+        procesar_tareas()
+
+    def test_consultas_fijas_y_estructura(self):
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/auth/dashboard/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["usuario"]["username"], "ana")
+        self.assertEqual(response.data["semana"]["lunes"]["ejercicios"][0]["nombre_ejercicio"], "Press banca")
+        self.assertIsNone(response.data["semana"]["martes"])
+        self.assertEqual(response.data["amistades"]["amigos"], 1)
+        self.assertEqual(len(response.data["feed"]["results"]), 3)
+        self.assertIsNone(response.data["feed"]["next"])
+
+        with self.assertNumQueries(0):
+            self.client.get("/api/auth/dashboard/")
+
+    def test_etag_devuelve_304(self):
+        etag = self.client.get("/api/auth/dashboard/")["ETag"]
+        response = self.client.get("/api/auth/dashboard/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_se_invalida_con_cambios(self):
+        etag = self.client.get("/api/auth/dashboard/")["ETag"]
+        Rutina.objects.create(usuario=self.ana, nombre="Pierna", dia="martes")
+
+        response = self.client.get("/api/auth/dashboard/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["semana"]["martes"]["nombre"], "Pierna")
+
+        Publicacion.objects.create(usuario=self.luis, contenido="nuevo", tipo="general")
+        procesar_tareas()
+        response = self.client.get("/api/auth/dashboard/")
+        self.assertEqual(len(response.data["feed"]["results"]), 4)
+
+    def test_likes_de_otro_invalidan_el_del_autor_y_sus_amigos(self):
+        marta = APIClient()
+        marta.force_authenticate(crear_usuario("marta"))
+        luis = APIClient()
+        luis.force_authenticate(self.luis)
+        publicacion = Publicacion.objects.filter(usuario=self.luis).first()
+
+        def likes_en_dashboards():
+            etags, contadores = [], []
+            for cliente in [self.client, luis]:
+                response = cliente.get("/api/auth/dashboard/")
+                etags.append(response["ETag"])
+                contadores.append(next(p["likes_count"] for p in response.data["feed"]["results"] if p["id"] == publicacion.id))
+            return etags, contadores
+
+        etags, contadores = likes_en_dashboards()
+        self.assertEqual(contadores, [0, 0])
+
+        marta.post(f"/api/auth/publicaciones/{publicacion.id}/like/")
+        nuevos, contadores = likes_en_dashboards()
+        self.assertEqual(contadores, [1, 1])
+        self.assertTrue(all(a != b for a, b in zip(etags, nuevos)))
+
+        marta.post("/api/auth/publicaciones/likes/", {"operaciones": [{"publicacion": publicacion.id, "accion": "unlike"}]}, format="json")
+        self.assertEqual(likes_en_dashboards()[1], [0, 0])
+        marta.post("/api/auth/publicaciones/likes/", {"operaciones": [{"publicacion": publicacion.id, "accion": "like"}]}, format="json")
+        self.assertEqual(likes_en_dashboards()[1], [1, 1])
+        marta.delete(f"/api/auth/publicaciones/{publicacion.id}/unlike/")
+        self.assertEqual(likes_en_dashboards()[1], [0, 0])
+
+
+class SerieAnaliticasTests(TestCase):
+    def setUp(self):
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.press = TipoEjercicio.objects.create(nombre="Press banca", grupo_muscular="Pecho")
+        self.sentadilla = TipoEjercicio.objects.create(nombre="Sentadilla", grupo_muscular="Pierna")
+        ahora = timezone.now()
+        # (días atrás, ejercicio, peso, repeticiones)
+        datos = [
+            (15, self.press, 60, 10), (14, self.press, 70, 5), (8, self.press, 65, 8),
+            (7, self.press, 70, 6), (1, self.press, 80, 3), (1, self.sentadilla, 100, 5),
+        ]
+        Serie.objects.bulk_create([
+            Serie(usuario=self.ana, tipo_ejercicio=tipo, peso=peso, repeticiones=reps, fecha=ahora - timedelta(days=dias))
+            for dias, tipo, peso, reps in datos
+        ])
+        Serie.objects.create(usuario=self.luis, tipo_ejercicio=self.press, peso=200, repeticiones=1)
+
+    def test_records_1rm_y_volumen_en_tres_consultas(self):
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/auth/series/analiticas/")
+
+        self.assertEqual(response.status_code, 200)
+        press = next(e for e in response.data["ejercicios"] if e["tipo_ejercicio"] == self.press.id)
+        self.assertEqual(press["series"], 5)
+        self.assertEqual(press["mejor_peso"], Decimal("80"))
+        self.assertEqual(press["mejor_1rm"], 88.0)
+        self.assertEqual(press["volumen"], 600 + 350 + 520 + 420 + 240)
+
+        # Igualar el récord (70 a los 7 días) no cuenta como récord nuevo
+        records = [(r["tipo_ejercicio"], r["peso"]) for r in response.data["records"]]
+        self.assertEqual(records, [
+            (self.press.id, Decimal("60")), (self.press.id, Decimal("70")),
+            (self.press.id, Decimal("80")), (self.sentadilla.id, Decimal("100")),
+        ])
+
+        semanas = response.data["volumen_semanal"]
+        self.assertEqual(sum(s["series"] for s in semanas), 6)
+        self.assertEqual(sum(s["volumen"] for s in semanas), 2130 + 500)
+
+    def test_filtro_por_ejercicio_y_semanas(self):
+        response = self.client.get("/api/auth/series/analiticas/", {"tipo_ejercicio": self.press.id, "semanas": 1})
+        self.assertEqual([e["tipo_ejercicio"] for e in response.data["ejercicios"]], [self.press.id])
+        self.assertEqual(sum(s["series"] for s in response.data["volumen_semanal"]), 1)
+
+        response = self.client.get("/api/auth/series/analiticas/", {"semanas": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_registro_y_listado(self):
+        response = self.client.post("/api/auth/series/", {"tipo_ejercicio": self.press.id, "peso": "82.5", "repeticiones": 2})
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get("/api/auth/series/", {"tipo_ejercicio": self.press.id, "page_size": 2})
+        self.assertEqual(response.data["results"][0]["peso"], "82.50")
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.post("/api/auth/series/", {"tipo_ejercicio": self.press.id, "peso": "50", "repeticiones": 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class RankingsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.eva = crear_usuario("eva")
+        self.extrano = crear_usuario("extrano")
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        Amistad.objects.create(usuario=self.eva, amigo=self.ana, status="aceptada")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.press = TipoEjercicio.objects.create(nombre="Press banca", grupo_muscular="Pecho")
+        self.rutinas = {
+            u.username: Rutina.objects.create(usuario=u, nombre="Torso", dia="lunes")
+            for u in [self.ana, self.luis, self.eva, self.extrano]
+        }
+
+    def ejercicio(self, username, peso):
+        return EjercicioRutina.objects.create(
+            rutina=self.rutinas[username], tipo_ejercicio=self.press, sets=3, repeticiones=5, orden=0, record_peso=peso
+        )
+
+    def ranking(self):
+        response = self.client.get("/api/auth/rankings/records/", {"tipo_ejercicio": self.press.id})
+        return [(r["username"], r["peso"]) for r in response.data["results"]]
+
+    def test_ranking_de_amigos_incremental(self):
+        self.ejercicio("ana", 80)
+        luis = self.ejercicio("luis", 100)
+        self.ejercicio("eva", 90)
+        self.ejercicio("extrano", 200)
+        Serie.objects.create(usuario=self.eva, tipo_ejercicio=self.press, peso=95, repeticiones=2)
+
+        self.ranking()
+        with self.assertNumQueries(1):
+            ranking = self.ranking()
+        self.assertEqual(ranking, [("luis", Decimal("100")), ("eva", Decimal("95")), ("ana", Decimal("80"))])
+
+        # Bajar un récord recalcula; borrar la rutina lo elimina
+        luis.record_peso = 70
+        luis.save()
+        self.assertEqual(self.ranking()[-1], ("luis", Decimal("70")))
+        self.rutinas["luis"].delete()
+        self.assertEqual([u for u, _ in self.ranking()], ["eva", "ana"])
+
+    def test_borrar_rutina_recalcula_una_vez(self):
+        tipos = [TipoEjercicio.objects.create(nombre=f"Ejercicio {i}", grupo_muscular="Pecho") for i in range(15)]
+        self.ejercicio("ana", 80)
+        consultas = []
+        for cuantos in (3, 15):
+            rutina = Rutina.objects.create(usuario=self.ana, nombre="Pecho", dia="martes")
+            for i, tipo in enumerate([self.press] + tipos[:cuantos - 1]):
+                EjercicioRutina.objects.create(rutina=rutina, tipo_ejercicio=tipo, sets=3, repeticiones=5, orden=i, record_peso=100)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.delete(f"/api/auth/rutinas/{rutina.id}/")
+            self.assertEqual(response.status_code, 204)
+            consultas.append(len(ctx.captured_queries))
+            # Queda el récord de la otra rutina
+            self.assertEqual(self.ranking()[-1], ("ana", Decimal("80")))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_lote_actualiza_records(self):
+        ejercicio = self.ejercicio("ana", 80)
+        response = self.client.post(
+            f"/api/auth/rutinas/{self.rutinas['ana'].id}/ejercicios-lote/",
+            {"actualizar": [{"id": ejercicio.id, "record_peso": "60"}],
+             "crear": [{"tipo_ejercicio": self.press.id, "sets": 3, "repeticiones": 5, "record_peso": "85"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ranking(), [("ana", Decimal("85"))])
+
+    def test_rachas(self):
+        hoy = timezone.now()
+        for dias in [10, 9, 2, 1, 0]:
+            Serie.objects.create(usuario=self.luis, tipo_ejercicio=self.press, peso=50, repeticiones=5, fecha=hoy - timedelta(days=dias))
+        for dias in [6, 5, 4, 3]:
+            Serie.objects.create(usuario=self.ana, tipo_ejercicio=self.press, peso=50, repeticiones=5, fecha=hoy - timedelta(days=dias))
+        # Serie anotada con fecha pasada que une dos rachas de eva
+        for dias in [3, 1, 0, 2]:
+            Serie.objects.create(usuario=self.eva, tipo_ejercicio=self.press, peso=50, repeticiones=5, fecha=hoy - timedelta(days=dias))
+
+        response = self.client.get("/api/auth/rankings/rachas/")
+        filas = [(r["username"], r["actual"], r["mejor"]) for r in response.data["results"]]
+        self.assertEqual(filas, [("eva", 4, 4), ("luis", 3, 3), ("ana", 0, 4)])
+
+
+class TareasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        press = TipoEjercicio.objects.create(nombre="Press banca", grupo_muscular="Pecho")
+        rutina = Rutina.objects.create(usuario=self.ana, nombre="Torso", dia="lunes")
+        self.ejercicio = EjercicioRutina.objects.create(
+            rutina=rutina, tipo_ejercicio=press, sets=3, repeticiones=5, record_peso=80
+        )
+        procesar_tareas()
+
+    def test_record_se_publica_fuera_de_la_peticion(self):
+        for peso in ["85.00", "85.00", "82.00"]:
+            response = self.client.patch(f"/api/auth/ejercicio-rutinas/{self.ejercicio.id}/", {"record_peso": peso})
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(Publicacion.objects.filter(tipo="record").exists())
+
+        # Guardar dos veces el mismo récord encola una sola tarea; bajar el peso no encola nada
+        self.assertEqual(Tarea.objects.filter(nombre="publicar_record").count(), 1)
+        out = StringIO()
+        call_command("procesar_tareas", "--una-vez", stdout=out)
+
+        record = Publicacion.objects.get(tipo="record")
+        self.assertIn("85.00 kg", record.contenido)
+        self.assertTrue(EntradaTimeline.objects.filter(usuario=self.luis, publicacion=record).exists())
+        self.assertFalse(Tarea.objects.exclude(estado="hecha").exists())
+
+    def test_reintentos_con_espera(self):
+        Tarea.objects.create(nombre="no_registrada", max_intentos=2)
+
+        procesar_tareas()
+        tarea = Tarea.objects.get(nombre="no_registrada")
+        self.assertEqual((tarea.estado, tarea.intentos), ("pendiente", 1))
+        self.assertGreater(tarea.ejecutar_desde, timezone.now())
+        self.assertEqual(procesar_tareas(), 0)
+
+        Tarea.objects.filter(pk=tarea.pk).update(ejecutar_desde=timezone.now())
+        procesar_tareas()
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ("fallida", 2))
+        self.assertIn("LookupError", tarea.error)
+
+    @override_settings(TAREAS_EN_LINEA=True)
+    def test_en_linea_sin_trabajador(self):
+        self.ejercicio.record_peso = 90
+        self.ejercicio.save()
+        self.assertTrue(Publicacion.objects.filter(tipo="record").exists())
+        self.assertFalse(Tarea.objects.filter(nombre="publicar_record").exists())
+
+
+class BackendEventosPrueba(BackendEventos):
+    """Sustituto del pub/sub que solo apunta lo publicado"""
+
+    def __init__(self):
+        self.publicados = []
+
+    def publicar(self, usuario_id, evento):
+        self.publicados.append((usuario_id, evento))
+
+
+@override_settings(EVENTOS_BACKEND="mainapp.tests.BackendEventosPrueba")
+class EventosEmitidosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        backend_eventos.cache_clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+
+    def publicados(self):
+        return [(u, e["tipo"]) for u, e in backend_eventos().publicados]
+
+    def test_amistad_like_y_publicacion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Amistad.objects.create(usuario=self.luis, amigo=self.ana, status="aceptada")
+            publicacion = Publicacion.objects.create(usuario=self.luis, contenido="hola", tipo="general")
+            procesar_tareas()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/auth/publicaciones/{publicacion.id}/like/")
+            self.client.delete(f"/api/auth/publicaciones/{publicacion.id}/unlike/")
+
+        self.assertEqual(sorted(self.publicados()), sorted([
+            (self.luis.id, "amistad"), (self.ana.id, "amistad"),
+            (self.ana.id, "publicacion"), (self.luis.id, "like"), (self.luis.id, "like"),
+        ]))
+        acciones = [e["accion"] for _, e in backend_eventos().publicados if e["tipo"] == "like"]
+        self.assertEqual(acciones, ["dar", "quitar"])
+
+    def test_publicacion_nueva_con_la_cola_de_tareas(self):
+        Amistad.objects.create(usuario=self.luis, amigo=self.ana, status="aceptada")
+        self.client.force_authenticate(self.luis)
+        with self.settings(TAREAS_EN_LINEA=False), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/auth/publicaciones/", {"contenido": "hola", "tipo": "general"})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Tarea.objects.filter(nombre="repartir_publicacion").exists())
+
+        # El evento sale del proceso web, sin esperar al trabajador, y ya trae la publicación
+        eventos = [(u, e) for u, e in backend_eventos().publicados if e["tipo"] == "publicacion"]
+        self.assertEqual([u for u, _ in eventos], [self.ana.id])
+        self.assertEqual(eventos[0][1]["publicacion"]["contenido"], "hola")
+        self.assertEqual(eventos[0][1]["publicacion"]["usuario"], "luis")
+        self.assertFalse(eventos[0][1]["publicacion"]["liked_by_user"])
+        with self.captureOnCommitCallbacks(execute=True):
+            procesar_tareas()
+        self.assertEqual(len([e for _, e in backend_eventos().publicados if e["tipo"] == "publicacion"]), 1)
+
+    def test_no_se_emite_si_la_transaccion_falla(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Amistad.objects.create(usuario=self.luis, amigo=self.ana)
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(self.publicados(), [])
+
+
+class EventosStreamTests(TestCase):
+    def setUp(self):
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.token = str(AccessToken.for_user(self.ana))
+
+    async def test_stream_recibe_eventos_del_usuario(self):
+        response = await self.async_client.get("/api/auth/eventos/", {"token": self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        flujo = aiter(response.streaming_content)
+        self.assertEqual(await anext(flujo), b"retry: 5000\n\n")
+
+        backend_eventos().publicar(self.luis.id, {"tipo": "like", "publicacion": 1})
+        backend_eventos().publicar(self.ana.id, {"tipo": "amistad", "id": 7, "status": "pendiente"})
+        evento = await asyncio.wait_for(anext(flujo), 2)
+        self.assertEqual(evento, b'event: amistad\ndata: {"id": 7, "status": "pendiente"}\n\n')
+        await flujo.aclose()
+
+    def test_por_wsgi_no_abre_el_stream(self):
+        with self.settings(VISTAS_ASYNC=False):
+            response = self.client.get("/api/auth/eventos/", {"token": self.token})
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    async def test_sin_token(self):
+        response = await self.async_client.get("/api/auth/eventos/", {"token": "no-es-un-token"})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get("/api/auth/eventos/")
+        self.assertEqual(response.status_code, 401)
+
+
+class AutenticacionRapidaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.client = APIClient()
+        response = self.client.post(
+            "/api/auth/login/", {"email": "ana@example.com", "password": "contraseña-segura-123"}, format="json"
+        )
+        self.tokens = response.json()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_peticion_autenticada_sin_consultas(self):
+        self.assertEqual(self.client.get("/api/auth/users/me/").status_code, 200)
+        # Usuario y lista negra ya en caché: autenticar no toca la base de datos
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/users/me/")
+        self.assertEqual(response.json()["username"], "ana")
+
+    def test_editar_perfil_no_pisa_la_contrasena(self):
+        response = self.client.patch("/api/auth/users/me/", {"nombre": "Ana"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.ana.refresh_from_db()
+        self.assertEqual(self.ana.nombre, "Ana")
+        self.assertTrue(self.ana.check_password("contraseña-segura-123"))
+        self.assertEqual(self.client.get("/api/auth/users/me/").json()["nombre"], "Ana")
+
+    def test_logout_revoca_access_y_refresh(self):
+        response = self.client.post("/api/auth/logout/", {"refresh": self.tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.client.get("/api/auth/users/me/").status_code, 401)
+        response = APIClient().post("/api/auth/refresh/", {"refresh": self.tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_revocado_se_comprueba_en_base_de_datos(self):
+        self.client.post("/api/auth/logout/", {"refresh": self.tokens["refresh"]}, format="json")
+        # Como otro proceso cuya copia en memoria de la lista negra aún no se ha recargado
+        with mock.patch("mainapp.autenticacion.jti_revocados", return_value=frozenset()):
+            response = APIClient().post("/api/auth/refresh/", {"refresh": self.tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revoca_access_token_sin_sesion(self):
+        access = str(AccessToken.for_user(self.ana))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.client.post("/api/auth/logout/", {"refresh": self.tokens["refresh"]}, format="json")
+        self.assertEqual(self.client.get("/api/auth/users/me/").status_code, 401)
+
+    def test_usuario_desactivado_deja_de_autenticar(self):
+        self.assertEqual(self.client.get("/api/auth/users/me/").status_code, 200)
+        self.ana.is_active = False
+        self.ana.save()
+        self.assertEqual(self.client.get("/api/auth/users/me/").status_code, 401)
+
+    def test_purgar_tokens_caducados(self):
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        salida = StringIO()
+        call_command("purgar_tokens", "--dry-run", stdout=salida)
+        self.assertIn("1 tokens caducados", salida.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        call_command("purgar_tokens", stdout=StringIO())
+        self.assertFalse(OutstandingToken.objects.exists())
+
+
+class BaseDatosTests(TestCase):
+    def test_pragmas_sqlite_en_cada_conexion(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+    def test_db_del_repositorio_no_pasa_a_wal(self):
+        self.assertNotIn("journal_mode", pragmas_para(settings.BASE_DIR / "db.sqlite3"))
+        self.assertEqual(pragmas_para(str(settings.BASE_DIR / "otra.sqlite3"))["journal_mode"], "WAL")
+        self.assertEqual(pragmas_para(str(settings.BASE_DIR / "db.sqlite3"))["synchronous"], "NORMAL")
+
+    def test_benchmark_escrituras(self):
+        salida = StringIO()
+        call_command("benchmark_escrituras", "--hilos", "2", "--escrituras", "5", "--lectores", "1", stdout=salida)
+        lineas = {linea.split()[0]: linea for linea in salida.getvalue().splitlines() if linea.strip()}
+        self.assertIn("antes", lineas)
+        # Con BEGIN diferido la configuración anterior puede perder escrituras; la nueva no
+        self.assertIn("errores 0", lineas["despues"])
+
+
+class VistasAsyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario("ana")
+        self.luis = crear_usuario("luis")
+        self.auth = f"Bearer {AccessToken.for_user(self.ana)}"
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        press = TipoEjercicio.objects.create(nombre="Press banca", grupo_muscular="Pecho")
+        rutina = Rutina.objects.create(usuario=self.ana, nombre="Empuje", dia="lunes")
+        EjercicioRutina.objects.create(rutina=rutina, tipo_ejercicio=press, sets=4, repeticiones=8, orden=0)
+        Amistad.objects.create(usuario=self.ana, amigo=self.luis, status="aceptada")
+        for i in range(3):
+            Publicacion.objects.create(usuario=self.luis, contenido=f"post {i}", tipo="general")
+        procesar_tareas()
+
+    def get_async(self, vista, ruta, **params):
+        request = AsyncRequestFactory().get(ruta, params, headers={"Authorization": self.auth})
+        return async_to_sync(vista)(request)
+
+    def test_mismas_respuestas_que_las_vistas_drf(self):
+        casos = [
+            (vistas_async.feed_async, "/api/auth/publicaciones/", {"page_size": 2}),
+            (vistas_async.feed_async, "/api/auth/publicaciones/", {"fields": "id,contenido"}),
+            (vistas_async.rutinas_async, "/api/auth/rutinas/", {"expand": "usuario"}),
+            (vistas_async.tipo_ejercicios_async, "/api/auth/tipo-ejercicios/", {}),
+            (vistas_async.amistades_async, "/api/auth/amistades/", {}),
+            (vistas_async.dashboard_async, "/api/auth/dashboard/", {}),
+        ]
+        for vista, ruta, params in casos:
+            with self.subTest(ruta=ruta, params=params):
+                cache.clear()
+                esperado = self.client.get(ruta, params).json()
+                cache.clear()
+                response = self.get_async(vista, ruta, **params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), esperado)
+
+    def test_dashboard_en_una_transaccion_lee_por_su_conexion(self):
+        # Usuario y lista negra ya en caché: quedan las lecturas del propio dashboard
+        jti_revocados()
+        usuario_cacheado(self.ana.id)
+        with self.assertNumQueries(4):
+            response = self.get_async(vistas_async.dashboard_async, "/api/auth/dashboard/")
+        datos = json.loads(response.content)
+        self.assertEqual(datos["amistades"]["amigos"], 1)
+        self.assertEqual(len(datos["feed"]["results"]), 3)
+
+    def test_errores(self):
+        self.auth = "Bearer no-es-un-token"
+        self.assertEqual(self.get_async(vistas_async.feed_async, "/api/auth/publicaciones/").status_code, 401)
+        self.auth = f"Bearer {AccessToken.for_user(self.ana)}"
+        response = self.get_async(vistas_async.rutinas_async, "/api/auth/rutinas/", fields="no_existe")
+        self.assertEqual(response.status_code, 400)
+
+    def test_con_lectura_async_solo_desvia_los_get(self):
+        with self.settings(VISTAS_ASYNC=True):
+            vista = vistas_async.con_lectura_async(RutinaListCreateView.as_view(), vistas_async.rutinas_async)
+        request = AsyncRequestFactory().post(
+            "/api/auth/rutinas/", {"usuario": self.ana.id, "nombre": "Pierna", "dia": "martes"},
+            content_type="application/json", headers={"Authorization": self.auth},
+        )
+        self.assertEqual(async_to_sync(vista)(request).status_code, 201)
+        request = AsyncRequestFactory().get("/api/auth/rutinas/", headers={"Authorization": self.auth})
+        response = async_to_sync(vista)(request)
+        self.assertEqual([r["nombre"] for r in json.loads(response.content)], ["Empuje", "Pierna"])
+
+
+class DashboardAsyncConcurrenteTests(TransactionTestCase):
+    def test_lecturas_a_la_vez_cada_una_con_su_conexion(self):
+        ana = crear_usuario("ana")
+        luis = crear_usuario("luis")
+        Amistad.objects.create(usuario=ana, amigo=luis, status="aceptada")
+        Publicacion.objects.create(usuario=luis, contenido="de luis", tipo="general")
+        procesar_tareas()
+        cache.clear()
+
+        # Cada lectura espera a las otras dos: en serie, la barrera se rompería por timeout
+        barrera = threading.Barrier(3, timeout=5)
+        hilos = set()
+
+        def esperando(funcion):
+            def envoltura(*args):
+                hilos.add(threading.get_ident())
+                barrera.wait()
+                return funcion(*args)
+            return envoltura
+
+        with mock.patch.object(vistas_async, "leer_rutinas", esperando(vistas_async.leer_rutinas)), \
+                mock.patch.object(vistas_async, "grafo_amistades", esperando(vistas_async.grafo_amistades)), \
+                mock.patch.object(vistas_async, "leer_feed", esperando(vistas_async.leer_feed)):
+            request = AsyncRequestFactory().get(
+                "/api/auth/dashboard/", headers={"Authorization": f"Bearer {AccessToken.for_user(ana)}"}
+            )
+            response = async_to_sync(vistas_async.dashboard_async)(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(hilos), 3)
+        datos = json.loads(response.content)
+        self.assertEqual(datos["amistades"]["amigos"], 1)
+        self.assertEqual([p["contenido"] for p in datos["feed"]["results"]], ["de luis"])
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reiniciar_metricas()
+        self.ana = crear_usuario("ana")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        for dia in ["lunes", "martes"]:
+            Rutina.objects.create(usuario=self.ana, nombre=f"Rutina {dia}", dia=dia)
+
+    def test_cabecera_con_las_consultas(self):
+        with self.settings(METRICAS_CABECERA=True), CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/auth/rutinas/")
+        self.assertEqual(response["X-Consultas-SQL"], str(len(ctx.captured_queries)))
+        with self.settings(METRICAS_CABECERA=False):
+            self.assertNotIn("X-Consultas-SQL", self.client.get("/api/auth/rutinas/"))
+
+    def test_cabecera_bajo_asgi(self):
+        token = f"Bearer {AccessToken.for_user(self.ana)}"
+        with self.settings(METRICAS_CABECERA=True):
+            response = async_to_sync(self.async_client.get)("/api/auth/rutinas/", headers={"Authorization": token})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-Consultas-SQL"]), 0)
+
+    def test_histogramas_por_ruta_en_metrics(self):
+        self.client.get("/api/auth/rutinas/")
+        self.client.get("/api/auth/rutinas/")
+        self.client.get("/api/auth/rutinas/999/")
+        # Peticiones de otro hilo: van a los mismos histogramas
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(observar, "rutina-list-create", "GET", 200, {"execcount_http_consultas_sql": 1}).result()
+
+        with self.settings(DEBUG=True):
+            response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        texto = response.content.decode()
+        self.assertIn('execcount_http_duracion_segundos_count{ruta="rutina-list-create",metodo="GET"} 2', texto)
+        self.assertIn('execcount_http_consultas_sql_count{ruta="rutina-list-create",metodo="GET"} 3', texto)
+        self.assertIn('execcount_http_consultas_sql_bucket{ruta="rutina-list-create",metodo="GET",le="+Inf"} 3', texto)
+        self.assertIn('execcount_http_respuestas_total{ruta="rutina-detail",metodo="GET",estado="404"} 1', texto)
+
+    def test_token_de_metrics(self):
+        # Sin token configurado, /metrics solo es pública con DEBUG
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with self.settings(METRICAS_TOKEN="secreto"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secreto").status_code, 200)
+
+    def test_avisos_de_peticiones_lentas_o_repetitivas(self):
+        with self.assertNoLogs("mainapp.metricas"):
+            self.client.get("/api/auth/rutinas/")
+        with self.settings(METRICAS_UMBRAL_REPETIDAS=1), self.assertLogs("mainapp.metricas", "WARNING") as logs:
+            self.client.get("/api/auth/rutinas/")
+        self.assertIn("posible N+1", logs.output[0])
+        self.assertIn('FROM "mainapp_rutina"', logs.output[0])
+        with self.settings(METRICAS_UMBRAL_LENTA=0), self.assertLogs("mainapp.metricas", "WARNING") as logs:
+            self.client.get("/api/auth/rutinas/")
+        self.assertIn("(rutina-list-create)", logs.output[0])
+        self.assertNotIn("posible N+1", logs.output[0])
+
+
+class DatosSinteticosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def generar(self, *extra):
+        call_command(
+            "generar_datos", "--usuarios", "20", "--amistades", "40", "--publicaciones", "30", "--likes", "60",
+            "--lote", "7", *extra, stdout=StringIO(),
+        )
+
+    def test_generar_datos_reproducible_y_coherente(self):
+        # Catálogo ya cacheado: tiene que verse el que crea el comando
+        self.assertEqual(self.client.get("/api/auth/tipo-ejercicios/").json(), [])
+        self.generar()
+        self.assertEqual(len(self.client.get("/api/auth/tipo-ejercicios/").json()), TipoEjercicio.objects.count())
+        self.assertEqual(Usuario.objects.filter(email__endswith="@sintetico.execcount.test").count(), 20)
+        self.assertEqual(Amistad.objects.count(), 40)
+        self.assertEqual(Publicacion.objects.count(), 30)
+        self.assertEqual(Rutina.objects.count(), 60)
+        # likes_count cuadra con las filas de Like, y cada autor ve su publicación en el feed
+        self.assertEqual(Publicacion.objects.reconciliar_likes(), 0)
+        self.assertEqual(EntradaTimeline.objects.filter(usuario=F("publicacion__usuario")).count(), 30)
+        autor = Publicacion.objects.order_by("id").first().usuario
+        self.assertIn(Publicacion.objects.order_by("id").first(), Publicacion.objects.feed_de(autor))
+        # Fechas repartidas en el último año, copiadas al timeline, sin tocar auto_now_add
+        fechas = set(Publicacion.objects.values_list("fecha_creacion", flat=True))
+        self.assertGreater(len(fechas), 1)
+        self.assertLessEqual(max(fechas), timezone.now().replace(hour=0, minute=0, second=0, microsecond=0))
+        self.assertFalse(EntradaTimeline.objects.exclude(fecha_creacion=F("publicacion__fecha_creacion")).exists())
+        self.assertTrue(Publicacion._meta.get_field("fecha_creacion").auto_now_add)
+
+        antes = list(Publicacion.objects.order_by("id").values_list("usuario__username", "contenido", "likes_count"))
+        with self.assertRaises(CommandError):
+            self.generar()
+        Serie.objects.create(usuario=autor, tipo_ejercicio=TipoEjercicio.objects.first(), peso=50, repeticiones=5)
+        self.generar("--borrar")
+        self.assertFalse(Serie.objects.exists())
+        self.assertEqual(Amistad.objects.count(), 40)
+        self.assertEqual(Like.objects.count(), sum(Publicacion.objects.values_list("likes_count", flat=True)))
+        despues = list(Publicacion.objects.order_by("id").values_list("usuario__username", "contenido", "likes_count"))
+        self.assertEqual(antes, despues)
+
+    def test_benchmark_api(self):
+        self.generar()
+        salida = StringIO()
+        call_command(
+            "benchmark_api", "--usuario", "usuario0@sintetico.execcount.test", "--peticiones", "2",
+            "--concurrencia", "1", stdout=salida, stderr=StringIO(),
+        )
+        resultado = json.loads(salida.getvalue())
+
+        self.assertEqual(resultado["omitidas"]["eventos"], "stream SSE sin fin")
+        feed = resultado["rutas"]["lista_crear_publicaciones"]
+        self.assertEqual(feed["estados"], {"200": 2})
+        self.assertLessEqual({"p50_ms", "p95_ms", "p99_ms", "consultas_por_peticion"}, set(feed))
+        self.assertEqual(resultado["rutas"]["registro"]["estados"], {"201": 2})
+        # Las escrituras se deshacen
+        self.assertFalse(Usuario.objects.filter(username__startswith="bench").exists())
@@ -0,0 +1,68 @@
+from django.db.models import Q
+
+from .amistades import amigos_aceptados, cargar_grafo
+from .dashboard import invalidar_dashboard
+from .eventos import emitir
+from .models import EntradaTimeline, Publicacion
+from .serializers import PublicacionSerializer
+
+
+def repartir_publicacion(publicacion):
+    """Escribe la publicación en el timeline de su autor y de todos sus amigos"""
+    # Los amigos se leen de la base de datos, no de la caché: esto corre en el trabajador de
+    # tareas, cuya caché (LocMem, por proceso) no se entera de los cambios de amistad hechos
+    # en el servidor web, y repartir a un examigo filtraría sus publicaciones
+    destinatarios = cargar_grafo(publicacion.usuario_id).aceptados | {publicacion.usuario_id}
+    EntradaTimeline.objects.bulk_create(
+        [
+            EntradaTimeline(usuario_id=u, publicacion=publicacion, fecha_creacion=publicacion.fecha_creacion)
+            for u in destinatarios
+        ],
+        ignore_conflicts=True,
+    )
+    invalidar_dashboard(*destinatarios)
+
+
+def escribir_en_timeline_del_autor(publicacion):
+    """El autor ve su publicación al momento; el reparto a los amigos va a la cola de tareas"""
+    EntradaTimeline.objects.bulk_create(
+        [EntradaTimeline(usuario_id=publicacion.usuario_id, publicacion=publicacion, fecha_creacion=publicacion.fecha_creacion)],
+        ignore_conflicts=True,
+    )
+    invalidar_dashboard(publicacion.usuario_id)
+
+
+def anunciar_publicacion(publicacion):
+    """
+    Evento de publicación nueva para los amigos del autor, con la publicación ya
+    serializada. Se emite desde el proceso que la crea, que es el que tiene abiertos los
+    streams, y no desde el reparto, que corre en el trabajador de tareas.
+    """
+    # Recién creada, nadie le ha dado like todavía
+    publicacion.liked = False
+    emitir(
+        amigos_aceptados(publicacion.usuario_id), 'publicacion',
+        id=publicacion.id, usuario=publicacion.usuario_id, publicacion=PublicacionSerializer(publicacion).data,
+    )
+
+
+def rellenar_timelines(usuario_id, amigo_id):
+    """Al aceptar una amistad, cada uno recibe las publicaciones anteriores del otro"""
+    entradas = []
+    for destino, autor in ((usuario_id, amigo_id), (amigo_id, usuario_id)):
+        publicaciones = Publicacion.objects.filter(usuario_id=autor).values_list('id', 'fecha_creacion')
+        entradas += [
+            EntradaTimeline(usuario_id=destino, publicacion_id=pk, fecha_creacion=fecha)
+            for pk, fecha in publicaciones
+        ]
+    EntradaTimeline.objects.bulk_create(entradas, ignore_conflicts=True, batch_size=500)
+    invalidar_dashboard(usuario_id, amigo_id)
+
+
+def vaciar_timelines(usuario_id, amigo_id):
+    """Al romper una amistad, cada uno deja de ver las publicaciones del otro"""
+    EntradaTimeline.objects.filter(
+        Q(usuario_id=usuario_id, publicacion__usuario_id=amigo_id)
+        | Q(usuario_id=amigo_id, publicacion__usuario_id=usuario_id)
+    ).delete()
+    invalidar_dashboard(usuario_id, amigo_id)
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import ( AmistadCreateView, AmistadDeleteView, AmistadListView, AmistadUpdateView, 
-                    EjercicioRutinaDetailView, EjercicioRutinaListCreateView, LikeCreateView, LikeDeleteView, PublicacionDetailView, PublicacionListCreateView, RegistroView, 
-                    LogoutView, ReorderEjerciciosView, UsuarioListView, UsuarioDetailView, UsuarioMeView, 
-                    RutinaListCreateView, RutinaDetailView, TipoEjercicioDetailView,
+from .views import ( AmistadCreateView, DashboardView, EventosView, AmistadDeleteView, AmistadListView, AmistadUpdateView, 
+                    EjercicioRutinaDetailView, EjercicioRutinaListCreateView, EjercicioRutinaLoteView, LikeCreateView, LikeDeleteView, LikeLoteView, PublicacionDetailView, PublicacionListCreateView, RankingRachasView, RankingRecordsView, RegistroView, 
+                    LogoutView, ReorderEjerciciosView, UsuarioListView, UsuarioDetailView, UsuarioAutocompletarView, UsuarioMeView, 
+                    RutinaListCreateView, RutinaDetailView, SerieAnaliticasView, SerieDetailView, SerieListCreateView, TipoEjercicioDetailView, TipoEjercicioBusquedaView,
                     TipoEjercicioListCreateView  )
+from .vistas_async import amistades_async, con_lectura_async, dashboard_async, feed_async, rutinas_async, tipo_ejercicios_async
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -17,27 +18,40 @@ urlpatterns = [
 
     path('users/', UsuarioListView.as_view()),              
     path('users/me/', UsuarioMeView.as_view()),
+    path('dashboard/', con_lectura_async(DashboardView.as_view(), dashboard_async), name='dashboard'),
+    path('eventos/', EventosView.as_view(), name='eventos'),
+    path('users/autocompletar/', UsuarioAutocompletarView.as_view(), name='usuario-autocompletar'),
     path('users/<int:pk>/', UsuarioDetailView.as_view()),
 
-    path('rutinas/', RutinaListCreateView.as_view(), name='rutina-list-create'),
+    path('rutinas/', con_lectura_async(RutinaListCreateView.as_view(), rutinas_async), name='rutina-list-create'),
     path('rutinas/<int:pk>/', RutinaDetailView.as_view(), name='rutina-detail'),
     path('rutinas/<int:rutina_id>/reorder-ejercicios/', ReorderEjerciciosView.as_view(), name='reorder-ejercicios'),
+    path('rutinas/<int:rutina_id>/ejercicios-lote/', EjercicioRutinaLoteView.as_view(), name='ejercicios-lote'),
 
-    path('tipo-ejercicios/', TipoEjercicioListCreateView.as_view(), name='tipo_ejercicio_list_create'),
+    path('tipo-ejercicios/', con_lectura_async(TipoEjercicioListCreateView.as_view(), tipo_ejercicios_async), name='tipo_ejercicio_list_create'),
     path('tipo-ejercicios/<int:pk>/', TipoEjercicioDetailView.as_view(), name='tipo_ejercicio_detail'),
+    path('tipo-ejercicios/buscar/', TipoEjercicioBusquedaView.as_view(), name='tipo_ejercicio_buscar'),
 
     path('ejercicio-rutinas/', EjercicioRutinaListCreateView.as_view(), name='ejercicio-rutina-list-create'),
     path('ejercicio-rutinas/<int:pk>/', EjercicioRutinaDetailView.as_view(), name='ejercicio-rutina-detail'),
+
+    path('series/', SerieListCreateView.as_view(), name='serie-list-create'),
+    path('series/analiticas/', SerieAnaliticasView.as_view(), name='serie-analiticas'),
+    path('series/<int:pk>/', SerieDetailView.as_view(), name='serie-detail'),
     
 
-    path('amistades/', AmistadListView.as_view(), name='amistad-list'),
+    path('rankings/records/', RankingRecordsView.as_view(), name='ranking-records'),
+    path('rankings/rachas/', RankingRachasView.as_view(), name='ranking-rachas'),
+
+    path('amistades/', con_lectura_async(AmistadListView.as_view(), amistades_async), name='amistad-list'),
     path('amistades/crear/', AmistadCreateView.as_view(), name='amistad-create'),
     path('amistades/<int:pk>/actualizar/', AmistadUpdateView.as_view(), name='amistad-update'),
     path('amistades/<int:pk>/eliminar/', AmistadDeleteView.as_view(), name='amistad-delete'),
 
-    path('publicaciones/', PublicacionListCreateView.as_view(), name='lista_crear_publicaciones'),
+    path('publicaciones/', con_lectura_async(PublicacionListCreateView.as_view(), feed_async), name='lista_crear_publicaciones'),
     path('publicaciones/<int:pk>/', PublicacionDetailView.as_view(), name='detalle_publicacion'),
 
     path('publicaciones/<int:publicacion_id>/like/', LikeCreateView.as_view(), name='dar_like'),
     path('publicaciones/<int:publicacion_id>/unlike/', LikeDeleteView.as_view(), name='quitar_like'),
+    path('publicaciones/likes/', LikeLoteView.as_view(), name='likes_lote'),
 ]
\ No newline at end of file
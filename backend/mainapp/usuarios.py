@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Usuario
+
+# Mayor que cualquier carácter, para convertir un prefijo en un rango del índice
+FIN_PREFIJO = '\U0010ffff'
+
+
+class CacheLRU:
+    """Caché en memoria de tamaño acotado que descarta lo usado hace más tiempo"""
+
+    def __init__(self, tamano=1024):
+        self.tamano = tamano
+        self.datos = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, clave):
+        with self.lock:
+            if clave not in self.datos:
+                return None
+            self.datos.move_to_end(clave)
+            return self.datos[clave]
+
+    def set(self, clave, valor):
+        with self.lock:
+            self.datos[clave] = valor
+            self.datos.move_to_end(clave)
+            while len(self.datos) > self.tamano:
+                self.datos.popitem(last=False)
+
+    def descartar(self, condicion):
+        with self.lock:
+            for clave in [c for c, v in self.datos.items() if condicion(v)]:
+                del self.datos[clave]
+
+    def clear(self):
+        with self.lock:
+            self.datos.clear()
+
+
+# Es propia de cada proceso: solo se invalida en el proceso que guarda el usuario.
+# Username y email no se pueden editar desde la API, así que el riesgo es bajo.
+usuarios_por_texto = CacheLRU()
+
+
+def buscar_usuario(texto):
+    """
+    Busca un usuario por username o email, sin distinguir mayúsculas, en una sola
+    consulta sobre los índices de LOWER(username) y LOWER(email). Si el texto
+    coincide con el username de uno y el email de otro, gana el username.
+    """
+    clave = texto.strip().lower()
+    if not clave:
+        return None
+    usuario = usuarios_por_texto.get(clave)
+    if usuario is not None:
+        return usuario
+
+    candidatos = list(
+        Usuario.objects.alias(username_lower=Lower('username'), email_lower=Lower('email'))
+        .filter(Q(username_lower=clave) | Q(email_lower=clave))[:2]
+    )
+    if not candidatos:
+        return None
+    usuario = next((u for u in candidatos if u.username.lower() == clave), candidatos[0])
+    usuarios_por_texto.set(clave, usuario)
+    return usuario
+
+
+def invalidar_usuario(usuario_id):
+    usuarios_por_texto.descartar(lambda u: u.id == usuario_id)
+
+
+def autocompletar_usuarios(prefijo, limite=10, excluir_id=None):
+    """Usuarios cuyo username empieza por el prefijo, como rango sobre el índice de LOWER(username)"""
+    prefijo = prefijo.strip().lower()
+    if not prefijo:
+        return Usuario.objects.none()
+    usuarios = (
+        Usuario.objects.alias(username_lower=Lower('username'))
+        .filter(username_lower__gte=prefijo, username_lower__lt=prefijo + FIN_PREFIJO)
+        .order_by(Lower('username'))
+    )
+    if excluir_id is not None:
+        usuarios = usuarios.exclude(id=excluir_id)
+    return usuarios[:limite]
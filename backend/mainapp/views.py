@@ -3,12 +3,36 @@ from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.exceptions import TokenError
-from .serializers import AmistadSerializer, EjercicioRutinaSerializer, PublicacionSerializer, RegistroSerializer, UsuarioSerializer, RutinaSerializer, TipoEjercicioSerializer, LikeSerializer
-from .models import Amistad, EjercicioRutina, Like, Publicacion, Usuario, Rutina, TipoEjercicio
-from django.db.models import Q
+from rest_framework.exceptions import AuthenticationFailed
+from .serializers import AmistadSerializer, EjercicioRutinaSerializer, PublicacionSerializer, RegistroSerializer, UsuarioSerializer, UsuarioSugerenciaSerializer, RutinaSerializer, SerieSerializer, TipoEjercicioSerializer, LikeSerializer, LikeLoteSerializer, EjercicioRutinaLoteSerializer
+from .models import Amistad, EjercicioRutina, EntradaTimeline, Like, Publicacion, Serie, Usuario, Rutina, TipoEjercicio
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import condition
+from django.db.models import F, Q
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from asgiref.sync import sync_to_async
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.filters import SearchFilter
+from .autenticacion import CLAIM_SESION, JWTAutenticacionRapida, revocar_access_token
+from .busqueda import buscar_ejercicios
+from .campos import CamposDinamicosViewMixin, optimizar_para_peticion
+from .dashboard import dashboard_cacheado, invalidar_dashboard, invalidar_dashboard_de_publicaciones
+from .eventos import emitir, flujo_eventos
+from .catalogo import clave_detalle, clave_lista, etag_catalogo, ultima_modificacion_catalogo, variante_campos
+from .pagination import FeedCursorPagination, SerieCursorPagination, UsuarioCursorPagination
+from .progreso import analiticas
+from .rankings import actualizar_records, ranking_rachas, ranking_records, supera_record
+from .tareas import encolar_record
+from .usuarios import autocompletar_usuarios
 
 
 class RegistroView(generics.CreateAPIView):
@@ -23,18 +47,39 @@ class LogoutView(APIView):
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
             token.blacklist()
+            # Los access tokens con claim de sesión caen con su refresh token; el resto se revoca aparte
+            if CLAIM_SESION not in request.auth:
+                revocar_access_token(request.auth)
             return Response({"detail": "Logout exitoso"}, status=status.HTTP_205_RESET_CONTENT)
         except KeyError:
             return Response({"error": "refresh token no proporcionado"}, status=status.HTTP_400_BAD_REQUEST)
         except TokenError:
             return Response({"error": "token inválido o expirado"}, status=status.HTTP_400_BAD_REQUEST)
         
-class UsuarioListView(generics.ListAPIView):
-    queryset = Usuario.objects.all()
+class UsuarioListView(CamposDinamicosViewMixin, generics.ListAPIView):
     serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UsuarioCursorPagination
+    filter_backends = [SearchFilter]
+    search_fields = ['username', 'nombre', 'apellidos']
+    queryset = Usuario.objects.all()
 
-class UsuarioDetailView(generics.RetrieveAPIView):
+class UsuarioAutocompletarView(generics.ListAPIView):
+    """Sugerencias por prefijo de username para la caja de "añadir amigo" """
+    serializer_class = UsuarioSugerenciaSerializer
+    permission_classes = [IsAuthenticated]
+    max_resultados = 20
+
+    def get_queryset(self):
+        try:
+            limite = min(self.max_resultados, max(1, int(self.request.query_params.get('limit', 10))))
+        except ValueError:
+            limite = 10
+        return autocompletar_usuarios(
+            self.request.query_params.get('q', ''), limite=limite, excluir_id=self.request.user.id
+        ).only('id', 'username', 'nombre', 'apellidos')
+
+class UsuarioDetailView(CamposDinamicosViewMixin, generics.RetrieveAPIView):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticated]
@@ -46,39 +91,88 @@ class UsuarioMeView(generics.RetrieveUpdateDestroyAPIView):
     def get_object(self):
         return self.request.user
     
-class RutinaListCreateView(generics.ListCreateAPIView):
+class RutinaListCreateView(CamposDinamicosViewMixin, generics.ListCreateAPIView):
     serializer_class = RutinaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Rutina.objects.filter(usuario=self.request.user)
+        return Rutina.objects.filter(usuario=self.request.user).con_ejercicios()
 
     def perform_create(self, serializer):
         serializer.save(usuario=self.request.user)
 
-class RutinaDetailView(generics.RetrieveUpdateDestroyAPIView):
+class RutinaDetailView(CamposDinamicosViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RutinaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Rutina.objects.filter(usuario=self.request.user)
+        return Rutina.objects.filter(usuario=self.request.user).con_ejercicios()
     
-class TipoEjercicioListCreateView(generics.ListCreateAPIView):
+# El catálogo casi nunca cambia: se responde 304 si el ETag coincide y, si no,
+# se sirve el JSON ya serializado para la versión actual
+catalogo_condicional = method_decorator(
+    condition(etag_func=etag_catalogo, last_modified_func=ultima_modificacion_catalogo), name='dispatch'
+)
+
+@catalogo_condicional
+class TipoEjercicioListCreateView(CamposDinamicosViewMixin, generics.ListCreateAPIView):
     queryset = TipoEjercicio.objects.all()
     serializer_class = TipoEjercicioSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class TipoEjercicioDetailView(generics.RetrieveUpdateDestroyAPIView):
+    def list(self, request, *args, **kwargs):
+        clave = clave_lista(variante_campos(request))
+        data = cache.get(clave)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(clave, data)
+        return Response(data)
+
+@catalogo_condicional
+class TipoEjercicioDetailView(CamposDinamicosViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = TipoEjercicio.objects.all()
     serializer_class = TipoEjercicioSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class EjercicioRutinaListCreateView(generics.ListCreateAPIView):
+    def retrieve(self, request, *args, **kwargs):
+        clave = clave_detalle(kwargs['pk'], variante_campos(request))
+        data = cache.get(clave)
+        if data is None:
+            data = super().retrieve(request, *args, **kwargs).data
+            cache.set(clave, data)
+        return Response(data)
+
+class TipoEjercicioBusquedaView(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    page_size = 20
+    max_page_size = 100
+
+    def get(self, request):
+        texto = request.query_params.get('q', '')
+        grupo_muscular = request.query_params.get('grupo_muscular') or None
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = min(self.max_page_size, max(1, int(request.query_params.get('page_size', self.page_size))))
+        except ValueError:
+            return Response({"error": "Paginación inválida"}, status=status.HTTP_400_BAD_REQUEST)
+
+        ejercicios, total, facetas = buscar_ejercicios(
+            texto, grupo_muscular, limite=page_size, desplazamiento=(page - 1) * page_size
+        )
+        return Response({
+            'count': total,
+            'page': page,
+            'page_size': page_size,
+            'results': TipoEjercicioSerializer(ejercicios, many=True).data,
+            'grupos_musculares': facetas,
+        })
+
+class EjercicioRutinaListCreateView(CamposDinamicosViewMixin, generics.ListCreateAPIView):
     serializer_class = EjercicioRutinaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return EjercicioRutina.objects.filter(rutina__usuario=self.request.user)
+        return EjercicioRutina.objects.filter(rutina__usuario=self.request.user).select_related('tipo_ejercicio')
     
     def perform_create(self, serializer):
         rutina = serializer.validated_data['rutina']
@@ -86,13 +180,49 @@ class EjercicioRutinaListCreateView(generics.ListCreateAPIView):
             raise PermissionDenied("No puedes añadir ejercicios a una rutina que no es tuya")
         serializer.save()
 
-class EjercicioRutinaDetailView(generics.RetrieveUpdateDestroyAPIView):
+class EjercicioRutinaDetailView(CamposDinamicosViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = EjercicioRutinaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return EjercicioRutina.objects.filter(rutina__usuario=self.request.user)
+        return EjercicioRutina.objects.filter(rutina__usuario=self.request.user).select_related('tipo_ejercicio')
     
+class SerieListCreateView(CamposDinamicosViewMixin, generics.ListCreateAPIView):
+    serializer_class = SerieSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SerieCursorPagination
+
+    def get_queryset(self):
+        series = Serie.objects.filter(usuario=self.request.user).select_related('tipo_ejercicio')
+        tipo_ejercicio = self.request.query_params.get('tipo_ejercicio')
+        if tipo_ejercicio:
+            series = series.filter(tipo_ejercicio_id=tipo_ejercicio)
+        return series
+
+    def perform_create(self, serializer):
+        serializer.save(usuario=self.request.user)
+
+class SerieDetailView(CamposDinamicosViewMixin, generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = SerieSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Serie.objects.filter(usuario=self.request.user).select_related('tipo_ejercicio')
+
+class SerieAnaliticasView(APIView):
+    """Récords, 1RM estimado y volumen semanal calculados en la base de datos"""
+    permission_classes = [permissions.IsAuthenticated]
+    max_semanas = 104
+
+    def get(self, request):
+        try:
+            tipo_ejercicio = request.query_params.get('tipo_ejercicio')
+            tipo_ejercicio = int(tipo_ejercicio) if tipo_ejercicio else None
+            semanas = min(self.max_semanas, max(1, int(request.query_params.get('semanas', 12))))
+        except ValueError:
+            return Response({"error": "Parámetros inválidos"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(analiticas(request.user, tipo_ejercicio, semanas))
+
 class ReorderEjerciciosView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -105,26 +235,158 @@ class ReorderEjerciciosView(APIView):
         if not isinstance(ejercicios_data, list):
             return Response({"error": "Formato inválido"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Actualizamos el orden
-        for e in ejercicios_data:
-            try:
-                ejercicio = EjercicioRutina.objects.get(id=e["id"], rutina=rutina)
-                ejercicio.orden = e["orden"]
-                ejercicio.save()
-            except EjercicioRutina.DoesNotExist:
-                continue
+        try:
+            nuevo_orden = {int(e["id"]): int(e["orden"]) for e in ejercicios_data}
+        except (KeyError, TypeError, ValueError):
+            return Response({"error": "Formato inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        if any(orden < 0 for orden in nuevo_orden.values()):
+            return Response({"error": "Formato inválido"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({"status": "ok"})
+        # Una consulta para leer y un único UPDATE para guardar el nuevo orden. Se bloquean
+        # solo los ejercicios: sin `of`, FOR UPDATE (PostgreSQL) bloquearía también las filas
+        # del catálogo unidas con select_related, compartidas por todas las rutinas
+        with transaction.atomic():
+            ejercicios = list(
+                EjercicioRutina.objects.select_related('tipo_ejercicio').filter(rutina=rutina)
+                .select_for_update(of=('self',))
+            )
+            ajenos = set(nuevo_orden) - {e.id for e in ejercicios}
+            if ajenos:
+                return Response(
+                    {"error": "Ejercicios que no pertenecen a la rutina", "ids": sorted(ajenos)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            modificados = [e for e in ejercicios if e.id in nuevo_orden and e.orden != nuevo_orden[e.id]]
+            for e in modificados:
+                e.orden = nuevo_orden[e.id]
+            EjercicioRutina.objects.bulk_update(modificados, ['orden'])
+            invalidar_dashboard(request.user.id)
+
+        ejercicios.sort(key=lambda e: (e.orden, e.id))
+        return Response({"status": "ok", "ejercicios": EjercicioRutinaSerializer(ejercicios, many=True).data})
+
+class EjercicioRutinaLoteView(APIView):
+    """Crea, actualiza y elimina ejercicios de una rutina en una sola petición atómica"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, rutina_id):
+        rutina = Rutina.objects.filter(id=rutina_id, usuario=request.user).first()
+        if not rutina:
+            return Response({"error": "Rutina no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = EjercicioRutinaLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        crear = serializer.validated_data['crear']
+        actualizar = {e['id']: e for e in serializer.validated_data['actualizar']}
+        eliminar = set(serializer.validated_data['eliminar'])
+
+        tipos = {e['tipo_ejercicio'] for e in crear} | {e['tipo_ejercicio'] for e in actualizar.values() if 'tipo_ejercicio' in e}
+        tipos_inexistentes = tipos - set(TipoEjercicio.objects.filter(id__in=tipos).values_list('id', flat=True))
+        if tipos_inexistentes:
+            return Response(
+                {"error": "Tipos de ejercicio no encontrados", "ids": sorted(tipos_inexistentes)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            existentes = EjercicioRutina.objects.filter(rutina=rutina).select_for_update().in_bulk(set(actualizar) | eliminar)
+            ajenos = (set(actualizar) | eliminar) - set(existentes)
+            if ajenos:
+                return Response(
+                    {"error": "Ejercicios que no pertenecen a la rutina", "ids": sorted(ajenos)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Ejercicios cuyo récord puede cambiar (el tipo se lee antes de modificarlo)
+            tipos_afectados = tipos | {existentes[pk].tipo_ejercicio_id for pk in set(actualizar) | eliminar}
+
+            if eliminar:
+                EjercicioRutina.objects.filter(rutina=rutina, id__in=eliminar).delete()
+
+            records_previos = {pk: existentes[pk].record_peso for pk in actualizar}
+            campos = set()
+            for pk, cambios in actualizar.items():
+                ejercicio = existentes[pk]
+                for campo, valor in cambios.items():
+                    if campo != 'id':
+                        # tipo_ejercicio llega como id
+                        setattr(ejercicio, 'tipo_ejercicio_id' if campo == 'tipo_ejercicio' else campo, valor)
+                        campos.add(campo)
+            if campos:
+                EjercicioRutina.objects.bulk_update([existentes[pk] for pk in actualizar], list(campos))
+
+            EjercicioRutina.objects.bulk_create([
+                EjercicioRutina(
+                    rutina=rutina,
+                    tipo_ejercicio_id=e['tipo_ejercicio'],
+                    sets=e['sets'],
+                    repeticiones=e['repeticiones'],
+                    record_peso=e.get('record_peso'),
+                    orden=e['orden'],
+                )
+                for e in crear
+            ])
+            invalidar_dashboard(request.user.id)
+            # bulk_create/bulk_update no lanzan señales de guardado (los borrados sí)
+            actualizar_records(request.user.id, tipos_afectados)
+            for pk, previo in records_previos.items():
+                if supera_record(existentes[pk].record_peso, previo):
+                    encolar_record(pk, existentes[pk].record_peso)
+
+        ejercicios = EjercicioRutina.objects.filter(rutina=rutina).select_related('tipo_ejercicio')
+        return Response({"ejercicios": EjercicioRutinaSerializer(ejercicios, many=True).data})
+
+class RankingRecordsView(APIView):
+    """Top de récords entre el usuario y sus amigos para un ejercicio"""
+    permission_classes = [permissions.IsAuthenticated]
+    max_limite = 50
+
+    def get(self, request):
+        try:
+            tipo_ejercicio = int(request.query_params['tipo_ejercicio'])
+            limite = min(self.max_limite, max(1, int(request.query_params.get('limite', 10))))
+        except (KeyError, ValueError):
+            return Response({"error": "Indica tipo_ejercicio (y opcionalmente limite)"}, status=status.HTTP_400_BAD_REQUEST)
+
+        records = ranking_records(request.user, tipo_ejercicio, limite)
+        return Response({
+            'tipo_ejercicio': tipo_ejercicio,
+            'results': [
+                {'posicion': i, 'usuario': r.usuario_id, 'username': r.usuario.username, 'peso': r.peso, 'fecha': r.fecha}
+                for i, r in enumerate(records, start=1)
+            ],
+        })
+
+class RankingRachasView(APIView):
+    """Top de rachas de entrenamiento (días seguidos) entre el usuario y sus amigos"""
+    permission_classes = [permissions.IsAuthenticated]
+    max_limite = 50
+
+    def get(self, request):
+        try:
+            limite = min(self.max_limite, max(1, int(request.query_params.get('limite', 10))))
+        except ValueError:
+            return Response({"error": "Límite inválido"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': [
+                {'posicion': i, 'usuario': r.usuario_id, 'username': r.usuario.username,
+                 'actual': r.vigente, 'mejor': r.mejor, 'ultimo_dia': r.ultimo_dia}
+                for i, r in enumerate(ranking_rachas(request.user, limite), start=1)
+            ],
+        })
 
 class AmistadListView(generics.ListAPIView):
     serializer_class = AmistadSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return Amistad.objects.filter(
-            Q(usuario=user) | Q(amigo=user)
+        # La UNION no admite más cambios, así que ?fields=/?expand= se aplican antes
+        queryset = optimizar_para_peticion(
+            Amistad.objects.select_related('usuario', 'amigo'), self.request, self.get_serializer()
         )
+        return queryset.de_usuario(self.request.user)
 
 class AmistadCreateView(generics.CreateAPIView):
     serializer_class = AmistadSerializer
@@ -163,16 +425,24 @@ class AmistadUpdateView(generics.UpdateAPIView):
 
 class AmistadDeleteView(generics.DestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    queryset = Amistad.objects.all()
 
-    def get_queryset(self):
-        user = self.request.user
-        # Puede eliminar la amistad si es el solicitante o el amigo
-        return Amistad.objects.filter(Q(usuario=user) | Q(amigo=user)) #Q es una forma de hacer consultas de bases de datos, aqui para un or
+    def get_object(self):
+        # Búsqueda por clave primaria; puede eliminarla si es el solicitante o el amigo
+        amistad = super().get_object()
+        if self.request.user.id not in (amistad.usuario_id, amistad.amigo_id):
+            raise Http404
+        return amistad
 
-class PublicacionListCreateView(generics.ListCreateAPIView):
-    queryset = Publicacion.objects.all().order_by('-fecha_creacion')
+class PublicacionListCreateView(CamposDinamicosViewMixin, generics.ListCreateAPIView):
     serializer_class = PublicacionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FeedCursorPagination
+    # Se pagina sobre el índice del timeline (alias de feed_de); los valores coinciden con los de la publicación
+    cursor_fields = ('fecha_timeline', 'publicacion_timeline')
+
+    def get_queryset(self):
+        return Publicacion.objects.feed_de(self.request.user)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -182,14 +452,21 @@ class PublicacionListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(usuario=self.request.user)
 
-class PublicacionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PublicacionDetailView(CamposDinamicosViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Publicacion.objects.all()
     serializer_class = PublicacionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        # Opcional: solo permitir modificar/eliminar publicaciones propias
-        return self.queryset.filter(usuario=self.request.user)
+        usuario = self.request.user
+        queryset = Publicacion.objects.para_feed(usuario)
+        if self.request.method in permissions.SAFE_METHODS:
+            # Leer: cualquiera de su feed (p. ej. la de un amigo que llega por eventos)
+            return queryset.filter(
+                Q(usuario=usuario) | Q(pk__in=EntradaTimeline.objects.filter(usuario=usuario).values('publicacion'))
+            )
+        # Modificar/eliminar: solo las propias
+        return queryset.filter(usuario=usuario)
     
 class LikeCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -199,7 +476,12 @@ class LikeCreateView(APIView):
         if not publicacion:
             return Response({'detail': 'Publicación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
 
-        like, created = Like.objects.get_or_create(usuario=request.user, publicacion=publicacion)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(usuario=request.user, publicacion=publicacion)
+            if created:
+                Publicacion.objects.filter(id=publicacion.id).update(likes_count=F('likes_count') + 1)
+                emitir([publicacion.usuario_id], 'like', publicacion=publicacion.id, usuario=request.user.id, accion='dar')
+
         if created:
             serializer = LikeSerializer(like)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -210,10 +492,120 @@ class LikeDeleteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, publicacion_id):
-        like = Like.objects.filter(usuario=request.user, publicacion_id=publicacion_id).first()
-        if like:
-            like.delete()
+        with transaction.atomic():
+            borrados, _ = Like.objects.filter(usuario=request.user, publicacion_id=publicacion_id).delete()
+            if borrados:
+                Publicacion.objects.filter(id=publicacion_id).update(likes_count=F('likes_count') - 1)
+                autor = Publicacion.objects.filter(id=publicacion_id).values_list('usuario_id', flat=True).first()
+                emitir([autor], 'like', publicacion=publicacion_id, usuario=request.user.id, accion='quitar')
+
+        if borrados:
             return Response(status=status.HTTP_204_NO_CONTENT)
         else:
             return Response({'detail': 'Like no encontrado'}, status=status.HTTP_404_NOT_FOUND)
-    
+
+class LikeLoteView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = LikeLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Si una publicación aparece varias veces, manda la última operación
+        deseado = {}
+        for op in serializer.validated_data['operaciones']:
+            deseado.pop(op['publicacion'], None)
+            deseado[op['publicacion']] = op['accion'] == 'like'
+
+        with transaction.atomic():
+            existentes = set(Publicacion.objects.filter(id__in=deseado).values_list('id', flat=True))
+            ya_likeadas = set(
+                Like.objects.filter(usuario=request.user, publicacion_id__in=existentes)
+                .values_list('publicacion_id', flat=True)
+            )
+            dar = [pk for pk in existentes if deseado[pk] and pk not in ya_likeadas]
+            quitar = [pk for pk in existentes if not deseado[pk] and pk in ya_likeadas]
+
+            Like.objects.bulk_create(
+                [Like(usuario=request.user, publicacion_id=pk) for pk in dar],
+                ignore_conflicts=True,
+            )
+            if quitar:
+                Like.objects.filter(usuario=request.user, publicacion_id__in=quitar).delete()
+            if dar or quitar:
+                # bulk_create con ignore_conflicts no dice qué filas insertó, así que se recalcula
+                Publicacion.objects.filter(id__in=dar + quitar).reconciliar_likes()
+            contadores = dict(Publicacion.objects.filter(id__in=existentes).values_list('id', 'likes_count'))
+            if dar or quitar:
+                # bulk_create no lanza post_save: se invalida aquí, una vez para todo el lote
+                invalidar_dashboard(request.user.id)
+                invalidar_dashboard_de_publicaciones(*dar, *quitar)
+                autores = dict(Publicacion.objects.filter(id__in=dar + quitar).values_list('id', 'usuario_id'))
+                for pk in dar + quitar:
+                    emitir([autores[pk]], 'like', publicacion=pk, usuario=request.user.id, accion='dar' if pk in dar else 'quitar')
+
+        resultados = []
+        for pk, liked in deseado.items():
+            if pk not in existentes:
+                resultados.append({'publicacion': pk, 'estado': 'no_encontrada'})
+                continue
+            cambiada = pk in dar or pk in quitar
+            resultados.append({
+                'publicacion': pk,
+                'estado': 'actualizada' if cambiada else 'sin_cambios',
+                'liked_by_user': liked,
+                'likes_count': contadores[pk],
+            })
+        return Response({'resultados': resultados}, status=status.HTTP_200_OK)
+
+class DashboardView(APIView):
+    """Carga inicial de la app en una sola petición (perfil, semana, amistades y feed)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        etag, datos = dashboard_cacheado(request)
+        etag = quote_etag(etag)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(datos)
+        response['ETag'] = etag
+        # Cacheable solo por el propio usuario, revalidando siempre con el ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+class EventosView(View):
+    """
+    Stream de eventos (Server-Sent Events) del usuario: likes a sus publicaciones, cambios
+    en sus amistades y publicaciones nuevas en su feed. Necesita servirse por ASGI: por WSGI
+    responde 204.
+    EventSource no permite cabeceras, así que el token puede ir en ?token=.
+    """
+
+    async def get(self, request):
+        # Por WSGI el stream infinito ocuparía un hilo del servidor para siempre. Con 204
+        # EventSource deja de reconectar
+        if not (isinstance(request, ASGIRequest) or getattr(settings, 'VISTAS_ASYNC', False)):
+            return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+        usuario = await sync_to_async(self.autenticar)(request)
+        if usuario is None:
+            return JsonResponse({'detail': 'Token no válido o ausente'}, status=status.HTTP_401_UNAUTHORIZED)
+        response = StreamingHttpResponse(flujo_eventos(usuario.id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Evita que un proxy (nginx) acumule el stream en su buffer
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def autenticar(self, request):
+        autenticacion = JWTAutenticacionRapida()
+        raw = request.GET.get('token')
+        if not raw:
+            header = autenticacion.get_header(request)
+            raw = autenticacion.get_raw_token(header) if header else None
+        if not raw:
+            return None
+        try:
+            return autenticacion.get_user(autenticacion.get_validated_token(raw))
+        except (InvalidToken, AuthenticationFailed):
+            return None
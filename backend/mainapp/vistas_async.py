@@ -0,0 +1,203 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.views import View
+from django.views.decorators.http import condition
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+
+from .amistades import grafo_amistades
+from .autenticacion import JWTAutenticacionRapida
+from .campos import optimizar_para_peticion
+from .catalogo import clave_lista, etag_catalogo, ultima_modificacion_catalogo, variante_campos
+from .dashboard import clave_dashboard, empaquetar_dashboard, feed_inicial, montar_dashboard, rutinas_de
+from .models import Amistad, Publicacion, Rutina, TipoEjercicio
+from .pagination import FeedCursorPagination
+from .serializers import AmistadSerializer, PublicacionSerializer, RutinaSerializer, TipoEjercicioSerializer
+from .views import PublicacionListCreateView
+
+
+async def listar(queryset):
+    """Evalúa el queryset con el ORM asíncrono (prefetch_related incluido)"""
+    return [obj async for obj in queryset]
+
+
+def responder(datos, status=200):
+    # Mismo JSON que el JSONRenderer de DRF, que no escapa los caracteres no ASCII
+    return JsonResponse(datos, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+class VistaLecturaAsync(View):
+    """
+    Base de las versiones asíncronas de los GET más usados. Reutiliza la autenticación, los
+    serializers y ?fields=/?expand= de las vistas DRF, pero lee con el ORM asíncrono en vez
+    de ocupar un hilo del servidor mientras espera a la base de datos.
+    """
+    http_method_names = ['get', 'head', 'options']
+    # False para lecturas públicas (IsAuthenticatedOrReadOnly)
+    requiere_usuario = True
+
+    async def get(self, request, *args, **kwargs):
+        autenticacion = JWTAutenticacionRapida()
+        request = Request(request, authenticators=[autenticacion])
+        try:
+            # Normalmente sale de la caché; si hay que consultar, se hace en un hilo
+            usuario = await sync_to_async(lambda: request.user)()
+            if self.requiere_usuario and not usuario.is_authenticated:
+                raise NotAuthenticated()
+            return await self.leer(request, *args, **kwargs)
+        except APIException as exc:
+            datos = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = responder(datos, status=exc.status_code)
+            if exc.status_code == 401:
+                response['WWW-Authenticate'] = autenticacion.authenticate_header(request)
+            return response
+
+    async def leer(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+class FeedAsyncView(VistaLecturaAsync):
+    cursor_fields = PublicacionListCreateView.cursor_fields
+
+    async def leer(self, request):
+        contexto = {'request': request}
+        queryset = optimizar_para_peticion(
+            Publicacion.objects.feed_de(request.user), request, PublicacionSerializer(context=contexto)
+        )
+        paginacion = FeedCursorPagination()
+        consulta = paginacion.consulta_pagina(queryset, request, self)
+        if consulta is None:
+            return responder(PublicacionSerializer(await listar(queryset), many=True, context=contexto).data)
+        pagina = paginacion.fijar_pagina(await listar(consulta))
+        return responder({
+            'next': paginacion.get_next_link(),
+            'results': PublicacionSerializer(pagina, many=True, context=contexto).data,
+        })
+
+
+class RutinaListaAsyncView(VistaLecturaAsync):
+    async def leer(self, request):
+        contexto = {'request': request}
+        queryset = optimizar_para_peticion(
+            Rutina.objects.filter(usuario=request.user).con_ejercicios(), request, RutinaSerializer(context=contexto)
+        )
+        return responder(RutinaSerializer(await listar(queryset), many=True, context=contexto).data)
+
+
+class TipoEjercicioListaAsyncView(VistaLecturaAsync):
+    requiere_usuario = False
+
+    async def leer(self, request):
+        clave = clave_lista(variante_campos(request))
+        data = await cache.aget(clave)
+        if data is None:
+            contexto = {'request': request}
+            queryset = optimizar_para_peticion(
+                TipoEjercicio.objects.all(), request, TipoEjercicioSerializer(context=contexto)
+            )
+            data = TipoEjercicioSerializer(await listar(queryset), many=True, context=contexto).data
+            await cache.aset(clave, data)
+        return responder(data)
+
+
+class AmistadListaAsyncView(VistaLecturaAsync):
+    async def leer(self, request):
+        contexto = {'request': request}
+        queryset = optimizar_para_peticion(
+            Amistad.objects.select_related('usuario', 'amigo'), request, AmistadSerializer(context=contexto)
+        ).de_usuario(request.user)
+        return responder(AmistadSerializer(await listar(queryset), many=True, context=contexto).data)
+
+
+def en_su_hilo(funcion):
+    """
+    sync_to_async(thread_sensitive=True), lo que usa el ORM asíncrono, pasa todas las
+    consultas por un mismo hilo y se ejecutan una detrás de otra. Esto corre `funcion` en un
+    hilo del pool con su propia conexión, que se cierra al terminar.
+    """
+    def ejecutar(*args):
+        try:
+            return funcion(*args)
+        finally:
+            connections.close_all()
+    return sync_to_async(ejecutar, thread_sensitive=False)
+
+
+def leer_rutinas(usuario):
+    return list(rutinas_de(usuario))
+
+
+def leer_feed(usuario):
+    return list(feed_inicial(usuario))
+
+
+async def construir_dashboard_async(request):
+    """Como construir_dashboard, pero con las tres lecturas, que no dependen entre sí, a la vez"""
+    usuario = request.user
+    # Dentro de una transacción (tests) otra conexión no vería lo que aún no se ha confirmado
+    en_transaccion = await sync_to_async(lambda: connection.in_atomic_block)()
+    lanzar = sync_to_async if en_transaccion else en_su_hilo
+    rutinas, grafo, publicaciones = await asyncio.gather(
+        lanzar(leer_rutinas)(usuario),
+        lanzar(grafo_amistades)(usuario.id),
+        lanzar(leer_feed)(usuario),
+    )
+    return montar_dashboard(request, rutinas, grafo, publicaciones)
+
+
+async def dashboard_cacheado_async(request):
+    clave = clave_dashboard(request.user.id)
+    cacheado = await cache.aget(clave)
+    if cacheado is None:
+        cacheado = empaquetar_dashboard(await construir_dashboard_async(request))
+        await cache.aset(clave, cacheado, timeout=getattr(settings, 'DASHBOARD_CACHE_SECONDS', 60))
+    return cacheado
+
+
+class DashboardAsyncView(VistaLecturaAsync):
+    async def leer(self, request):
+        etag, datos = await dashboard_cacheado_async(request)
+        etag = quote_etag(etag)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = responder(datos)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+def con_lectura_async(vista, vista_async):
+    """
+    Con VISTAS_ASYNC (perfil ASGI) los GET de la ruta van a `vista_async` y el resto de
+    métodos a la vista DRF de siempre, que Django ejecuta en un hilo. Sin él, la vista DRF.
+    """
+    if not getattr(settings, 'VISTAS_ASYNC', False):
+        return vista
+
+    async def despachar(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await vista_async(request, *args, **kwargs)
+        return await sync_to_async(vista)(request, *args, **kwargs)
+
+    # Como las vistas DRF: la autenticación es por token, no por cookie
+    despachar.csrf_exempt = True
+    return despachar
+
+
+feed_async = FeedAsyncView.as_view()
+rutinas_async = RutinaListaAsyncView.as_view()
+# Mismo ETag/Last-Modified que TipoEjercicioListCreateView
+tipo_ejercicios_async = condition(etag_func=etag_catalogo, last_modified_func=ultima_modificacion_catalogo)(
+    TipoEjercicioListaAsyncView.as_view()
+)
+amistades_async = AmistadListaAsyncView.as_view()
+dashboard_async = DashboardAsyncView.as_view()
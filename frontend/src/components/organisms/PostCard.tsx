@@ -1,6 +1,6 @@
 import { Box, Text, Flex, IconButton } from "@chakra-ui/react";
 import { FaRegHeart, FaHeart } from "react-icons/fa";
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { likePost, unlikePost } from "../../services/posts";
 import { type Publicacion } from "../../services/posts";
 
@@ -12,6 +12,11 @@ export const PostCard = ({ post }: Props) => {
   const [liked, setLiked] = useState(post.liked_by_user);
   const [likesCount, setLikesCount] = useState(post.likes_count);
 
+  // El contador también cambia por los eventos de likes de otros usuarios
+  useEffect(() => {
+    setLikesCount(post.likes_count);
+  }, [post.likes_count]);
+
   const toggleLike = async () => {
     try {
       if (liked) {
@@ -19,7 +19,9 @@ import {
   crearAmistad,
   eliminarAmistad,
   actualizarAmistad,
+  autocompletarUsuarios,
   type Amistad,
+  type SugerenciaUsuario,
 } from "../../services/friendship";
 import { toaster } from "../ui/toasterInstance";
 import { CgProfile } from "react-icons/cg";
@@ -32,6 +34,7 @@ export const PerfilPage = () => {
   const [password, setPassword] = useState("");
   const [amistades, setAmistades] = useState<Amistad[]>([]);
   const [nuevoAmigo, setNuevoAmigo] = useState("");
+  const [sugerencias, setSugerencias] = useState<SugerenciaUsuario[]>([]);
   const [perfilHeight, setPerfilHeight] = useState(0);
 
   const perfilRef = useRef<HTMLDivElement | null>(null);
@@ -71,6 +74,21 @@ export const PerfilPage = () => {
     loadUser();
   }, [token]);
 
+  // Sugerencias mientras se escribe (esperamos a que pare de teclear)
+  useEffect(() => {
+    const texto = nuevoAmigo.trim();
+    if (!token || !texto || texto.includes("@")) {
+      setSugerencias([]);
+      return;
+    }
+    const timeout = setTimeout(() => {
+      autocompletarUsuarios(texto, token)
+        .then(setSugerencias)
+        .catch(() => setSugerencias([]));
+    }, 200);
+    return () => clearTimeout(timeout);
+  }, [nuevoAmigo, token]);
+
   const getAmistadesOrdenadas = () => {
     const pendientes = amistades.filter(a => a.status === "pendiente");
     const aceptadas = amistades
@@ -280,7 +298,17 @@ export const PerfilPage = () => {
                     onChange={(e) => setNuevoAmigo(e.target.value)}
                     bg="gray.700"
                     data-testid="input-agregar-amigo"
+                    list="sugerencias-amigos"
                   />
+                  <datalist id="sugerencias-amigos">
+                    {sugerencias
+                      .filter((s) => s.relacion === null)
+                      .map((s) => (
+                        <option key={s.id} value={s.username}>
+                          {s.nombre} {s.apellidos}
+                        </option>
+                      ))}
+                  </datalist>
                   <Button ml={2} type="submit" bgColor={"brand.500"} _hover={{ bgColor: "brand.800" }} data-testid="btn-agregar-amigo">
                     Enviar
                   </Button>
@@ -9,6 +9,7 @@ import {
   Container,
 } from "@chakra-ui/react";
 import { getPublicaciones, createPublicacion, type Publicacion } from "../../services/posts";
+import { suscribirEventos } from "../../services/events";
 import { PostCard } from "../organisms/PostCard";
 
 export const SocialPage = () => {
@@ -41,6 +42,19 @@ export const SocialPage = () => {
 
   useEffect(() => {
     fetchPosts();
+    // Publicaciones y likes nuevos llegan por eventos, sin recargar el feed
+    return suscribirEventos({
+      publicacion: ({ id, publicacion }) => {
+        setPosts((prev) => (prev.some((p) => p.id === id) ? prev : [publicacion, ...prev]));
+      },
+      like: ({ publicacion, accion }) => {
+        setPosts((prev) =>
+          prev.map((p) =>
+            p.id === publicacion ? { ...p, likes_count: p.likes_count + (accion === "dar" ? 1 : -1) } : p
+          )
+        );
+      },
+    });
   }, []);
 
   return (
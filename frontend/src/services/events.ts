@@ -0,0 +1,44 @@
+import type { Publicacion } from "./posts";
+
+const API_URL = "http://localhost:8000/api/auth";
+// El stream solo funciona con el backend servido por ASGI (SERVIDOR=asgi); con runserver
+// (WSGI) responde 204, con el que EventSource se cierra sin reintentar. Por defecto ni se abre
+const EVENTOS_ACTIVOS = import.meta.env.VITE_EVENTOS === "1";
+
+export interface EventoLike {
+  publicacion: number;
+  usuario: number;
+  accion: "dar" | "quitar";
+}
+
+export interface EventoAmistad {
+  id: number;
+  usuario: number;
+  amigo: number;
+  status: "pendiente" | "aceptada" | "rechazada";
+}
+
+export interface EventoPublicacion {
+  id: number;
+  usuario: number;
+  publicacion: Publicacion;
+}
+
+export interface ManejadoresEventos {
+  like?: (evento: EventoLike) => void;
+  amistad?: (evento: EventoAmistad) => void;
+  amistad_eliminada?: (evento: { id: number }) => void;
+  publicacion?: (evento: EventoPublicacion) => void;
+}
+
+// Una sola conexión (Server-Sent Events) en vez de volver a pedir las listas completas.
+// EventSource no admite cabeceras, así que el token va en la URL. Devuelve la función para cerrarla.
+export const suscribirEventos = (manejadores: ManejadoresEventos): (() => void) => {
+  if (!EVENTOS_ACTIVOS) return () => {};
+  const token = JSON.parse(localStorage.getItem("authToken") || "{}")?.access;
+  const fuente = new EventSource(`${API_URL}/eventos/?token=${encodeURIComponent(token)}`);
+  Object.entries(manejadores).forEach(([tipo, manejador]) => {
+    fuente.addEventListener(tipo, (e) => manejador(JSON.parse((e as MessageEvent).data)));
+  });
+  return () => fuente.close();
+};
@@ -13,6 +13,26 @@ export interface Amistad {
   status: "pendiente" | "aceptada" | "rechazada";
 }
 
+export interface SugerenciaUsuario {
+  id: number;
+  username: string;
+  nombre: string;
+  apellidos: string;
+  relacion: "aceptada" | "enviada" | "recibida" | null;
+}
+
+// Sugerencias de usuarios por prefijo de username (caja de añadir amigo)
+export const autocompletarUsuarios = async (
+  q: string,
+  token: string
+): Promise<SugerenciaUsuario[]> => {
+  const res = await axios.get(`${API_URL}/users/autocompletar/`, {
+    headers: { Authorization: `Bearer ${token}` },
+    params: { q },
+  });
+  return res.data;
+};
+
 // Listar amistades del usuario
 export const getAmistades = async (token: string): Promise<Amistad[]> => {
   const res = await axios.get(`${API_URL}/amistades/`, {
@@ -17,6 +17,7 @@ export const getPublicaciones = async (): Promise<Publicacion[]> => {
   const token = JSON.parse(localStorage.getItem("authToken") || "{}")?.access;
   const res = await axios.get(`${API_URL}/publicaciones/`, {
     headers: { Authorization: `Bearer ${token}` },
+    params: { completo: 1 }, // Lista completa sin paginar
   });
   return res.data;
 };